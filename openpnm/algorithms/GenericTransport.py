@@ -1,8 +1,8 @@
+import itertools
 import numpy as np
 import openpnm as op
-import scipy.sparse.linalg
 from numpy.linalg import norm
-import scipy.sparse.csgraph as spgr
+import scipy.sparse as sprs
 from scipy.spatial import ConvexHull
 from scipy.spatial import cKDTree
 from openpnm.topotools import iscoplanar
@@ -13,6 +13,8 @@ from openpnm.utils import logging, Docorator, GenericSettings
 # from typing import List
 docstr = Docorator()
 logger = logging.getLogger(__name__)
+# Identifiers of the sparsity patterns of A, see GenericTransport._get_BC_plan
+_pattern_ids = itertools.count()
 
 
 @docstr.get_sectionsf('GenericTransportSettings',
@@ -40,7 +42,8 @@ class GenericTransportSettings(GenericSettings):
     ----------------
     solver_family : str (default = 'scipy')
         The solver package to use.  OpenPNM currently supports ``scipy``,
-        ``pyamg`` and ``petsc`` (if you have it installed).
+        ``pyamg`` and ``petsc`` (if you have it installed).  Other backends
+        can be added using ``openpnm.utils.register_solver``.
     solver_type : str
         The specific solver to use.  For instance, if ``solver_family`` is
         ``scipy`` then you can specify any of the iterative solvers such as
@@ -66,6 +69,10 @@ class GenericTransportSettings(GenericSettings):
         ##
     cache_b : bool
         ##
+    cache_solver : bool (default = ``True``)
+        If ``True`` the solver backend keeps any factorization or multigrid
+        hierarchy it computes, and reuses it while the **A** matrix is
+        unchanged (e.g. when only the boundary values are changed).
     """
 
     phase = None
@@ -80,6 +87,7 @@ class GenericTransportSettings(GenericSettings):
     solver_maxiter = 5000
     cache_A = True
     cache_b = True
+    cache_solver = True
 
 
 @docstr.get_sectionsf('GenericTransport', sections=['Parameters'])
@@ -116,6 +124,9 @@ class GenericTransport(GenericAlgorithm):
     | ``setup``           | A shortcut for applying values in the ``settings``|
     |                     | attribute.                                        |
     +---------------------+---------------------------------------------------+
+    | ``run_batch``       | Solves for several sets of boundary conditions,   |
+    |                     | reusing the factorization of **A** between them   |
+    +---------------------+---------------------------------------------------+
     | ``results``         | Returns the results of the calcualtion as a       |
     |                     | ``dict`` with the data stored under the 'quantity'|
     |                     | specified in the ``settings``                     |
@@ -179,6 +190,11 @@ class GenericTransport(GenericAlgorithm):
         # Create some instance attributes
         self._A = self._pure_A = None
         self._b = self._pure_b = None
+        self._A_symmetric = None
+        self._solver = None
+        self._bc_plan = None
+        self._A_pattern = None
+        self._A_pattern_id = self._pure_A_pattern_id = None
         self['pore.bc_rate'] = np.nan
         self['pore.bc_value'] = np.nan
 
@@ -426,12 +442,139 @@ class GenericTransport(GenericAlgorithm):
         if not cache_A:
             self._pure_A = None
         if self._pure_A is None:
-            network = self.project.network
             phase = self.project.phases()[self.settings['phase']]
             g = phase[gvals]
-            am = network.create_adjacency_matrix(weights=g, fmt='coo')
-            self._pure_A = spgr.laplacian(am).astype(float)
-        self.A = self._pure_A.copy()
+            self._pure_A = self._assemble_laplacian(g)
+            self._pure_A_pattern_id = self._A_pattern['id']
+            # Note whether A is symmetric while the conductances are at hand
+            if g.size == self.Nt:
+                self._pure_A_symmetric = True
+            elif np.ndim(g) == 2:
+                self._pure_A_symmetric = np.array_equal(g[:, 0], g[:, 1])
+            else:
+                self._pure_A_symmetric = None
+        # The copy has the sparsity pattern of the pure A, which lets the
+        # plan for applying BCs be reused (see ``_get_BC_plan``)
+        A = self._pure_A
+        self.A = sprs.csr_matrix((A.data.copy(), A.indices, A.indptr),
+                                 shape=A.shape)
+        self._A_symmetric = self._pure_A_symmetric
+        self._A_pattern_id = self._pure_A_pattern_id
+
+    def _assemble_laplacian(self, g):
+        r"""
+        Assembles the Laplacian matrix of the network using the given
+        conductances as the weights, which is equivalent to calling
+        ``scipy.sparse.csgraph.laplacian`` on the adjacency matrix.
+
+        The sparsity pattern, and the position in it of each throat's entries,
+        only depend on the topology of the network, so they are stored and
+        reused as long as ``throat.conns`` is not replaced.  Each call then
+        only scatters the conductances into the values of the matrix.
+
+        Parameters
+        ----------
+        g : ND-array
+            The conductances, either Nt long, or Nt-by-2 (or 2*Nt long) when
+            the conductance in each direction differs.
+
+        Returns
+        -------
+        A sparse matrix in CSR format.  All matrices returned by this method
+        have the same sparsity pattern, which is stored in ``_A_pattern``, and
+        share its ``indices`` and ``indptr`` arrays.
+        """
+        network = self.project.network
+        Np, Nt = network.Np, network.Nt
+        # Lattices without stored conns supply the pattern from their stencil
+        stencil = network._get_stencil()
+        topology = network['throat.conns'] if stencil is None else stencil
+        pat = self._A_pattern
+        if (pat is None) or (pat['conns'] is not topology) \
+                or (pat['Np'] != Np):
+            if stencil is None:
+                pat = self._find_laplacian_pattern(topology, Np)
+            else:
+                am = network._stencil_adjacency()
+                pat = self._find_stencil_laplacian_pattern(*am, Np, Nt)
+                pat['conns'] = stencil
+            pat['id'] = next(_pattern_ids)
+            self._A_pattern = pat
+        g = np.array(g, dtype=float)
+        if g.shape == (Nt, ):
+            g12 = g21 = g
+        elif g.shape == (Nt, 2):
+            g12, g21 = g[:, 0], g[:, 1]
+        elif g.shape == (2*Nt, ):
+            g12, g21 = g[:Nt], g[Nt:]
+        else:
+            raise Exception('Received conductances are of incorrect length')
+        # Entry (i, j) holds -g(i -> j), and diagonal (j, j) holds the sum of
+        # g(i -> j) over all i, so the columns of A sum to zero
+        w = np.hstack((-g12, -g21, g12, g21))
+        w[pat['loops']] = 0  # Throats from a pore to itself are ignored
+        data = np.bincount(pat['pos'], weights=w, minlength=pat['nnz'])
+        # The index arrays of the pattern have the dtype scipy would pick, so
+        # the matrix shares them instead of copying them on every rebuild
+        return sprs.csr_matrix((data, pat['indices'], pat['indptr']),
+                               shape=(Np, Np), copy=False)
+
+    @staticmethod
+    def _find_laplacian_pattern(conns, Np):
+        r"""
+        Finds the CSR sparsity pattern of the Laplacian for the given
+        connections, along with the position in ``A.data`` that each throat
+        contributes to, in the order used by ``_assemble_laplacian``.
+        """
+        P1, P2 = conns[:, 0], conns[:, 1]
+        Ps = np.arange(Np)
+        rows = np.hstack((P1, P2, P2, P1, Ps))
+        cols = np.hstack((P2, P1, P2, P1, Ps))
+        # Sorting by row then column gives the canonical CSR ordering
+        keys, pos = np.unique(rows.astype(np.int64)*Np + cols,
+                              return_inverse=True)
+        indptr = np.zeros(Np + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // Np, minlength=Np), out=indptr[1:])
+        loops = np.hstack([P1 == P2]*4)
+        dtype = np.int32 if keys.size < np.iinfo(np.int32).max else np.int64
+        pattern = {'conns': conns, 'Np': Np, 'nnz': keys.size,
+                   'indices': (keys % Np).astype(dtype),
+                   'indptr': indptr.astype(dtype),
+                   'pos': pos.flatten()[:4*conns.shape[0]], 'loops': loops}
+        return pattern
+
+    @staticmethod
+    def _find_stencil_laplacian_pattern(indptr, indices, throats, Np, Nt):
+        r"""
+        Finds the same pattern as ``_find_laplacian_pattern`` from an
+        adjacency matrix in CSR form with sorted indices, whose entries hold
+        the throat connecting each pair of pores, so no sorting is needed.
+        """
+        rows = np.repeat(np.arange(Np), np.diff(indptr))
+        upper = indices > rows
+        # Every row gains a diagonal entry after the columns below the row
+        pos = np.arange(indices.size) + rows + upper
+        diag = indptr[:-1] + np.arange(Np) \
+            + np.bincount(rows[~upper], minlength=Np)
+        nnz = indices.size + Np
+        dtype = np.int32 if nnz < np.iinfo(np.int32).max else np.int64
+        new_indices = np.empty(nnz, dtype=dtype)
+        new_indices[pos] = indices
+        new_indices[diag] = np.arange(Np)
+        P1 = np.empty(Nt, dtype=np.int64)
+        P2 = np.empty(Nt, dtype=np.int64)
+        P1[throats[upper]] = rows[upper]
+        P2[throats[upper]] = indices[upper]
+        pos12 = np.empty(Nt, dtype=np.int64)
+        pos21 = np.empty(Nt, dtype=np.int64)
+        pos12[throats[upper]] = pos[upper]
+        pos21[throats[~upper]] = pos[~upper]
+        pattern = {'conns': None, 'Np': Np, 'nnz': nnz,
+                   'indices': new_indices,
+                   'indptr': (indptr + np.arange(Np + 1)).astype(dtype),
+                   'pos': np.hstack((pos12, pos21, diag[P2], diag[P1])),
+                   'loops': np.array([], dtype=int)}
+        return pattern
 
     def _build_b(self):
         r"""
@@ -462,6 +605,9 @@ class GenericTransport(GenericAlgorithm):
 
     def _set_A(self, A):
         self._A = A
+        # Symmetry and sparsity pattern of an arbitrary matrix are unknown
+        self._A_symmetric = None
+        self._A_pattern_id = None
 
     A = property(fget=_get_A, fset=_set_A)
 
@@ -485,24 +631,96 @@ class GenericTransport(GenericAlgorithm):
             ind = np.isfinite(self['pore.bc_rate'])
             self.b[ind] = self['pore.bc_rate'][ind]
         if 'pore.bc_value' in self.keys():
-            f = self.A.diagonal().mean()
-            # Update b (impose bc values)
             ind = np.isfinite(self['pore.bc_value'])
-            self.b[ind] = self['pore.bc_value'][ind] * f
-            # Update b (substract quantities from b to keep A symmetric)
-            x_BC = np.zeros_like(self.b)
-            x_BC[ind] = self['pore.bc_value'][ind]
-            self.b[~ind] -= (self.A.tocsr() * x_BC)[~ind]
-            # Update A
-            P_bc = self.toindices(ind)
-            indrow = np.isin(self.A.row, P_bc)
-            indcol = np.isin(self.A.col, P_bc)
-            self.A.data[indrow] = 0  # Remove entries from A for all BC rows
-            self.A.data[indcol] = 0  # Remove entries from A for all BC cols
-            datadiag = self.A.diagonal()  # Add diagonal entries back into A
-            datadiag[P_bc] = np.ones_like(P_bc, dtype=float) * f
-            self.A.setdiag(datadiag)
-            self.A.eliminate_zeros()  # Remove 0 entries
+            if not ind.any():
+                return
+            plan = self._get_BC_plan(ind)
+            A = self._A
+            f = A.diagonal().mean()
+            self._apply_value_BCs_to_b(self.b, self['pore.bc_value'], A, plan, f)
+            # Update A, entries are set to 0 rather than removed so the
+            # sparsity pattern is unchanged
+            A.data[plan['zero']] = 0  # Remove entries for all BC rows/cols
+            A.data[plan['diag']] = f  # Add diagonal entries back into A
+
+    def _apply_value_BCs_to_b(self, b, values, A, plan, f):
+        r"""
+        Applies the value BCs to ``b`` in place, using the entries of **A**
+        before the BCs were applied to it.  The BC pores are those of the
+        given ``plan``, and ``f`` is the scaling of their diagonal entries.
+        """
+        ind = plan['mask']
+        # Update b (impose bc values)
+        b[ind] = values[ind] * f
+        # Update b (substract quantities from b to keep A symmetric)
+        x_BC = values[plan['cols']]
+        b -= np.bincount(plan['rows'], minlength=self.Np,
+                         weights=A.data[plan['corr']] * x_BC)
+
+    def _get_BC_plan(self, ind):
+        r"""
+        Finds the positions in ``A.data`` that are changed when applying value
+        BCs in the given pores.  The result is stored and reused as long as
+        the BC pores and the sparsity pattern of **A** are unchanged.  The
+        pattern is identified by ``_A_pattern_id``, which is set when **A** is
+        built from the Laplacian pattern, and otherwise the pattern arrays
+        are compared.
+
+        Parameters
+        ----------
+        ind : ND-array
+            A boolean mask of the pores with value BCs
+
+        Returns
+        -------
+        A dictionary with the positions of all entries in the BC rows and
+        columns (``'zero'``), of the diagonal entries of the BC rows
+        (``'diag'``), and of the entries in the BC columns of the other rows
+        (``'corr'``) along with their row and column indices (``'rows'`` and
+        ``'cols'``).
+
+        Notes
+        -----
+        This converts **A** to CSR format if needed, and adds any missing
+        diagonal entries to the BC rows.
+        """
+        A = self.A
+        if not sprs.isspmatrix_csr(A):
+            A = self._A = A.tocsr()
+        plan = self._bc_plan
+        pattern_id = self._A_pattern_id
+        if plan is not None and np.array_equal(plan['mask'], ind):
+            if (pattern_id is not None) and (plan['id'] == pattern_id) \
+                    and (plan['nnz'] == A.nnz):
+                return plan
+            if np.array_equal(A.indptr, plan['indptr']) \
+                    and np.array_equal(A.indices, plan['indices']):
+                plan['id'] = pattern_id
+                return plan
+        A.sum_duplicates()
+        rows = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+        cols = A.indices
+        # Insert stored zeros on the diagonal of BC rows that lack them
+        missing = np.setdiff1d(np.where(ind)[0], rows[rows == cols])
+        if missing.size:
+            A = A.tocoo()
+            rows = np.hstack((A.row, missing))
+            cols = np.hstack((A.col, missing))
+            data = np.hstack((A.data, np.zeros_like(missing, dtype=float)))
+            A = self._A = sprs.csr_matrix((data, (rows, cols)), shape=A.shape)
+            pattern_id = self._A_pattern_id = next(_pattern_ids)
+            rows = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+            cols = A.indices
+        in_row = ind[rows]
+        in_col = ind[cols]
+        corr = np.where(~in_row * in_col)[0]
+        plan = {'mask': ind.copy(), 'id': pattern_id, 'nnz': A.nnz,
+                'indptr': A.indptr, 'indices': A.indices,
+                'zero': np.where(in_row + in_col)[0],
+                'diag': np.where(in_row * (rows == cols))[0],
+                'corr': corr, 'rows': rows[corr], 'cols': cols[corr]}
+        self._bc_plan = plan
+        return plan
 
     def run(self, x0=None):
         r"""
@@ -539,6 +757,123 @@ class GenericTransport(GenericAlgorithm):
         if not self.settings['quantity']:
             raise Exception('quantity has not been defined on this algorithm')
 
+    @docstr.get_full_descriptionf(base='GenericTransport.run_batch')
+    @docstr.get_sectionsf(base='GenericTransport.run_batch',
+                          sections=['Parameters', 'Returns'])
+    @docstr.dedent
+    def run_batch(self, values=None, rates=None, pores=None):
+        r"""
+        Solves the system for several sets of boundary conditions at once.
+
+        Cases that apply value BCs in the same pores share the same **A**
+        matrix, which is built once for all of them.  Their **b** vectors are
+        gathered into the columns of an Np-by-k array, which is solved in a
+        single call using one factorization when the solver supports it
+        (e.g. ``spsolve``), and one column at a time otherwise.
+
+        Parameters
+        ----------
+        values : list of ND-arrays
+            The value BCs of each case, with each entry being an Np-long
+            array holding ``nan`` in pores without a value BC (i.e. in the
+            same form as ``pore.bc_value``).  If not given, the value BCs
+            currently set on the algorithm are used for all cases.
+
+        rates : list of ND-arrays
+            The rate BCs of each case, in the same form as ``values``.  If
+            not given, the rate BCs currently set on the algorithm are used
+            for all cases.
+
+        pores : array_like
+            The pores for which the rate of each case is calculated.  If not
+            given, the rate is found for the pores with the highest value BC
+            in each case (i.e. the inlets).
+
+        Returns
+        -------
+        x : ND-array
+            An Np-by-k array holding the solution of each of the k cases in
+            its columns.
+
+        R : ND-array
+            The net rate of each case into the specified pores, as returned by
+            ``rate`` with ``mode='group'``.
+
+        Notes
+        -----
+        This is meant for linear problems, and the BCs, **A** and **b** set on
+        the algorithm beforehand are restored once all cases are solved.  The solution of
+        each case is not stored on the algorithm.
+
+        """
+        if values is None and rates is None:
+            raise Exception('Either values or rates must be given')
+        k = len(values) if values is not None else len(rates)
+        if values is None:
+            values = [self['pore.bc_value']]*k
+        if rates is None:
+            rates = [self['pore.bc_rate']]*k
+        if len(values) != len(rates):
+            raise Exception('The number of values and rates must match')
+        values = [np.ones(self.Np)*np.array(v, dtype=float) for v in values]
+        rates = [np.ones(self.Np)*np.array(r, dtype=float) for r in rates]
+        # Group the cases with the same value BC pores so A is unchanged
+        groups = {}
+        for i in range(k):
+            groups.setdefault(np.isfinite(values[i]).tobytes(), []).append(i)
+        quantity = self.settings['quantity']
+        stored = {i: self[i] for i in ['pore.bc_value', 'pore.bc_rate',
+                                       quantity] if i in self.keys()}
+        # A and b are rebuilt for each group, so keep the ones already built
+        attrs = ['_A', '_b', '_A_symmetric', '_A_pattern_id']
+        stored_attrs = {i: getattr(self, i) for i in attrs}
+        x = np.zeros((self.Np, k), dtype=float)
+        R = np.zeros(k, dtype=float)
+        solver = self._get_solver()
+        try:
+            for group in groups.values():
+                # Build A once, and the b of each case from A before the BCs
+                self['pore.bc_value'] = values[group[0]]
+                self['pore.bc_rate'] = rates[group[0]]
+                self._build_A()
+                self._build_b()
+                ind = np.isfinite(values[group[0]])
+                plan = self._get_BC_plan(ind) if ind.any() else None
+                A = self._A
+                f = A.diagonal().mean()
+                B = np.zeros((self.Np, len(group)), dtype=float)
+                for j, i in enumerate(group):
+                    B[:, j] = self.b
+                    has_rate = np.isfinite(rates[i])
+                    B[has_rate, j] = rates[i][has_rate]
+                    if plan is not None:
+                        self._apply_value_BCs_to_b(B[:, j], values[i], A,
+                                                   plan, f)
+                self._apply_BCs()
+                if solver.is_block(self.settings['solver_type']):
+                    self.b = B
+                    x[:, group] = self._solve()
+                else:
+                    for j, i in enumerate(group):
+                        self.b = B[:, j]
+                        x[:, i] = self._solve()
+            for i in range(k):
+                self['pore.bc_value'] = values[i]
+                self['pore.bc_rate'] = rates[i]
+                self[quantity] = x[:, i]
+                Ps = pores
+                if Ps is None:
+                    has_values = np.isfinite(values[i]).any()
+                    Ps = self._get_inlets() if has_values else []
+                R[i] = self.rate(pores=Ps)[0] if len(Ps) else np.nan
+        finally:
+            self.pop(quantity, None)
+            for item in stored.keys():
+                self[item] = stored[item]
+            for item in stored_attrs.keys():
+                setattr(self, item, stored_attrs[item])
+        return x, R
+
     def _solve(self, A=None, b=None, x0=None):
         r"""
         Sends the A and b matrices to the specified solver, and solves for *x*
@@ -566,74 +901,52 @@ class GenericTransport(GenericAlgorithm):
 
         """
         # Fetch A and b from self if not given, and throw error if not found
+        is_sym = self._A_symmetric if A is None else None
         A = self.A if A is None else A
         b = self.b if b is None else b
         if A is None or b is None:
             raise Exception('The A matrix or the b vector not yet built.')
-        A = A.tocsr()
         x0 = np.zeros_like(b) if x0 is None else x0
 
         # Check if A and b are well-defined
         self._check_for_nans()
 
-        # Raise error if solver_family not available
-        if self.settings["solver_family"] not in ["scipy", "petsc", "pyamg"]:
-            raise Exception(f"{self.settings['solver_family']} not available.")
+        # Fetch the solver backend, raises error if solver_family not available
+        solver = self._get_solver()
+        solver_type = self.settings['solver_type']
 
         # Set tolerance for iterative solvers
         tol = self.settings["solver_tol"]
         max_it = self.settings["solver_maxiter"]
         atol = self._get_atol()
         rtol = self._get_rtol(x0=x0)
-        # Check if A is symmetric
-        is_sym = op.utils.is_symmetric(self.A)
-        if self.settings['solver_type'] == 'cg' and not is_sym:
-            raise Exception('CG solver only works on symmetric matrices.')
-
-        # SciPy
-        if self.settings['solver_family'] == 'scipy':
-            # Umfpack by default uses its 32-bit build -> memory overflow
-            try:
-                import scikits.umfpack
-                A.indices = A.indices.astype(np.int64)
-                A.indptr = A.indptr.astype(np.int64)
-            except ModuleNotFoundError:
-                pass
-            solver = getattr(scipy.sparse.linalg, self.settings['solver_type'])
-            iterative = ['bicg', 'bicgstab', 'cg', 'cgs', 'gmres', 'lgmres',
-                         'minres', 'gcrotmk', 'qmr']
-            if solver.__name__ in iterative:
-                x, exit_code = solver(A=A, b=b, atol=atol, tol=tol, maxiter=max_it, x0=x0)
-                if exit_code > 0:
-                    raise Exception(f'Solver did not converge, exit code: {exit_code}')
-            else:
-                x = solver(A=A, b=b)
-
-        # PETSc
-        if self.settings['solver_family'] == 'petsc':
-            # Check if petsc is available
-            try:
-                import petsc4py
-                from openpnm.utils.petsc import PETScSparseLinearSolver as SLS
-            except Exception:
-                raise ModuleNotFoundError('PETSc is not installed.')
-            temp = {"type": self.settings["solver_type"],
-                    "preconditioner": self.settings["solver_preconditioner"]}
-            ls = SLS(A=A, b=b, settings=temp)
-            x = ls.solve(x0=x0, atol=atol, rtol=rtol, max_it=max_it)
-
-        # PyAMG
-        if self.settings['solver_family'] == 'pyamg':
-            # Check if PyAMG is available
-            try:
-                import pyamg
-            except Exception:
-                raise ModuleNotFoundError('PyAMG is not installed.')
-            ml = pyamg.ruge_stuben_solver(A)
-            x = ml.solve(b=b, tol=rtol, maxiter=max_it)
-
+        # Check if A is symmetric, only if the solver requires it
+        if solver.requires_symmetric(solver_type):
+            if is_sym is None:
+                is_sym = op.utils.is_symmetric(A)
+            if not is_sym:
+                raise Exception(f'{solver_type} solver only works on '
+                                + 'symmetric matrices.')
+
+        x = solver.solve(A=A, b=b, x0=x0, solver_type=solver_type,
+                         reuse=self.settings['cache_solver'],
+                         preconditioner=self.settings['solver_preconditioner'],
+                         tol=tol, atol=atol, rtol=rtol, maxiter=max_it)
         return x
 
+    def _get_solver(self):
+        r"""
+        Returns the backend for the ``solver_family`` given in ``settings``,
+        reusing the one from the previous call (along with any factorization
+        it stored) if the family has not changed.
+        """
+        family = self.settings['solver_family']
+        solver = getattr(self, '_solver', None)
+        if (solver is None) or (solver.name != family):
+            solver = op.utils.get_solver(family)()
+            self._solver = solver
+        return solver
+
     def _get_atol(self):
         r"""
         Fetches absolute tolerance for the solver if not ``None``, otherwise
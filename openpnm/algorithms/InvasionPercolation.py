@@ -1,9 +1,8 @@
-import warnings
 import heapq as hq
 import scipy as sp
 import numpy as np
 from collections import namedtuple
-from openpnm.utils import logging
+from openpnm.utils import logging, jit_kernel
 from openpnm.topotools import find_clusters
 from openpnm.algorithms import GenericAlgorithm
 logger = logging.getLogger(__name__)
@@ -94,7 +93,8 @@ class InvasionPercolation(GenericAlgorithm):
                                               'throat_volume': ''},
                            'set_inlets':     {'pores': None,
                                               'overwrite': False},
-                           'apply_trapping': {'outlets': None}
+                           'apply_trapping': {'outlets': None,
+                                              'mode': 'site'}
                            }
                    }
         super().__init__(**kwargs)
@@ -190,7 +190,8 @@ class InvasionPercolation(GenericAlgorithm):
             conns=self.project.network['throat.conns'],
             idx=incidence_matrix.indices,
             indptr=incidence_matrix.indptr,
-            n_steps=n_steps
+            n_steps=n_steps,
+            start=np.sum(self['throat.invasion_sequence'] >= 0)
         )
 
         self['throat.invasion_sequence'] = t_inv
@@ -253,7 +254,7 @@ class InvasionPercolation(GenericAlgorithm):
             data = {'pore.occupancy': Np <= N, 'throat.occupancy': Nt <= N}
         return data
 
-    def apply_trapping(self, outlets):
+    def apply_trapping(self, outlets, mode='site'):
         """
         Apply trapping based on algorithm described by Y. Masson [1].
         It is applied as a post-process and runs the percolation algorithm in
@@ -278,9 +279,10 @@ class InvasionPercolation(GenericAlgorithm):
         neighbor connected to a sink is touched the trapped cluster stops
         growing as this is the point of trapping in forward invasion time.
 
-        Logger info displays the invasion sequence and pore index and a message
-        with condition number based on the modified trapping rules and the
-        assignment of the pore to a given cluster.
+        The reversed sequence is processed with a disjoint-set (union-find)
+        structure over the cluster numbers, in a compiled kernel that walks
+        the CSR adjacency arrays of the network, so merging clusters does not
+        require relabelling them.
 
         Initially all invaded pores are given cluster label -1
         Outlets / Sinks are given -2
@@ -297,98 +299,93 @@ class InvasionPercolation(GenericAlgorithm):
         outlets : list or array of pore indices for defending fluid to escape
         through
 
+        mode : string
+            Controls whether the defending fluid is trapped in pores or in
+            throats. Options are:
+
+            'site' : (default) Pores are trapped when the surrounding pores
+            are invaded, the throats connected to trapped pores are trapped
+            as well
+
+            'bond' : Throats are trapped when the surrounding throats are
+            invaded, and pores are trapped if all their throats are trapped
+
         Returns
         -------
         Creates a throat array called 'pore.clusters' in the Algorithm
-        dictionary. Any positive number is a trapped cluster
+        dictionary. Any positive number is a trapped cluster.  In 'bond' mode
+        'throat.clusters' is also created.
 
         Also creates 2 boolean arrays Np and Nt long called '<element>.trapped'
         """
-        # First see if network is fully invaded
         net = self.project.network
-        invaded_ps = self['pore.invasion_sequence'] > -1
-        if ~np.all(invaded_ps):
+        outlets = self._parse_indices(outlets)
+        if mode == 'site':
+            seq = self['pore.invasion_sequence']
+            is_outlet = net.tomask(pores=outlets)
+            # Find the pores connected to each other
+            am = net.create_adjacency_matrix(fmt='csr')
+            indptr, indices = am.indptr, am.indices
+            min_seq = 1  # Skip inlets, which have a sequence of 0
+        elif mode == 'bond':
+            seq = self['throat.invasion_sequence']
+            is_outlet = net.tomask(throats=net.find_neighbor_throats(outlets))
+            # Find the throats sharing a pore with each other
+            im = net.create_incidence_matrix(fmt='csr')
+            lg = (im.T @ im).tocsr()
+            lg.setdiag(0)
+            lg.eliminate_zeros()
+            indptr, indices = lg.indptr, lg.indices
+            min_seq = 0
+        else:
+            raise Exception(f'Unrecognized mode: {mode}')
+        # First see if network is fully invaded
+        invaded = seq > -1
+        if ~np.all(invaded):
             # Put defending phase into clusters
-            clusters = find_clusters(network=net, mask=~invaded_ps)
+            clusters = find_clusters(network=net, mask=~invaded)
+            clusters = clusters[0] if mode == 'site' else clusters[1]
             # Identify clusters that are connected to an outlet and set to -2
             # -1 is the invaded fluid
             # -2 is the defender fluid able to escape
             # All others now trapped clusters which grow as invasion is reversed
-            out_clusters = np.unique(clusters[outlets])
-            for c in out_clusters:
-                if c >= 0:
-                    clusters[clusters == c] = -2
+            out_clusters = np.unique(clusters[is_outlet])
+            out_clusters = out_clusters[out_clusters >= 0]
+            clusters[np.isin(clusters, out_clusters)] = -2
         else:
             # Go from end
-            clusters = np.ones(net.Np, dtype=int)*-1
-            clusters[outlets] = -2
-
-        # Turn into a list for indexing
-        inv_seq = np.vstack((self['pore.invasion_sequence'].astype(int),
-                             np.arange(0, net.Np, dtype=int))).T
-        # Reverse sort list
-        inv_seq = inv_seq[inv_seq[:, 0].argsort()][::-1]
-        next_cluster_num = np.max(clusters)+1
-        # For all the steps after the inlets are set up to break-through
+            clusters = np.ones(seq.size, dtype=int)*-1
+            clusters[is_outlet] = -2
         # Reverse the sequence and assess the neighbors cluster state
-        stopped_clusters = np.zeros(net.Np, dtype=bool)
-        all_neighbors = net.find_neighbor_pores(net.pores(), flatten=False,
-                                                include_input=True)
-        for un_seq, pore in inv_seq:
-            if pore not in outlets and un_seq > 0:  # Skip inlets and outlets
-                nc = clusters[all_neighbors[pore]]  # Neighboring clusters
-                unique_ns = np.unique(nc[nc != -1])  # Unique Neighbors
-                seq_pore = "S:"+str(un_seq)+" P:"+str(pore)
-                if np.all(nc == -1):
-                    # This is the start of a new trapped cluster
-                    clusters[pore] = next_cluster_num
-                    next_cluster_num += 1
-                    msg = (seq_pore+" C:1 new cluster number: "
-                           + str(clusters[pore]))
-                    logger.info(msg)
-                elif len(unique_ns) == 1:
-                    # Grow the only connected neighboring cluster
-                    if not stopped_clusters[unique_ns[0]]:
-                        clusters[pore] = unique_ns[0]
-                        msg = (seq_pore+" C:2 joins cluster number: "
-                               + str(clusters[pore]))
-                        logger.info(msg)
-                    else:
-                        clusters[pore] = -2
-                elif -2 in unique_ns:
-                    # We have reached a sink neighbor, stop growing cluster
-                    msg = (seq_pore+" C:3 joins sink cluster")
-                    logger.info(msg)
-                    clusters[pore] = -2
-                    # Stop growth and merging
-                    stopped_clusters[unique_ns[unique_ns > -1]] = True
-                else:
-                    # We might be able to do some merging
-                    # Check if any stopped clusters are neighbors
-                    if np.any(stopped_clusters[unique_ns]):
-                        msg = (seq_pore+" C:4 joins sink cluster")
-                        logger.info(msg)
-                        clusters[pore] = -2
-                        # Stop growing all neighboring clusters
-                        stopped_clusters[unique_ns] = True
-                    else:
-                        # Merge multiple un-stopped trapped clusters
-                        new_num = unique_ns[0]
-                        clusters[pore] = new_num
-                        for c in unique_ns:
-                            clusters[clusters == c] = new_num
-                            msg = (seq_pore + " C:5 merge clusters: "
-                                   + str(c) + " into "+str(new_num))
-                            logger.info(msg)
+        order = np.argsort(seq)[::-1]
+        kernel = jit_kernel(_trapping_kernel)
+        clusters = kernel(order, seq.astype(int), clusters.astype(int),
+                          is_outlet, indptr, indices, min_seq)
 
         # And now return clusters
-        self['pore.clusters'] = clusters
         logger.info("Number of trapped clusters"
                     + str(np.sum(np.unique(clusters) >= 0)))
-        self['pore.trapped'] = self['pore.clusters'] > -1
-        trapped_ts = net.find_neighbor_throats(self['pore.trapped'])
-        self['throat.trapped'] = np.zeros([net.Nt], dtype=bool)
-        self['throat.trapped'][trapped_ts] = True
+        if mode == 'site':
+            self['pore.clusters'] = clusters
+            self['pore.trapped'] = self['pore.clusters'] > -1
+            trapped_ts = net.find_neighbor_throats(self['pore.trapped'])
+            self['throat.trapped'] = np.zeros([net.Nt], dtype=bool)
+            self['throat.trapped'][trapped_ts] = True
+        else:
+            self['throat.clusters'] = clusters
+            self['throat.trapped'] = self['throat.clusters'] > -1
+            # Pores are trapped if all their throats are trapped
+            im = net.create_incidence_matrix(fmt='csr')
+            n_trapped = im @ self['throat.trapped'].astype(int)
+            self['pore.trapped'] = n_trapped == np.diff(im.indptr)
+            self['pore.trapped'][np.diff(im.indptr) == 0] = False
+            # Give trapped pores the cluster number of one of their throats
+            p_clusters = np.ones(net.Np, dtype=int)*-1
+            conns = net['throat.conns'][self['throat.trapped']]
+            p_clusters[conns[:, 0]] = clusters[self['throat.trapped']]
+            p_clusters[conns[:, 1]] = clusters[self['throat.trapped']]
+            p_clusters[~self['pore.trapped']] = -1
+            self['pore.clusters'] = p_clusters
         self['pore.invasion_sequence'][self['pore.trapped']] = -1
         self['throat.invasion_sequence'][self['throat.trapped']] = -1
 
@@ -452,7 +449,7 @@ class InvasionPercolation(GenericAlgorithm):
             return None
 
     def _run_accelerated(queue, t_sorted, t_order, t_inv, p_inv, p_inv_t,
-                         conns, idx, indptr, n_steps):
+                         conns, idx, indptr, n_steps, start=0):
         r"""
         Numba-jitted run method for InvasionPercolation class.
 
@@ -464,45 +461,96 @@ class InvasionPercolation(GenericAlgorithm):
         (2) Numba doesn't like forein data types (i.e. GenericNetwork), and so
         ``find_neighbor_throats`` method cannot be called in a jitted method.
 
-        (3) Nested wrapper is for performance issues (reduced OpenPNM import)
-        time due to local numba import
+        (3) ``start`` is the number of throats invaded by earlier calls, so
+        that running in steps continues the invasion sequence.
 
-        """
-        from numba import njit
-        from numba.errors import NumbaPendingDeprecationWarning
-        warnings.simplefilter('ignore', category=NumbaPendingDeprecationWarning)
-
-        @njit
-        def wrapper(queue, t_sorted, t_order, t_inv, p_inv, p_inv_t, conns,
-                    idx, indptr, n_steps):
-            count = 0
-            while (len(queue) > 0) and (count < n_steps):
-                # Find throat at the top of the queue
-                t = hq.heappop(queue)
-                # Extract actual throat number
-                t_next = t_sorted[t]
-                t_inv[t_next] = count
-                # If throat is duplicated
-                while len(queue) > 0 and queue[0] == t:
-                    # Note: Preventing duplicate entries below might save some time
-                    t = hq.heappop(queue)
-                # Find pores connected to newly invaded throat
-                Ps = conns[t_next]
-                # Remove already invaded pores from Ps
-                Ps = Ps[p_inv[Ps] < 0]
-                if len(Ps) > 0:
-                    p_inv[Ps] = count
-                    p_inv_t[Ps] = t_next
-                    for i in Ps:
-                        Ts = idx[indptr[i]:indptr[i+1]]
-                        Ts = Ts[t_inv[Ts] < 0]
-                    for i in set(Ts):   # set(Ts) to exclude repeated neighbor throats
-                        hq.heappush(queue, t_order[i])
-                count += 1
-            return t_inv, p_inv, p_inv_t
+        (4) The kernel is compiled on the first call only, see
+        ``openpnm.utils.jit_kernel``, which keeps numba out of the OpenPNM
+        import time.
 
+        """
+        wrapper = jit_kernel(_ip_kernel)
         return wrapper(queue, t_sorted, t_order, t_inv, p_inv, p_inv_t, conns,
-                       idx, indptr, n_steps)
+                       idx, indptr, n_steps, start)
+
+
+def _ip_kernel(queue, t_sorted, t_order, t_inv, p_inv, p_inv_t, conns, idx,
+               indptr, n_steps, start):
+    count = start
+    while (len(queue) > 0) and (count < start + n_steps):
+        # Find throat at the top of the queue
+        t = hq.heappop(queue)
+        # Extract actual throat number
+        t_next = t_sorted[t]
+        t_inv[t_next] = count
+        # If throat is duplicated
+        while len(queue) > 0 and queue[0] == t:
+            # Note: Preventing duplicate entries below might save some time
+            t = hq.heappop(queue)
+        # Find pores connected to newly invaded throat
+        Ps = conns[t_next]
+        # Remove already invaded pores from Ps
+        Ps = Ps[p_inv[Ps] < 0]
+        if len(Ps) > 0:
+            p_inv[Ps] = count
+            p_inv_t[Ps] = t_next
+            for i in Ps:
+                Ts = idx[indptr[i]:indptr[i+1]]
+                Ts = Ts[t_inv[Ts] < 0]
+            for i in set(Ts):   # set(Ts) to exclude repeated neighbor throats
+                hq.heappush(queue, t_order[i])
+        count += 1
+    return t_inv, p_inv, p_inv_t
+
+
+def _trapping_kernel(order, seq, clusters, is_outlet, indptr, indices,
+                     min_seq):
+    # Reversed invasion with trapping, see InvasionPercolation.apply_trapping
+    next_num = clusters.max() + 1
+    n_labels = max(next_num, 0) + order.size + 1
+    parent = np.arange(n_labels)
+    stopped = np.zeros(n_labels, dtype=np.bool_)
+    roots = np.empty(np.max(np.diff(indptr)) + 1, dtype=np.int64)
+    for i in order:
+        if is_outlet[i] or (seq[i] < min_seq):
+            continue
+        # Find the clusters of the neighbors, and if a sink is among them
+        n = 0
+        sink = False
+        for j in indices[indptr[i]:indptr[i+1]]:
+            c = clusters[j]
+            if c == -1:
+                continue
+            if c == -2:
+                sink = True
+                continue
+            while parent[c] != c:  # Find the root, halving the path
+                parent[c] = parent[parent[c]]
+                c = parent[c]
+            if stopped[c]:
+                sink = True
+            roots[n] = c
+            n += 1
+        if sink:
+            # Join the sink cluster, and stop growing the neighbor clusters
+            clusters[i] = -2
+            stopped[roots[:n]] = True
+        elif n == 0:
+            # Start a new trapped cluster
+            clusters[i] = next_num
+            next_num += 1
+        else:
+            # Grow or merge the neighbor clusters into the lowest number
+            r = roots[:n].min()
+            parent[roots[:n]] = r
+            clusters[i] = r
+    for i in range(clusters.size):
+        c = clusters[i]
+        if c >= 0:
+            while parent[c] != c:
+                c = parent[c]
+            clusters[i] = c
+    return clusters
 
 
 if __name__ == '__main__':
@@ -7,11 +7,12 @@ MixedInvasionPercolation: IP allowing pores and throats to invade separately
 """
 import logging
 import heapq as hq
-import scipy as sp
 import numpy as np
+import scipy.sparse as sprs
 from collections import namedtuple
 from openpnm.algorithms import GenericAlgorithm
 from openpnm.topotools import find_clusters, site_percolation
+from openpnm.utils import jit_kernel
 
 logger = logging.getLogger(__name__)
 
@@ -306,129 +307,119 @@ class MixedInvasionPercolation(GenericAlgorithm):
             The maximum pressure applied to the invading cluster. Any pores and
             throats with entry pressure above this value will not be invaded.
 
+        Notes
+        -----
+        The invasion itself is performed by a compiled kernel which keeps the
+        queue of each cluster as a pairing heap in a shared pool of integer
+        encoded entries, so merging clusters only relinks the entries that are
+        still uninvaded.  The results are written back to the algorithm once
+        the invasion has stopped, and the remaining entries are returned to
+        ``queue`` so that invasion can be resumed by calling ``run`` again.
+
         """
         if "throat.entry_pressure" not in self.keys():
             logger.error("Setup method must be run first")
 
         if max_pressure is None:
-            self.max_pressure = sp.inf
+            self.max_pressure = np.inf
         else:
             self.max_pressure = max_pressure
         if len(self.queue) == 0:
             logger.warn("queue is empty, this network is fully invaded")
             return
+        n_clusters = len(self.queue)
         # track whether each cluster has reached the maximum pressure
-        self.max_p_reached = [False] * len(self.queue)
+        self.max_p_reached = [False] * n_clusters
         # starting invasion sequence
         self.count = 0
         # highest pressure reached so far - used for porosimetry curve
-        self.high_Pc = np.ones(len(self.queue)) * -np.inf
-        outlets = self["pore.outlets"]
-        terminate_clusters = np.sum(outlets) > 0
+        self.high_Pc = np.ones(n_clusters) * -np.inf
         if not hasattr(self, "invasion_running"):
-            self.invasion_running = [True] * len(self.queue)
+            self.invasion_running = [True] * n_clusters
         else:
             # created by set_residual
             pass
-        while np.any(self.invasion_running) and not np.all(self.max_p_reached):
-            # Loop over clusters
-            for c_num in np.argwhere(self.invasion_running).flatten():
-                self._invade_cluster(c_num)
-                queue = self.queue[c_num]
-                if len(queue) == 0 or self.max_p_reached[c_num]:
-                    # If the cluster contains no more entries invasion has
-                    # finished
-                    self.invasion_running[c_num] = False
-            if self.settings["invade_isolated_Ts"]:
-                self._invade_isolated_Ts()
-            if terminate_clusters:
-                # terminated clusters
-                tcs = np.unique(self["pore.cluster"][outlets]).astype(int)
-                tcs = tcs[tcs >= 0]
-                if len(tcs) > 0:
-                    for tc in tcs:
-                        if self.invasion_running[tc] is True:
-                            self.invasion_running[tc] = False
-                            logger.info(
-                                "Cluster "
-                                + str(tc)
-                                + " reached "
-                                + " outlet at sequence "
-                                + str(self.count)
-                            )
-
-    def _invade_cluster(self, c_num):
-        queue = self.queue[c_num]
-        pressure, elem_id, elem_type = hq.heappop(queue)
-        if elem_type == "pore":
-            self._interface_Ps[elem_id] = False
-        else:
-            self._interface_Ts[elem_id] = False
-        if pressure > self.max_pressure:
-            self.max_p_reached[c_num] = True
+        net = self.project.network
+        conns = net["throat.conns"]
+        im = net.create_incidence_matrix(fmt="csr")
+        t_entry = np.asarray(self["throat.entry_pressure"], dtype=float)
+        if t_entry.ndim == 1:
+            t_entry = np.column_stack((t_entry, t_entry))
+        p_entry = np.asarray(self["pore.entry_pressure"], dtype=float)
+        outlets = self["pore.outlets"]
+        if self.settings["cooperative_pore_filling"] and hasattr(self, "tt_Pc"):
+            coop = True
+            tt = sprs.csr_matrix(self.tt_Pc)
+            tt_indptr, tt_indices, tt_data = tt.indptr, tt.indices, tt.data
         else:
-            elem_cluster = self[elem_type + ".cluster"][elem_id]
-            elem_cluster = elem_cluster.astype(int)
-            # Cluster is the uninvaded cluster
-            if elem_cluster == -1:
-                self.count += 1
-                # Record highest Pc cluster has reached
-                if self.high_Pc[c_num] < pressure:
-                    self.high_Pc[c_num] = pressure
-                # The newly invaded element is available for
-                # invasion
-                self[elem_type + ".invasion_sequence"][elem_id] = self.count
-                self[elem_type + ".cluster"][elem_id] = c_num
-                self[elem_type + ".invasion_pressure"][elem_id] = self.high_Pc[c_num]
-                if elem_type == "throat":
-                    self._add_ps2q(elem_id, queue)
-                elif elem_type == "pore":
-                    self._add_ts2q(elem_id, queue)
-                    if self.settings["cooperative_pore_filling"] and hasattr(
-                        self, "tt_Pc"
-                    ):
-                        self._check_coop(elem_id, queue)
-            # Element is part of existing cluster that is still invading
-            elif elem_cluster != c_num and self.invasion_running[elem_cluster]:
-                # The newly invaded element is part of an invading
-                # cluster. Merge the clusters using the existing
-                # cluster number)
-                self._merge_cluster(c2keep=c_num, c2empty=elem_cluster)
-                logger.info(
-                    "Merging cluster "
-                    + str(elem_cluster)
-                    + " into cluster "
-                    + str(c_num)
-                    + " at sequence "
-                    + str(self.count)
-                )
-            # Element is part of residual cluster - now invasion can start
-            elif elem_cluster != c_num and len(self.queue[elem_cluster]) > 0:
-                # The newly invaded element is part of an invading
-                # cluster. Merge the clusters using the existing
-                # cluster number)
-                self._merge_cluster(c2keep=c_num, c2empty=elem_cluster)
-                logger.info(
-                    "Merging residual cluster "
-                    + str(elem_cluster)
-                    + " into cluster "
-                    + str(c_num)
-                    + " at sequence "
-                    + str(self.count)
-                )
-            else:
-                pass
-
-    def _merge_cluster(self, c2keep, c2empty):
+            coop = False
+            tt_indptr = np.zeros(1, dtype=np.int64)
+            tt_indices = np.zeros(0, dtype=np.int64)
+            tt_data = np.zeros(0, dtype=float)
+        node_clu, node_pc, node_id, node_type = self._encode_queues()
+        running = np.array(self.invasion_running, dtype=bool)
+        max_p_reached = np.zeros(n_clusters, dtype=bool)
+        # Work on copies and write them back in one go when invasion stops
+        p_seq = self["pore.invasion_sequence"].astype(np.int64)
+        t_seq = self["throat.invasion_sequence"].astype(np.int64)
+        p_clu = self["pore.cluster"].astype(np.int64)
+        t_clu = self["throat.cluster"].astype(np.int64)
+        p_Pc = self["pore.invasion_pressure"].astype(float)
+        t_Pc = self["throat.invasion_pressure"].astype(float)
+        kernel = jit_kernel(_mip_kernel)
+        out = kernel(node_clu, node_pc, node_id, node_type, running,
+                     max_p_reached, self.high_Pc, float(self.max_pressure),
+                     p_seq, t_seq, p_clu, t_clu, p_Pc, t_Pc, p_entry,
+                     t_entry, conns, im.indptr, im.indices,
+                     self._interface_Ps, self._interface_Ts, outlets,
+                     bool(self.settings["invade_isolated_Ts"]), coop,
+                     tt_indptr, tt_indices, tt_data)
+        self.count = out[0]
+        self["pore.invasion_sequence"] = p_seq
+        self["throat.invasion_sequence"] = t_seq
+        self["pore.cluster"] = p_clu
+        self["throat.cluster"] = t_clu
+        self["pore.invasion_pressure"] = p_Pc
+        self["throat.invasion_pressure"] = t_Pc
+        self.invasion_running = running.tolist()
+        self.max_p_reached = max_p_reached.tolist()
+        self._decode_queues(n_clusters, *out[1:])
+        logger.info("Invasion stopped at sequence " + str(self.count))
+
+    def _encode_queues(self):
         r"""
-        Little helper function to merger clusters but only add the uninvaded
-        elements
+        Converts the entries in ``queue`` to arrays holding the cluster,
+        pressure, index and type (0 for pores and 1 for throats) of each entry
         """
-        while len(self.queue[c2empty]) > 0:
-            temp = [_pc, _id, _type] = hq.heappop(self.queue[c2empty])
-            if self[_type + ".invasion_sequence"][_id] == -1:
-                hq.heappush(self.queue[c2keep], temp)
-        self.invasion_running[c2empty] = False
+        n = sum([len(q) for q in self.queue])
+        node_clu = np.zeros(n, dtype=np.int64)
+        node_pc = np.zeros(n, dtype=float)
+        node_id = np.zeros(n, dtype=np.int64)
+        node_type = np.zeros(n, dtype=np.int8)
+        i = 0
+        for c, queue in enumerate(self.queue):
+            for Pc, elem_id, elem_type in queue:
+                node_clu[i] = c
+                node_pc[i] = Pc
+                # Cooperative filling entries hold the pore index in a list
+                node_id[i] = np.ravel(elem_id)[0]
+                node_type[i] = elem_type == "throat"
+                i += 1
+        return node_clu, node_pc, node_id, node_type
+
+    def _decode_queues(self, n_clusters, node_clu, node_pc, node_id, node_type):
+        r"""
+        Rebuilds ``queue`` from the entries left over by the invasion kernel
+        """
+        types = ["pore", "throat"]
+        self.queue = [[] for c in range(n_clusters)]
+        for c, Pc, elem_id, elem_type in zip(node_clu.tolist(),
+                                             node_pc.tolist(),
+                                             node_id.tolist(),
+                                             node_type.tolist()):
+            self.queue[c].append([Pc, elem_id, types[elem_type]])
+        for queue in self.queue:
+            hq.heapify(queue)
 
     def results(self, Pc):
         r"""
@@ -854,32 +845,362 @@ class MixedInvasionPercolation(GenericAlgorithm):
             if c_num > initial_num:
                 self.invasion_running[c_num] = False
 
-    def _invade_isolated_Ts(self):
-        r"""
-        Throats that are uninvaded connected to pores that are both invaded
-        should be invaded too.
-        """
-        net = self.project.network
-        Ts = net["throat.conns"].copy()
-        invaded_Ps = self["pore.invasion_sequence"] > -1
-        uninvaded_Ts = self["throat.invasion_sequence"] == -1
-        isolated_Ts = np.logical_and(invaded_Ps[Ts[:, 0]], invaded_Ps[Ts[:, 1]])
-        isolated_Ts = np.logical_and(isolated_Ts, uninvaded_Ts)
-        inv_Pc = self["pore.invasion_pressure"]
-        inv_seq = self["pore.invasion_sequence"]
-        if np.any(isolated_Ts):
-            max_array = Ts[:, 0]
-            second_higher = inv_seq[Ts][:, 1] > inv_seq[Ts][:, 0]
-            max_array[second_higher] = Ts[:, 1][second_higher]
-            mPc = inv_Pc[max_array]
-            mSeq = inv_seq[max_array]
-            mClu = self["pore.cluster"][max_array]
-            self["throat.invasion_pressure"][isolated_Ts] = mPc[isolated_Ts]
-            self["throat.invasion_sequence"][isolated_Ts] = mSeq[isolated_Ts]
-            self["throat.cluster"][isolated_Ts] = mClu[isolated_Ts]
-
     def _check_coop(self):
         r"""
         Not implemented in this class
         """
         pass
+
+
+def _mip_kernel(node_clu, node_pc, node_id, node_type, running, max_p_reached,
+                high_Pc, max_pressure, p_seq, t_seq, p_clu, t_clu, p_Pc, t_Pc,
+                p_entry, t_entry, conns, indptr, indices, interface_Ps,
+                interface_Ts, is_outlet, isolated_Ts, coop, tt_indptr,
+                tt_indices, tt_data):
+    r"""
+    Invades the clusters in turn, popping the lowest entry from the queue of
+    each running cluster per round, until all clusters have stopped.
+
+    Notes
+    -----
+    The queues of all clusters are pairing heaps sharing one pool of entries,
+    ordered by (pressure, index, type) exactly like the lists previously
+    held by ``heapq``.  ``child`` and ``sib`` hold the first child and next
+    sibling of each entry, and ``root`` the top entry of each cluster.  The
+    pool is enlarged as needed.  The pore, throat and interface arrays are
+    updated in place, and the count and the entries remaining in the queues
+    are returned.
+
+    """
+    Np = p_seq.size
+    Nt = t_seq.size
+    n_clusters = running.size
+    n_nodes = node_pc.size
+    cap = max(2*n_nodes, 64)
+    pc = np.empty(cap, dtype=np.float64)
+    ids = np.empty(cap, dtype=np.int64)
+    tys = np.empty(cap, dtype=np.int8)
+    child = np.empty(cap, dtype=np.int64)
+    sib = np.empty(cap, dtype=np.int64)
+    scratch = np.empty(cap, dtype=np.int64)
+    pending = np.empty(cap, dtype=np.int64)
+    root = -np.ones(n_clusters, dtype=np.int64)
+    size = np.zeros(n_clusters, dtype=np.int64)
+    # Link the initial entries into the queue of their cluster
+    for x in range(n_nodes):
+        pc[x] = node_pc[x]
+        ids[x] = node_id[x]
+        tys[x] = node_type[x]
+        child[x] = -1
+        sib[x] = -1
+        c = node_clu[x]
+        a = root[c]
+        if a == -1:
+            root[c] = x
+        else:
+            b = x
+            if (pc[b] < pc[a]) or (pc[b] == pc[a] and (
+                    ids[b] < ids[a] or (ids[b] == ids[a] and tys[b] < tys[a]))):
+                a, b = b, a
+            sib[b] = child[a]
+            child[a] = b
+            root[c] = a
+        size[c] += 1
+    terminate = False
+    for i in range(Np):
+        if is_outlet[i]:
+            terminate = True
+            break
+    invaded = np.empty(Np, dtype=np.int64)
+    turns = np.empty(n_clusters, dtype=np.int64)
+    count = 0
+    first_round = True
+    while True:
+        n_turns = 0
+        all_max_p = True
+        for c in range(n_clusters):
+            if running[c]:
+                turns[n_turns] = c
+                n_turns += 1
+            if not max_p_reached[c]:
+                all_max_p = False
+        if n_turns == 0 or all_max_p:
+            break
+        n_inv = 0
+        for k in range(n_turns):
+            c = turns[k]
+            if size[c] == 0:
+                # Emptied by a merge earlier in this round
+                running[c] = False
+                continue
+            # Pop the top entry and pair up its children (multipass)
+            r = root[c]
+            n = 0
+            x = child[r]
+            while x != -1:
+                scratch[n] = x
+                nx = sib[x]
+                sib[x] = -1
+                x = nx
+                n += 1
+            head = 0
+            tail = n
+            while tail - head > 1:
+                a = scratch[head % cap]
+                b = scratch[(head + 1) % cap]
+                head += 2
+                if (pc[b] < pc[a]) or (pc[b] == pc[a] and (
+                        ids[b] < ids[a] or (ids[b] == ids[a]
+                                            and tys[b] < tys[a]))):
+                    a, b = b, a
+                sib[b] = child[a]
+                child[a] = b
+                scratch[tail % cap] = a
+                tail += 1
+            if tail > head:
+                root[c] = scratch[head % cap]
+            else:
+                root[c] = -1
+            size[c] -= 1
+            pressure = pc[r]
+            elem = ids[r]
+            elem_type = tys[r]
+            if elem_type == 0:
+                interface_Ps[elem] = False
+            else:
+                interface_Ts[elem] = False
+            n_pend = 0
+            if pressure > max_pressure:
+                max_p_reached[c] = True
+            else:
+                if elem_type == 0:
+                    elem_cluster = p_clu[elem]
+                else:
+                    elem_cluster = t_clu[elem]
+                if elem_cluster == -1:
+                    count += 1
+                    # Record highest Pc cluster has reached
+                    if high_Pc[c] < pressure:
+                        high_Pc[c] = pressure
+                    # Number of entries that may be added to the queue
+                    if elem_type == 0:
+                        need = indptr[elem + 1] - indptr[elem]
+                        if coop:
+                            for j in range(indptr[elem], indptr[elem + 1]):
+                                T = indices[j]
+                                need += tt_indptr[T + 1] - tt_indptr[T]
+                    else:
+                        need = 2
+                    if n_nodes + need > cap:
+                        new_cap = max(2*cap, n_nodes + need)
+                        temp_pc = np.empty(new_cap, dtype=np.float64)
+                        temp_pc[:n_nodes] = pc[:n_nodes]
+                        pc = temp_pc
+                        temp_ids = np.empty(new_cap, dtype=np.int64)
+                        temp_ids[:n_nodes] = ids[:n_nodes]
+                        ids = temp_ids
+                        temp_tys = np.empty(new_cap, dtype=np.int8)
+                        temp_tys[:n_nodes] = tys[:n_nodes]
+                        tys = temp_tys
+                        temp_child = np.empty(new_cap, dtype=np.int64)
+                        temp_child[:n_nodes] = child[:n_nodes]
+                        child = temp_child
+                        temp_sib = np.empty(new_cap, dtype=np.int64)
+                        temp_sib[:n_nodes] = sib[:n_nodes]
+                        sib = temp_sib
+                        scratch = np.empty(new_cap, dtype=np.int64)
+                        pending = np.empty(new_cap, dtype=np.int64)
+                        cap = new_cap
+                    if elem_type == 1:
+                        t_seq[elem] = count
+                        t_clu[elem] = c
+                        t_Pc[elem] = high_Pc[c]
+                        # Add the uninvaded pores of the throat
+                        for j in range(2):
+                            P = conns[elem, j]
+                            if p_seq[P] <= 0:
+                                interface_Ps[P] = True
+                                pc[n_nodes] = p_entry[P]
+                                ids[n_nodes] = P
+                                tys[n_nodes] = 0
+                                child[n_nodes] = -1
+                                sib[n_nodes] = -1
+                                pending[n_pend] = n_nodes
+                                n_pend += 1
+                                n_nodes += 1
+                    else:
+                        p_seq[elem] = count
+                        p_clu[elem] = c
+                        p_Pc[elem] = high_Pc[c]
+                        invaded[n_inv] = elem
+                        n_inv += 1
+                        # Add the uninvaded throats of the pore, with the
+                        # entry pressure towards the other pore
+                        for j in range(indptr[elem], indptr[elem + 1]):
+                            T = indices[j]
+                            if t_seq[T] <= 0:
+                                interface_Ts[T] = True
+                                if conns[T, 0] != elem:
+                                    pc[n_nodes] = t_entry[T, 0]
+                                else:
+                                    pc[n_nodes] = t_entry[T, 1]
+                                ids[n_nodes] = T
+                                tys[n_nodes] = 1
+                                child[n_nodes] = -1
+                                sib[n_nodes] = -1
+                                pending[n_pend] = n_nodes
+                                n_pend += 1
+                                n_nodes += 1
+                        if coop:
+                            # Pores that can now be filled cooperatively by
+                            # two throats with access to the invading phase
+                            for j in range(indptr[elem], indptr[elem + 1]):
+                                T = indices[j]
+                                if t_seq[T] != -1:
+                                    continue
+                                a0 = conns[T, 0]
+                                a1 = conns[T, 1]
+                                for m in range(tt_indptr[T], tt_indptr[T + 1]):
+                                    if np.isnan(tt_data[m]):
+                                        continue
+                                    t = tt_indices[m]
+                                    b0 = conns[t, 0]
+                                    b1 = conns[t, 1]
+                                    if a0 == b0 and a1 != b1:
+                                        cP, u0, u1 = a0, a1, b1
+                                    elif a0 == b1 and a1 != b0:
+                                        cP, u0, u1 = a0, a1, b0
+                                    elif a1 == b0 and a0 != b1:
+                                        cP, u0, u1 = a1, a0, b1
+                                    elif a1 == b1 and a0 != b0:
+                                        cP, u0, u1 = a1, a0, b0
+                                    else:
+                                        continue
+                                    if (p_seq[u0] > -1 and p_seq[u1] > -1
+                                            and p_seq[cP] == -1):
+                                        pc[n_nodes] = tt_data[m]
+                                        ids[n_nodes] = cP
+                                        tys[n_nodes] = 0
+                                        child[n_nodes] = -1
+                                        sib[n_nodes] = -1
+                                        pending[n_pend] = n_nodes
+                                        n_pend += 1
+                                        n_nodes += 1
+                elif elem_cluster != c and (running[elem_cluster]
+                                            or size[elem_cluster] > 0):
+                    # The element belongs to another invading cluster, or to
+                    # a residual cluster which can now start invading. Move
+                    # its uninvaded entries into this cluster's queue.
+                    c2 = elem_cluster
+                    top = 0
+                    if root[c2] != -1:
+                        scratch[0] = root[c2]
+                        top = 1
+                    while top > 0:
+                        top -= 1
+                        x = scratch[top]
+                        if child[x] != -1:
+                            scratch[top] = child[x]
+                            top += 1
+                        if sib[x] != -1:
+                            scratch[top] = sib[x]
+                            top += 1
+                        child[x] = -1
+                        sib[x] = -1
+                        if tys[x] == 0:
+                            uninvaded = p_seq[ids[x]] == -1
+                        else:
+                            uninvaded = t_seq[ids[x]] == -1
+                        if uninvaded:
+                            pending[n_pend] = x
+                            n_pend += 1
+                    root[c2] = -1
+                    size[c2] = 0
+                    running[c2] = False
+            # Link the new entries into the queue of this cluster
+            for j in range(n_pend):
+                b = pending[j]
+                a = root[c]
+                if a == -1:
+                    root[c] = b
+                    continue
+                if (pc[b] < pc[a]) or (pc[b] == pc[a] and (
+                        ids[b] < ids[a] or (ids[b] == ids[a]
+                                            and tys[b] < tys[a]))):
+                    a, b = b, a
+                sib[b] = child[a]
+                child[a] = b
+                root[c] = a
+            size[c] += n_pend
+            if size[c] == 0 or max_p_reached[c]:
+                # If the cluster contains no more entries invasion has
+                # finished
+                running[c] = False
+        if isolated_Ts:
+            # Throats between two invaded pores take the invasion of the pore
+            # invaded last. Only the throats of pores invaded in this round
+            # need checking, except in the first round.
+            if first_round:
+                Ts = np.arange(Nt)
+            else:
+                n_Ts = 0
+                for k in range(n_inv):
+                    n_Ts += indptr[invaded[k] + 1] - indptr[invaded[k]]
+                Ts = np.empty(n_Ts, dtype=np.int64)
+                n_Ts = 0
+                for k in range(n_inv):
+                    for j in range(indptr[invaded[k]], indptr[invaded[k] + 1]):
+                        Ts[n_Ts] = indices[j]
+                        n_Ts += 1
+            for T in Ts:
+                if t_seq[T] != -1:
+                    continue
+                P1 = conns[T, 0]
+                P2 = conns[T, 1]
+                if p_seq[P1] > -1 and p_seq[P2] > -1:
+                    if p_seq[P2] > p_seq[P1]:
+                        P1 = P2
+                    t_Pc[T] = p_Pc[P1]
+                    t_seq[T] = p_seq[P1]
+                    t_clu[T] = p_clu[P1]
+        if terminate:
+            # Stop the clusters that have reached an outlet
+            if first_round:
+                for P in range(Np):
+                    if is_outlet[P] and p_clu[P] >= 0:
+                        running[p_clu[P]] = False
+            else:
+                for k in range(n_inv):
+                    P = invaded[k]
+                    if is_outlet[P] and p_clu[P] >= 0:
+                        running[p_clu[P]] = False
+        first_round = False
+    # Collect the entries left in the queues
+    n_left = 0
+    for c in range(n_clusters):
+        n_left += size[c]
+    left_clu = np.empty(n_left, dtype=np.int64)
+    left_pc = np.empty(n_left, dtype=np.float64)
+    left_id = np.empty(n_left, dtype=np.int64)
+    left_type = np.empty(n_left, dtype=np.int8)
+    i = 0
+    for c in range(n_clusters):
+        if root[c] == -1:
+            continue
+        scratch[0] = root[c]
+        top = 1
+        while top > 0:
+            top -= 1
+            x = scratch[top]
+            if child[x] != -1:
+                scratch[top] = child[x]
+                top += 1
+            if sib[x] != -1:
+                scratch[top] = sib[x]
+                top += 1
+            left_clu[i] = c
+            left_pc[i] = pc[x]
+            left_id[i] = ids[x]
+            left_type[i] = tys[x]
+            i += 1
+    return count, left_clu, left_pc, left_id, left_type
@@ -1,4 +1,9 @@
+import threading
 import numpy as np
+import scipy.sparse as sprs
+import scipy.sparse.linalg as spla
+from numpy.linalg import norm
+from concurrent.futures import ThreadPoolExecutor
 from openpnm.algorithms import GenericAlgorithm
 from openpnm.utils import logging, Docorator, GenericSettings
 docstr = Docorator()
@@ -26,6 +31,24 @@ class NernstPlanckMultiphysicsSettings(GenericSettings):
         The tolerance to use for stopping Gummel iterations
     g_max_iter : int (default = 10)
         The maximum number if times to perform the Gummel iteration
+    parallel : bool (default = False)
+        If ``True`` the ions are solved concurrently in a pool of threads
+        during each Gummel iteration, all using the potential from the
+        previous iteration.  Only the models that depend on the updated
+        fields are then regenerated, instead of all the physics models.
+    n_threads : int (default = None)
+        The number of threads to use when ``parallel`` is ``True``.  If not
+        given one thread per ion is used.
+    nonlinear_solver : str (default = 'gummel')
+        The method used to solve the coupled system.  Options are 'gummel',
+        which solves for the ions and the potential in turn, and 'newton',
+        which solves for all of them at once using Newton's method.  In both
+        cases ``g_tol`` and ``g_max_iter`` control the iterations.
+    newton_krylov_tol : float (default = 1e-6)
+        The relative tolerance used by GMRES when finding each Newton step
+    newton_max_backtracks : int (default = 10)
+        The number of times a Newton step can be halved by the line search
+        before accepting it anyway.
 
     """
     phase = None
@@ -33,6 +56,11 @@ class NernstPlanckMultiphysicsSettings(GenericSettings):
     ions = []
     g_tol = 1e-8
     g_max_iter = 10
+    parallel = False
+    n_threads = None
+    nonlinear_solver = 'gummel'
+    newton_krylov_tol = 1e-6
+    newton_max_backtracks = 10
 
 
 class NernstPlanckMultiphysics(GenericAlgorithm):
@@ -47,10 +75,13 @@ class NernstPlanckMultiphysics(GenericAlgorithm):
         self.settings._update_settings_and_docs(c)
         settings['phase'] = phase.name
         self.settings.update(settings)
+        self.stats = {'iterations': 0, 'backtracks': 0,
+                      'krylov_iterations': 0, 'residuals': []}
 
     @docstr.dedent
     def setup(self, phase=None, potential_field='', ions=[], g_tol=None,
-              g_max_iter=None, **kwargs):
+              g_max_iter=None, parallel=None, n_threads=None,
+              nonlinear_solver='', **kwargs):
         r"""
 
         Parameters
@@ -67,12 +98,36 @@ class NernstPlanckMultiphysics(GenericAlgorithm):
             self.settings['g_tol'] = g_tol
         if g_max_iter:
             self.settings['g_max_iter'] = g_max_iter
+        if parallel is not None:
+            self.settings['parallel'] = parallel
+        if n_threads:
+            self.settings['n_threads'] = n_threads
+        if nonlinear_solver:
+            self.settings['nonlinear_solver'] = nonlinear_solver
 
-    def run(self, t=None):
+    def run(self, t=None, callback=None):
         r"""
+        Solves the coupled ions and potential fields using Gummel iterations
+
+        Parameters
+        ----------
+        callback : function, optional
+            A function that is called at the end of each Gummel iteration as
+            ``callback(itr, residuals)``, where ``itr`` is the number of the
+            iteration (starting at 1) and ``residuals`` is a dictionary with
+            the residual of each algorithm, keyed by its name.
+
+        Notes
+        -----
+        The progress of the iterations is reported through the ``logger`` of
+        this module.  The number of Newton iterations, line search backtracks
+        and GMRES iterations, along with the scaled residual after each Newton
+        iteration, are stored in the ``stats`` attribute.
+
         """
-        print('―'*80)
-        print('Running IonicTransport')
+        logger.info('Running IonicTransport')
+        self.stats = {'iterations': 0, 'backtracks': 0,
+                      'krylov_iterations': 0, 'residuals': []}
         # Phase, potential and ions algorithms
         phase = self.project.phases()[self.settings['phase']]
         p_alg = self.project.algorithms()[self.settings['potential_field']]
@@ -96,6 +151,22 @@ class NernstPlanckMultiphysics(GenericAlgorithm):
         phys = p_alg.project.find_physics(phase=phase)
         p_alg._charge_conservation_eq_source_term(e_alg=e_alg)
 
+        method = self.settings['nonlinear_solver']
+        if method == 'newton':
+            # The potential equation is singular where the concentrations
+            # vanish, so the Newton iterations start from one Gummel sweep
+            for e in e_alg:
+                e._run_reactive(x0=e[e.settings['quantity']].copy())
+                phase.update(e.results())
+            phys[0].regenerate_models()
+            p_alg._run_reactive(x0=p_alg[p_alg.settings['quantity']].copy())
+            phase.update(p_alg.results())
+            phys[0].regenerate_models()
+            self._run_newton(algs, callback=callback)
+            return
+        elif method != 'gummel':
+            raise Exception(f'{method} is not a valid nonlinear_solver')
+
         # Initialize residuals & old/new fields for Gummel iterats
         g_tol = self.settings['g_tol']
         g_res = {}
@@ -106,17 +177,36 @@ class NernstPlanckMultiphysics(GenericAlgorithm):
             g_old[alg.name] = None
             g_new[alg.name] = None
 
+        parallel = self.settings['parallel']
+        if parallel:
+            n_threads = self.settings['n_threads'] or len(e_alg)
+            pool = ThreadPoolExecutor(max_workers=n_threads)
+            lock = threading.Lock()
+            ion_props = self._find_dependent_props(p_alg, e_alg)
+            p_props = self._find_dependent_props(p_alg, [p_alg])
+
         # Iterate (Gummel) until solutions converge
-        for itr in range(int(self.settings['g_max_iter'])):
-            g_r = [float(format(i, '.3g')) for i in g_res.values()]
-            g_r = str(g_r)[1:-1]
-            print('Gummel iter: '+str(itr+1)+', residuals: '+g_r)
-            g_convergence = max(i for i in g_res.values()) < g_tol
-            if not g_convergence:
-                # Ions
+        try:
+            for itr in range(int(self.settings['g_max_iter'])):
+                g_r = [float(format(i, '.3g')) for i in g_res.values()]
+                g_r = str(g_r)[1:-1]
+                logger.info('Gummel iter: '+str(itr+1)+', residuals: '+g_r)
+                g_convergence = max(i for i in g_res.values()) < g_tol
+                if g_convergence:
+                    logger.info('Solution converged')
+                    break
+                # Ions, which only depend on each other through the potential
+                if parallel:
+                    for e in e_alg:
+                        g_old[e.name] = (e[e.settings['quantity']].copy())
+                    jobs = [pool.submit(e._run_reactive, g_old[e.name], lock)
+                            for e in e_alg]
+                    for job in jobs:
+                        job.result()
                 for e in e_alg:
-                    g_old[e.name] = (e[e.settings['quantity']].copy())
-                    e._run_reactive(x0=g_old[e.name])
+                    if not parallel:
+                        g_old[e.name] = (e[e.settings['quantity']].copy())
+                        e._run_reactive(x0=g_old[e.name])
                     g_new[e.name] = (e[e.settings['quantity']].copy())
                     # Residual
                     g_res[e.name] = np.sum(np.absolute(
@@ -124,7 +214,10 @@ class NernstPlanckMultiphysics(GenericAlgorithm):
                     phase.update(e.results())
 
                 # Poisson eq
-                phys[0].regenerate_models()
+                if parallel:
+                    self._regenerate_models(ion_props, algs)
+                else:
+                    phys[0].regenerate_models()
                 g_old[p_alg.name] = p_alg[p_alg.settings['quantity']].copy()
                 p_alg._run_reactive(x0=g_old[p_alg.name])
                 g_new[p_alg.name] = p_alg[p_alg.settings['quantity']].copy()
@@ -133,8 +226,292 @@ class NernstPlanckMultiphysics(GenericAlgorithm):
                     g_old[p_alg.name]**2 - g_new[p_alg.name]**2))
                 # Update phase and physics
                 phase.update(p_alg.results())
-                phys[0].regenerate_models()
+                if parallel:
+                    self._regenerate_models(p_props, algs)
+                else:
+                    phys[0].regenerate_models()
+                if callback is not None:
+                    callback(itr+1, g_res.copy())
+        finally:
+            if parallel:
+                pool.shutdown()
+
+    def _find_dependent_props(self, p_alg, algs):
+        r"""
+        Finds the models on the phase, geometries and physics that must be
+        regenerated when the fields solved by the given algorithms change,
+        sorted in the order in which they should be regenerated.
+
+        Models that receive the algorithms themselves (such as the
+        ``charge_conservation`` source term) or a list of ion names as their
+        ``ions`` argument (such as the ``electroneutrality`` ionic
+        conductance) read the fields without listing them as arguments, so
+        they do not appear in the dependency graph and are found separately.
+        """
+        phase = self.project.phases()[self.settings['phase']]
+        physics = self.project.find_physics(phase=phase)
+        geometries = list(self.project.geometries().values())
+        ions = set([alg.settings['ion'] for alg in algs
+                    if 'ion' in alg.settings.keys()])
+        alg_ids = set([id(alg) for alg in algs])
+        hidden = []
+        for obj in [phase] + physics + geometries:
+            for propname in obj.models.keys():
+                mod = obj.models[propname]
+                args = []
+                for arg in mod.values():
+                    args.extend(arg if isinstance(arg, list) else [arg])
+                names = set(np.ravel(mod.get('ions', [])))
+                if names.intersection(ions) or \
+                        alg_ids.intersection([id(i) for i in args]):
+                    hidden.append(propname)
+        base_props = [alg.settings['quantity'] for alg in algs] + hidden
+        props = p_alg._find_iterative_props(base_props=base_props)
+        return hidden + [i for i in props if i not in hidden]
+
+    def _regenerate_models(self, propnames, algs):
+        r"""
+        Regenerates the given models on the phase, geometries and physics,
+        then clears the coefficient matrix of each of the given algorithms
+        whose conductance was among them.  The matrix is then rebuilt from the
+        new conductances on the next solve, reusing the sparsity pattern that
+        the algorithm has already cached.
+
+        The models are regenerated through the project, so that the models on
+        the physics are included and all of them run in dependency order.
+        """
+        phase = self.project.phases()[self.settings['phase']]
+        physics = self.project.find_physics(phase=phase)
+        geometries = list(self.project.geometries().values())
+        self.project.regenerate_models(objs=geometries + [phase] + physics,
+                                       propnames=propnames)
+        for alg in algs:
+            if alg.settings['conductance'] in propnames:
+                alg._pure_A = None
+
+    def _run_newton(self, algs, x_old=None, callback=None):
+        r"""
+        Solves for the potential and the concentration of all the ions at
+        once using Newton's method, with a backtracking line search to ensure
+        each step reduces the residual.
+
+        Parameters
+        ----------
+        algs : list of OpenPNM Algorithm objects
+            The potential algorithm followed by the algorithms of the ions
+        x_old : dict, optional
+            The fields at the previous time step, keyed by the names of the
+            ion algorithms.  If given, the ion equations include the change
+            in concentration over the time step ``t_step`` (implicit scheme).
+        callback : function, optional
+            Called after each iteration as ``callback(itr, residuals)``, see
+            ``run``.
+
+        Notes
+        -----
+        The residual of each algorithm is ``A*x - b`` with the source terms
+        at ``x``, where **A** and the source terms are evaluated using all of
+        the latest fields.  The Jacobian is found by finite differences (see
+        ``_get_coupled_jacobian``), and each Newton step is found using GMRES
+        preconditioned by the block lower triangular part of the Jacobian.
+
+        As for the Gummel iterations, convergence is reached when the change
+        in each field over an iteration falls below ``g_tol``.
 
-            if g_convergence:
-                print('Solution converged')
+        """
+        g_tol = self.settings['g_tol']
+        max_it = int(self.settings['g_max_iter'])
+        max_bt = self.settings['newton_max_backtracks']
+        Np = algs[0].Np
+        n = len(algs)
+        # Models depending on each field, and on any of them
+        props = [self._find_dependent_props(algs[0], [alg]) for alg in algs]
+        props_all = self._find_dependent_props(algs[0], algs)
+        # Start from the current fields, with the value BCs imposed on them
+        X = []
+        for alg in algs:
+            x = np.array(alg[alg.settings['quantity']], dtype=float)
+            bc = np.isfinite(alg['pore.bc_value'])
+            x[bc] = alg['pore.bc_value'][bc]
+            X.append(x)
+        X = np.concatenate(X)
+        R = self._get_coupled_residual(algs, X, props_all, x_old)
+        # Each block of the residual is scaled by the norm of its b
+        scale = np.array([norm(alg.b) for alg in algs])
+        scale[scale == 0] = 1.0
+
+        def merit(R):
+            return norm(norm(R.reshape(n, Np), axis=1) / scale)
+
+        g_res = {alg.name: 1e+06 for alg in algs}
+        for itr in range(max_it):
+            res = merit(R)
+            self.stats['residuals'].append(res)
+            g_r = [float(format(i, '.3g')) for i in g_res.values()]
+            g_r = str(g_r)[1:-1]
+            logger.info('Newton iter: '+str(itr+1)+', residuals: '+g_r)
+            if max(g_res.values()) < g_tol:
+                logger.info('Solution converged')
                 break
+            J = self._get_coupled_jacobian(algs, X, R, props, x_old)
+            dX = self._solve_coupled(J, -R, n)
+            # Halve the step until the residual is sufficiently reduced
+            step = 1.0
+            for i in range(max_bt + 1):
+                X_new = X + step*dX
+                R_new = self._get_coupled_residual(algs, X_new, props_all,
+                                                   x_old)
+                if merit(R_new) <= (1 - 1e-4*step) * res:
+                    break
+                if i < max_bt:
+                    step = step/2
+                    self.stats['backtracks'] += 1
+            for i, alg in enumerate(algs):
+                x1 = X[i*Np:(i+1)*Np]
+                x2 = X_new[i*Np:(i+1)*Np]
+                g_res[alg.name] = np.sum(np.absolute(x1**2 - x2**2))
+            X, R = X_new, R_new
+            self.stats['iterations'] += 1
+            if callback is not None:
+                callback(itr+1, g_res.copy())
+
+    def _set_coupled_fields(self, algs, X, propnames):
+        r"""
+        Writes the fields in ``X`` on the algorithms and the phase, and
+        regenerates the given models so they use the new fields
+        """
+        phase = self.project.phases()[self.settings['phase']]
+        Np = algs[0].Np
+        for i, alg in enumerate(algs):
+            quantity = alg.settings['quantity']
+            alg[quantity] = X[i*Np:(i+1)*Np]
+            phase[quantity] = X[i*Np:(i+1)*Np]
+        self._regenerate_models(propnames, algs)
+
+    def _get_coupled_residual(self, algs, X, propnames, x_old=None):
+        r"""
+        Returns the residuals of all the algorithms for the fields in ``X``,
+        after regenerating the given models
+        """
+        phase = self.project.phases()[self.settings['phase']]
+        network = self.project.network
+        Np = algs[0].Np
+        self._set_coupled_fields(algs, X, propnames)
+        R = []
+        for i, alg in enumerate(algs):
+            x = X[i*Np:(i+1)*Np]
+            alg._build_A()
+            alg._build_b()
+            if (x_old is not None) and (alg.name in x_old.keys()):
+                f = network['pore.volume'] / self.settings['t_step']
+                alg._A.setdiag(alg._A.diagonal() + f)
+                alg.b += f * x_old[alg.name]
+            alg._apply_BCs()
+            r = alg.A * x - alg.b
+            # Source terms are evaluated at x, as in ``_apply_sources``
+            for item in alg.settings['sources']:
+                Ps = alg.pores(item)
+                r[Ps] -= phase[item + '.S1'][Ps] * x[Ps]
+                r[Ps] -= phase[item + '.S2'][Ps]
+            R.append(r)
+        return np.concatenate(R)
+
+    def _get_coupled_jacobian(self, algs, X, R, props, x_old=None):
+        r"""
+        Finds the Jacobian of the coupled residual by finite differences.
+
+        The residual in a pore only depends on the fields in that pore and
+        its neighbors, so all pores of the same color (i.e. no two of them
+        share a neighbor, see ``_get_jacobian_colors``) are perturbed at once.
+        Perturbing one field only requires the models depending on it to be
+        regenerated.  The Jacobian has one block per pair of algorithms, each
+        with the sparsity pattern of the network's adjacency matrix plus the
+        diagonal.
+        """
+        Np = algs[0].Np
+        n = len(algs)
+        rows, cols, colors = self._get_jacobian_colors()
+        eps = np.sqrt(np.finfo(float).eps)
+        vals = np.zeros((n, n, rows.size))
+        for k in range(n):
+            x = X[k*Np:(k+1)*Np]
+            h = eps * np.maximum(np.abs(x), 1.0)
+            for c in np.unique(colors):
+                Ps = colors == c
+                X_h = np.copy(X)
+                X_h[k*Np:(k+1)*Np] += h*Ps
+                R_h = self._get_coupled_residual(algs, X_h, props[k], x_old)
+                dR = (R_h - R).reshape(n, Np)
+                sel = Ps[cols]
+                vals[:, k, sel] = dR[:, rows[sel]] / h[cols[sel]]
+            # Restore the models that used the perturbed field
+            self._set_coupled_fields(algs, X, props[k])
+        blocks = [[sprs.csr_matrix((vals[m, k], (rows, cols)), shape=(Np, Np))
+                   for k in range(n)] for m in range(n)]
+        return sprs.bmat(blocks, format='csr')
+
+    def _get_jacobian_colors(self):
+        r"""
+        Returns the rows and columns of the nonzero entries of the adjacency
+        matrix plus the diagonal, along with a color for each pore such that
+        no two pores within 2 throats of each other share the same color.  The
+        result is stored until the topology changes.
+        """
+        import networkx as nx
+        network = self.project.network
+        conns = network['throat.conns']
+        cache = getattr(self, '_jacobian_colors', None)
+        if (cache is not None) and (cache[0] is conns):
+            return cache[1]
+        Np = network.Np
+        am = network.create_adjacency_matrix(fmt='csr')
+        M = (am + sprs.identity(Np, format='csr')).tocsr()
+        M.sum_duplicates()
+        M.sort_indices()
+        rows = np.repeat(np.arange(Np), np.diff(M.indptr))
+        cols = M.indices.astype(int)
+        M2 = (M * M).tocoo()
+        G = nx.Graph()
+        G.add_nodes_from(range(Np))
+        G.add_edges_from(zip(M2.row[M2.row != M2.col],
+                             M2.col[M2.row != M2.col]))
+        d = nx.greedy_color(G)
+        colors = np.array([d[i] for i in range(Np)], dtype=int)
+        self._jacobian_colors = (conns, (rows, cols, colors))
+        return rows, cols, colors
+
+    def _solve_coupled(self, J, b, n):
+        r"""
+        Solves ``J*x = b`` using GMRES, preconditioned by the block lower
+        triangular part of ``J``.  Each diagonal block is factorized once, so
+        applying the preconditioner only requires triangular solves.
+        """
+        Np = J.shape[0] // n
+        J = J.tocsr()
+        blocks = [[J[m*Np:(m+1)*Np, k*Np:(k+1)*Np] for k in range(m + 1)]
+                  for m in range(n)]
+        lus = [spla.splu(blocks[m][m].tocsc()) for m in range(n)]
+
+        def precondition(r):
+            self.stats['krylov_iterations'] += 1
+            y = []
+            for m in range(n):
+                rm = np.copy(r[m*Np:(m+1)*Np])
+                for k in range(m):
+                    rm -= blocks[m][k] * y[k]
+                y.append(lus[m].solve(rm))
+            return np.concatenate(y)
+
+        M = spla.LinearOperator(J.shape, matvec=precondition)
+        tol = self.settings['newton_krylov_tol']
+        try:
+            x, exit_code = spla.gmres(J, b, M=M, atol=0.0, restart=50,
+                                      rtol=tol)
+        except TypeError:  # SciPy < 1.12 names the relative tolerance tol
+            x, exit_code = spla.gmres(J, b, M=M, atol=0.0, restart=50,
+                                      tol=tol)
+        if exit_code < 0:
+            raise Exception(f'GMRES failed, exit code: {exit_code}')
+        if exit_code > 0:
+            logger.warning(f'GMRES did not converge, exit code: {exit_code}')
+        return x
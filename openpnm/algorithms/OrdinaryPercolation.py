@@ -1,10 +1,8 @@
-import scipy as sp
 import numpy as np
 from collections import namedtuple
 from openpnm.algorithms import GenericAlgorithm
-from openpnm.topotools import site_percolation, bond_percolation
-from openpnm.topotools import remove_isolated_clusters, ispercolating
-from openpnm.utils import logging
+from openpnm.topotools import ispercolating
+from openpnm.utils import logging, jit_kernel
 logger = logging.getLogger(__name__)
 
 
@@ -213,7 +211,7 @@ class OrdinaryPercolation(GenericAlgorithm):
         if overwrite:
             self['pore.inlets'] = False
         self['pore.inlets'][Ps] = True
-        self['pore.invasion_pressure'][Ps] = sp.inf
+        self['pore.invasion_pressure'][Ps] = np.inf
         self['pore.invasion_sequence'][Ps] = -1
 
     def set_outlets(self, pores=[], overwrite=False):
@@ -337,12 +335,14 @@ class OrdinaryPercolation(GenericAlgorithm):
 
         Parameters
         ----------
-        points: int or array_like
+        points: int, array_like or None
             An array containing the pressure points to apply.  If a scalar is
             given then an array will be generated with the given number of
             points spaced between the lowest and highest values of
             throat entry pressures using logarithmic spacing.  To specify low
             and high pressure points use the ``start`` and ``stop`` arguments.
+            If ``None`` the exact pressure at which each pore and throat is
+            invaded is found.
 
         start : int
             The optional starting point to use when generating pressure points.
@@ -354,8 +354,15 @@ class OrdinaryPercolation(GenericAlgorithm):
             If not given, then twice the highest capillary entry pressure in
             the network is used.
 
-        Note
-        ----
+        Notes
+        -----
+        The exact invasion pressure of every pore and throat is found in a
+        single sweep through the entry pressures in increasing order, with a
+        disjoint-set (union-find) structure tracking which clusters are
+        connected to the inlets.  When ``points`` are given, these pressures
+        are rounded up to the next point, which gives the same result as
+        applying each of the points in turn.
+
         The inlet sites are set to invaded to start the simulation.  This means
         that if 'internal' pores are used as inlets the capillary pressure
         curve will begin at a non-zero invading phase saturation.  To avoid
@@ -385,38 +392,25 @@ class OrdinaryPercolation(GenericAlgorithm):
         if type(points) is int:
             points = np.logspace(start=np.log10(max(1, start)),
                                  stop=np.log10(stop), num=points)
-        self._points = points
 
         # Ensure pore inlets have been set IF access limitations is True
         if self.settings['access_limited']:
             if np.sum(self['pore.inlets']) == 0:
                 raise Exception('Inlet pores must be specified first')
-            else:
-                Pin = self['pore.inlets']
-
-        # Generate curve from points
-        conns = self.project.network['throat.conns']
-        for inv_val in points:
-            if self.settings['mode'] == 'bond':
-                t_invaded = self['throat.entry_pressure'] <= inv_val
-                labels = bond_percolation(conns, t_invaded)
-            elif self.settings['mode'] == 'site':
-                p_invaded = self['pore.entry_pressure'] <= inv_val
-                labels = site_percolation(conns, p_invaded)
-
-            # Optionally remove clusters not connected to the inlets
-            if self.settings['access_limited']:
-                labels = remove_isolated_clusters(labels=labels,
-                                                  inlets=Pin)
-
-            # Store current applied pressure in newly invaded pores
-            pinds = (self['pore.invasion_pressure'] == sp.inf) * \
-                    (labels.sites >= 0)
-            self['pore.invasion_pressure'][pinds] = inv_val
-            # Store current applied pressure in newly invaded throats
-            tinds = (self['throat.invasion_pressure'] == sp.inf) * \
-                    (labels.bonds >= 0)
-            self['throat.invasion_pressure'][tinds] = inv_val
+
+        # Find the exact invasion pressure of every pore and throat
+        Pinv, Tinv = self._find_invasion_pressures()
+        if points is None:
+            points = np.unique(np.hstack((Pinv, Tinv)))
+            points = points[np.isfinite(points)]
+        else:
+            # Round the pressures up to the next of the given points
+            points = np.sort(np.array(points, dtype=float))
+            Pinv = self._resample(Pinv, points)
+            Tinv = self._resample(Tinv, points)
+        self._points = points
+        self['pore.invasion_pressure'] = Pinv
+        self['throat.invasion_pressure'] = Tinv
 
         # Convert invasion pressures in sequence values
         Pinv = self['pore.invasion_pressure']
@@ -426,6 +420,66 @@ class OrdinaryPercolation(GenericAlgorithm):
         self['pore.invasion_sequence'] = Pseq
         self['throat.invasion_sequence'] = Tseq
 
+    def _find_invasion_pressures(self):
+        r"""
+        Finds the lowest applied pressure at which each pore and throat is
+        invaded.
+
+        Returns
+        -------
+        A tuple containing the Np long pore and Nt long throat invasion
+        pressures, which are ``inf`` for locations that are never invaded.
+
+        Notes
+        -----
+        A pore is invaded once it is connected to an invaded throat (in
+        'bond' mode) or once it is invaded itself (in 'site' mode), and, if
+        ``access_limited``, its cluster contains an inlet.  A throat is
+        invaded once both its pores are invaded, or, in 'bond' mode, once it
+        is invaded itself and one of its pores is invaded.
+        """
+        net = self.project.network
+        conns = net['throat.conns']
+        mode = self.settings['mode']
+        if mode == 'bond':
+            entry = self['throat.entry_pressure']
+            if self.settings['access_limited']:
+                kernel = jit_kernel(_bond_sweep)
+                Pinv = kernel(np.argsort(entry, kind='stable'),
+                              entry.astype(float), conns,
+                              self['pore.inlets'], net.Np)
+            else:
+                # Pores are invaded by their most easily invaded throat
+                Pinv = np.full(net.Np, np.inf)
+                np.minimum.at(Pinv, conns[:, 0], entry)
+                np.minimum.at(Pinv, conns[:, 1], entry)
+            Pa, Pb = Pinv[conns[:, 0]], Pinv[conns[:, 1]]
+            Tinv = np.minimum(np.maximum(entry, np.minimum(Pa, Pb)),
+                              np.maximum(Pa, Pb))
+        elif mode == 'site':
+            entry = self['pore.entry_pressure']
+            if self.settings['access_limited']:
+                am = net.create_adjacency_matrix(fmt='csr')
+                kernel = jit_kernel(_site_sweep)
+                Pinv = kernel(np.argsort(entry, kind='stable'),
+                              entry.astype(float), am.indptr, am.indices,
+                              self['pore.inlets'], net.Np)
+            else:
+                Pinv = np.array(entry, dtype=float)
+            Tinv = np.amax(Pinv[conns], axis=1)
+        else:
+            raise Exception('Percolation type has not been set')
+        return Pinv, Tinv
+
+    def _resample(self, vals, points):
+        r"""
+        Rounds the given pressures up to the next of the sorted ``points``,
+        or to ``inf`` if they are higher than all the points.
+        """
+        ind = np.searchsorted(points, vals, side='left')
+        points = np.append(points, np.inf)
+        return points[ind]
+
     def get_intrusion_data(self, Pc=None):
         r"""
         Obtain the numerical values of the calculated intrusion curve
@@ -527,3 +581,87 @@ class OrdinaryPercolation(GenericAlgorithm):
             inv_phase['pore.invasion_pressure'] = Ppressure
             inv_phase['throat.invasion_pressure'] = Tpressure
         return inv_phase
+
+
+def _bond_sweep(order, entry, conns, inlets, Np):
+    # Access limited bond percolation, see OrdinaryPercolation.run
+    parent = np.arange(Np)
+    size = np.ones(Np, dtype=np.int64)
+    has_inlet = inlets.copy()
+    # Members of each cluster are kept as a linked list starting at its root
+    nxt = -np.ones(Np, dtype=np.int64)
+    tail = np.arange(Np)
+    p_inv = np.full(Np, np.inf)
+    for t in order:
+        a = conns[t, 0]
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        b = conns[t, 1]
+        while parent[b] != b:
+            parent[b] = parent[parent[b]]
+            b = parent[b]
+        if a == b:
+            continue
+        if has_inlet[a] or has_inlet[b]:
+            # Invade the clusters that were not yet connected to an inlet
+            for r in (a, b):
+                if not (has_inlet[r] and size[r] > 1):
+                    i = r
+                    while i != -1:
+                        p_inv[i] = entry[t]
+                        i = nxt[i]
+        if size[a] < size[b]:
+            a, b = b, a
+        parent[b] = a
+        size[a] += size[b]
+        has_inlet[a] = has_inlet[a] or has_inlet[b]
+        nxt[tail[a]] = b
+        tail[a] = tail[b]
+    return p_inv
+
+
+def _site_sweep(order, entry, indptr, indices, inlets, Np):
+    # Access limited site percolation, see OrdinaryPercolation.run
+    parent = np.arange(Np)
+    size = np.ones(Np, dtype=np.int64)
+    has_inlet = inlets.copy()
+    active = np.zeros(Np, dtype=np.bool_)
+    # Members of each cluster are kept as a linked list starting at its root
+    nxt = -np.ones(Np, dtype=np.int64)
+    tail = np.arange(Np)
+    p_inv = np.full(Np, np.inf)
+    for p in order:
+        active[p] = True
+        for q in indices[indptr[p]:indptr[p+1]]:
+            if not active[q]:
+                continue
+            a = p
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            b = q
+            while parent[b] != b:
+                parent[b] = parent[parent[b]]
+                b = parent[b]
+            if a == b:
+                continue
+            if has_inlet[a] != has_inlet[b]:
+                # Invade the cluster that was not yet connected to an inlet
+                i = b if has_inlet[a] else a
+                while i != -1:
+                    p_inv[i] = entry[p]
+                    i = nxt[i]
+            if size[a] < size[b]:
+                a, b = b, a
+            parent[b] = a
+            size[a] += size[b]
+            has_inlet[a] = has_inlet[a] or has_inlet[b]
+            nxt[tail[a]] = b
+            tail[a] = tail[b]
+        r = p
+        while parent[r] != r:
+            r = parent[r]
+        if has_inlet[r] and (p_inv[p] == np.inf):
+            p_inv[p] = entry[p]
+    return p_inv
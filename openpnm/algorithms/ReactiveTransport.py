@@ -1,4 +1,6 @@
+import threading
 import numpy as np
+import scipy.sparse as sprs
 from numpy.linalg import norm
 from openpnm.algorithms import GenericTransport
 # Uncomment this line when we stop supporting Python 3.6
@@ -62,6 +64,20 @@ class ReactiveTransportSettings(GenericSettings):
         falls below 'rxn_tolerance'.
     max_iter : (int)
         ##
+    nonlinear_solver : str (default = 'picard')
+        The method used to solve non-linear problems.  Options are 'picard',
+        which repeatedly solves the system linearized at the latest guess
+        (using the relaxation factors above), and 'newton', which uses
+        Newton's method with a backtracking line search, and ignores the
+        relaxation factors.
+    newton_fd_jacobian : bool (default = ``False``)
+        If ``True`` the Jacobian used by Newton's method includes the change
+        in conductance with 'quantity', found by finite differences.  This is
+        only needed when the conductances depend on 'quantity', and also
+        requires ``cache_A`` to be ``False``.
+    newton_max_backtracks : int (default = 10)
+        The number of times a Newton step can be halved by the line search
+        before accepting it anyway.
 
     ----
 
@@ -71,6 +87,9 @@ class ReactiveTransportSettings(GenericSettings):
     """
 
     max_iter = 5000
+    nonlinear_solver = 'picard'
+    newton_fd_jacobian = False
+    newton_max_backtracks = 10
     # relaxation = RelaxationSettings()
     relaxation_source = 1.0
     relaxation_quantity = 1.0
@@ -106,6 +125,8 @@ class ReactiveTransport(GenericTransport):
         self.settings.update(settings)
         if phase is not None:
             self.setup(phase=phase)
+        # Iteration counts and residuals of the last call to run
+        self.stats = {'iterations': 0, 'backtracks': 0, 'residuals': []}
 
     @docstr.get_sectionsf('ReactiveTransport.setup',
                           sections=['Parameters', 'Notes'])
@@ -185,16 +206,22 @@ class ReactiveTransport(GenericTransport):
         d = self.settings["variable_props"]
         self.settings["variable_props"] = list(set(d) | set(propnames))
 
-    def _find_iterative_props(self):
+    def _find_iterative_props(self, base_props=None):
         r"""
         Find and return properties that need to be iterated while running the
         algorithm
 
         Parameters
         ----------
-        propnames : string or list of strings
-            The propnames of the properties that are variable throughout
-            the algorithm.
+        base_props : list of strings, optional
+            The propnames whose downstream properties are sought.  If not
+            given, ``quantity`` and the ``variable_props`` listed in
+            ``settings`` are used.
+
+        Returns
+        -------
+        A list of the propnames that depend on ``base_props``, sorted in the
+        order in which their models should be regenerated.
 
         """
         import networkx as nx
@@ -207,8 +234,10 @@ class ReactiveTransport(GenericTransport):
             dg = nx.compose(dg, g.models.dependency_graph(deep=True))
         for p in physics:
             dg = nx.compose(dg, p.models.dependency_graph(deep=True))
-        base_props = [self.settings["quantity"]] + self.settings["variable_props"]
         if base_props is None:
+            base_props = ([self.settings["quantity"]]
+                          + self.settings["variable_props"])
+        if len(base_props) == 0:
             return []
         # Find all props downstream that rely on "quantity" (if at all)
         dg = nx.DiGraph(nx.edge_dfs(dg, source=base_props))
@@ -321,6 +350,9 @@ class ReactiveTransport(GenericTransport):
         """
         phase = self.project.phases()[self.settings['phase']]
         w = self.settings['relaxation_source']
+        # Newton's method needs the source terms at the current guess
+        if self.settings['nonlinear_solver'] == 'newton':
+            w = 1.0
 
         for item in self.settings['sources']:
             element, prop = item.split(".")
@@ -353,6 +385,11 @@ class ReactiveTransport(GenericTransport):
         ----------
         x : ND-array
             Initial guess of unknown variable
+
+        Notes
+        -----
+        The number of iterations and the residual after each one are stored
+        in the ``stats`` attribute.
         """
         quantity = self.settings['quantity']
         logger.info('Running ReactiveTransport')
@@ -360,10 +397,41 @@ class ReactiveTransport(GenericTransport):
         # Create S1 & S2 for the 1st Picard iteration
         if x0 is None:
             x0 = np.zeros(self.Np, dtype=float)
-        x = self._run_reactive(x0)
+        self.stats = {'iterations': 0, 'backtracks': 0, 'residuals': []}
+        method = self.settings['nonlinear_solver']
+        if method == 'picard':
+            x = self._run_reactive(x0)
+        elif method == 'newton':
+            x = self._run_newton(x0)
+        else:
+            raise Exception(f'{method} is not a valid nonlinear_solver')
         self[quantity] = x
 
-    def _run_reactive(self, x0):
+    @docstr.dedent
+    def run_batch(self, values=None, rates=None, pores=None):
+        r"""
+        %(GenericTransport.run_batch.full_desc)s
+
+        Parameters
+        ----------
+        %(GenericTransport.run_batch.parameters)s
+
+        Returns
+        -------
+        %(GenericTransport.run_batch.returns)s
+
+        Notes
+        -----
+        Since the cases are solved without iterating, this raises an error if
+        any source terms or variable properties are present.
+
+        """
+        if self.settings['sources'] or self._find_iterative_props():
+            raise Exception('run_batch only supports linear problems, but '
+                            + 'source terms or variable props were found')
+        return super().run_batch(values=values, rates=rates, pores=pores)
+
+    def _run_reactive(self, x0, lock=None):
         r"""
         Repeatedly updates ``A``, ``b``, and the solution guess within according
         to the applied source term then calls ``_solve`` to solve the resulting
@@ -376,6 +444,11 @@ class ReactiveTransport(GenericTransport):
         ----------
         x0 : ND-array
             Initial guess of unknown variable
+        lock : threading.Lock, optional
+            A lock that is held while the phase and physics are updated and
+            ``A`` and ``b`` are built, so that several algorithms sharing a
+            phase can be run in separate threads.  Only the calls to
+            ``_solve`` are made without holding it.
 
         Returns
         -------
@@ -393,30 +466,185 @@ class ReactiveTransport(GenericTransport):
         w = self.settings['relaxation_quantity']
         quantity = self.settings['quantity']
         max_it = self.settings['max_iter']
-        # Write initial guess to algorithm obj (for _update_iterative_props to work)
-        self[quantity] = x = x0
+        lock = threading.Lock() if lock is None else lock
+        x = x0
 
         for itr in range(max_it):
-            # Update iterative properties on phase and physics
-            self._update_iterative_props()
-            # Build A and b, apply BCs/source terms
-            self._build_A()
-            self._build_b()
-            self._apply_BCs()
-            self._apply_sources()
-            # Check solution convergence
-            res = self._get_residual()
-            if itr >= 1 and self._is_converged():
+            with lock:
+                # Write guess to algorithm obj (for _update_iterative_props)
+                self[quantity] = x
+                # Update iterative properties on phase and physics
+                self._update_iterative_props()
+                # Build A and b, apply BCs/source terms
+                self._build_A()
+                self._build_b()
+                self._apply_BCs()
+                self._apply_sources()
+                # Check solution convergence
+                res = self._get_residual()
+                self.stats['residuals'].append(res)
+                converged = itr >= 1 and self._is_converged()
+            if converged:
                 logger.info(f'Solution converged: {res:.4e}')
                 return x
             logger.info(f'Tolerance not met: {res:.4e}')
             # Solve, use relaxation, and update solution on algorithm obj
-            self[quantity] = x = self._solve(x0=x) * w + x * (1 - w)
+            x = self._solve(x0=x) * w + x * (1 - w)
+            self.stats['iterations'] += 1
+        with lock:
+            self[quantity] = x
 
         # Check solution convergence after max_it iterations
         if not self._is_converged():
             raise Exception(f"Not converged after {max_it} iterations.")
 
+    def _run_newton(self, x0):
+        r"""
+        Solves the non-linear system using Newton's method, with a
+        backtracking line search to ensure each step reduces the residual.
+
+        Parameters
+        ----------
+        x0 : ND-array
+            Initial guess of unknown variable
+
+        Returns
+        -------
+        x : ND-array
+            Solution array.
+
+        Notes
+        -----
+        The residual is ``A*x - b`` with the source terms applied at ``x``.
+        Since ``S1`` is the slope of the source terms, the Jacobian is the
+        same **A** matrix, unless ``newton_fd_jacobian`` is ``True`` in which
+        case the change in conductance with ``x`` is also included.  A full
+        step is therefore the same as one Picard iteration without relaxation,
+        but steps that do not reduce the residual are halved.
+
+        """
+        max_it = self.settings['max_iter']
+        max_bt = self.settings['newton_max_backtracks']
+        x = x0
+        R = self._get_newton_residual(x)
+        for itr in range(max_it):
+            res = norm(R)
+            self.stats['residuals'].append(res)
+            if itr >= 1 and self._is_converged():
+                logger.info(f'Solution converged: {res:.4e}')
+                return x
+            logger.info(f'Tolerance not met: {res:.4e}')
+            # Find the Newton step by solving J*dx = -R
+            if self.settings['newton_fd_jacobian']:
+                J = self.A + self._get_conductance_jacobian(x)
+                dx = self._solve(A=J, b=J*x - R, x0=x) - x
+            else:
+                dx = self._solve(x0=x) - x
+            # Halve the step until the residual is sufficiently reduced
+            step = 1.0
+            for i in range(max_bt + 1):
+                x_new = x + step*dx
+                R_new = self._get_newton_residual(x_new)
+                if norm(R_new) <= (1 - 1e-4*step) * res:
+                    break
+                if i < max_bt:
+                    step = step/2
+                    self.stats['backtracks'] += 1
+            x, R = x_new, R_new
+            self.stats['iterations'] += 1
+
+        # Check solution convergence after max_it iterations
+        if not self._is_converged():
+            raise Exception(f"Not converged after {max_it} iterations.")
+        return x
+
+    def _get_newton_residual(self, x):
+        r"""
+        Updates the iterative props, A and b for the given ``x``, and returns
+        the residual vector ``A*x - b``.
+        """
+        self[self.settings['quantity']] = x
+        self._update_iterative_props()
+        self._build_A()
+        self._build_b()
+        self._apply_BCs()
+        self._apply_sources()
+        return self.A * x - self.b
+
+    def _get_conductance_jacobian(self, x):
+        r"""
+        Finds the change in ``A*x`` due to the change in conductances with
+        ``x`` by finite differences.
+
+        Each throat's conductance is assumed to depend only on the value of
+        ``x`` in its two pores, so all pores of the same color (i.e. no two
+        of them are neighbors) can be perturbed at once.  The iterative props
+        are regenerated once per color, plus once more to restore them.
+        """
+        network = self.project.network
+        phase = self.project.phases()[self.settings['phase']]
+        quantity = self.settings['quantity']
+        gname = self.settings['conductance']
+        P1, P2 = network['throat.conns'].T
+        Nt = network.Nt
+        # The values in BC pores are those held fixed in b
+        bc = np.isfinite(self['pore.bc_value'])
+        xf = np.copy(x)
+        xf[bc] = self['pore.bc_value'][bc]
+
+        def flux(g):
+            g = np.array(g, dtype=float)
+            if g.shape == (Nt, 2):
+                g12, g21 = g[:, 0], g[:, 1]
+            elif g.shape == (2*Nt, ):
+                g12, g21 = g[:Nt], g[Nt:]
+            else:
+                g12 = g21 = g
+            return g21*xf[P1] - g12*xf[P2]
+
+        q0 = flux(phase[gname])
+        eps = np.sqrt(np.finfo(float).eps)
+        h = eps * np.maximum(np.abs(x), np.abs(x).max())
+        h[h == 0] = eps
+        dq1 = np.zeros(Nt)
+        dq2 = np.zeros(Nt)
+        colors = self._get_pore_colors()
+        for c in np.unique(colors):
+            Ps = colors == c
+            self[quantity] = x + h*Ps
+            self._update_iterative_props()
+            dq = flux(phase[gname]) - q0
+            dq1[Ps[P1]] = dq[Ps[P1]] / h[P1[Ps[P1]]]
+            dq2[Ps[P2]] = dq[Ps[P2]] / h[P2[Ps[P2]]]
+        self[quantity] = x
+        self._update_iterative_props()
+        # Each throat adds q to the residual of P1 and -q to that of P2
+        rows = np.hstack((P1, P1, P2, P2))
+        cols = np.hstack((P1, P2, P1, P2))
+        vals = np.hstack((dq1, dq2, -dq1, -dq2))
+        keep = ~bc[rows] * ~bc[cols]
+        J = sprs.coo_matrix((vals[keep], (rows[keep], cols[keep])),
+                            shape=(self.Np, self.Np))
+        return J.tocsr()
+
+    def _get_pore_colors(self):
+        r"""
+        Assigns a color to each pore so that no two neighboring pores share
+        the same color.  The result is stored until the topology changes.
+        """
+        import networkx as nx
+        conns = self.project.network['throat.conns']
+        cache = getattr(self, '_pore_colors', None)
+        if (cache is not None) and (cache[0] is conns):
+            return cache[1]
+        G = nx.Graph()
+        G.add_nodes_from(range(self.Np))
+        G.add_edges_from(conns)
+        d = nx.greedy_color(G)
+        colors = np.array([d[i] for i in range(self.Np)], dtype=int)
+        self._pore_colors = (conns, colors)
+        return colors
+
     def _is_converged(self):
         r"""
         Check if solution has converged based on the following criterion:
@@ -1,6 +1,6 @@
 import numpy as np
 from openpnm.algorithms import NernstPlanckMultiphysics
-from openpnm.utils import logging, Docorator, GenericSettings, nbr_to_str
+from openpnm.utils import logging, Docorator, GenericSettings
 docstr = Docorator()
 logger = logging.getLogger(__name__)
 
@@ -81,6 +81,8 @@ class TransientNernstPlanckMultiphysics(NernstPlanckMultiphysics):
         """
         print('―'*80)
         print('Running TransientIonicTransport')
+        self.stats = {'iterations': 0, 'backtracks': 0,
+                      'krylov_iterations': 0, 'residuals': []}
         # Phase, potential and ions algorithms
         phase = self.project.phases()[self.settings['phase']]
         p_alg = self.project.algorithms()[self.settings['potential_field']]
@@ -149,6 +151,10 @@ class TransientNernstPlanckMultiphysics(NernstPlanckMultiphysics):
         s = self.settings['t_scheme']
         g_tol = self.settings['g_tol']
         g_max_iter = int(self.settings['g_max_iter'])
+        newton = self.settings['nonlinear_solver'] == 'newton'
+        if newton and (s not in ['implicit', 'steady']):
+            raise Exception('The newton nonlinear_solver only supports the '
+                            + 'implicit and steady t_scheme')
         # Initialize residuals & old/new fields for time marching
         t_res = {}
         t_old = {}
@@ -181,10 +187,9 @@ class TransientNernstPlanckMultiphysics(NernstPlanckMultiphysics):
 
         else:  # Do time iterations
             # Export the initial field (t=t_initial)
-            t_str = nbr_to_str(nbr=t, t_precision=self.settings['t_precision'])
             for alg in algs:
-                quant_init = alg[alg.settings['quantity']]
-                alg[alg.settings['quantity']+'@'+t_str] = quant_init
+                alg._t_init_storage(n_times=out.size + 1)
+                alg._t_store(t, alg[alg.settings['quantity']])
             for time in np.arange(t+dt, tf+dt, dt):
                 t_r = [float(format(i, '.3g')) for i in t_res.values()]
                 t_r = str(t_r)[1:-1]
@@ -196,6 +201,11 @@ class TransientNernstPlanckMultiphysics(NernstPlanckMultiphysics):
                     for alg in algs:  # Save the current fields
                         t_old[alg.name] = alg[alg.settings['quantity']].copy()
 
+                    if newton:
+                        # Solve for all the fields at once at the new time
+                        x_old = {e.name: t_old[e.name] for e in e_alg}
+                        self._run_newton(algs, x_old=x_old)
+
                     # Initialize residuals & old/new fields for Gummel iterats
                     g_res = {}
                     g_old = {}
@@ -206,7 +216,7 @@ class TransientNernstPlanckMultiphysics(NernstPlanckMultiphysics):
                         g_new[alg.name] = None
 
                     # Iterate (Gummel) until solutions converge
-                    for itr in range(g_max_iter):
+                    for itr in range(0 if newton else g_max_iter):
                         g_r = [float(format(i, '.3g')) for i in g_res.values()]
                         g_r = str(g_r)[1:-1]
                         print('Start Gummel iter: ' + str(itr+1)
@@ -254,39 +264,35 @@ class TransientNernstPlanckMultiphysics(NernstPlanckMultiphysics):
                     # Output transient solutions. Round time to ensure every
                     # value in outputs is exported.
                     if round(time, t_pre) in out:
-                        t_str = nbr_to_str(nbr=time,
-                                           t_precision=self.settings['t_precision'])
                         print('\nExporting time step: ' + str(time) + ' s')
                         for alg in algs:
-                            alg[alg.settings['quantity']+'@'+t_str] = (
-                                t_new[alg.name])
-
-                    # Update A matrix of the steady sys of eqs (WITHOUT BCs)
-                    for e in e_alg:
-                        # Update conductance first
-                        physics = e.project.find_physics(phase=phase)
-                        for ph in physics:
-                            ph.regenerate_models()
-                        # Update A matrix
-                        e._build_A()
-                        e._A_steady = (e._A).copy()
-
-                    # Update A and b and apply BCs
-                    for e in e_alg:
-                        e._t_update_A()
-                        e._t_update_b()
-                        e._apply_BCs()
-                        e._A_t = (e._A).copy()
-                        e._b_t = (e._b).copy()
+                            alg._t_store(time, t_new[alg.name])
+
+                    # The Newton solver builds its own A and b
+                    if not newton:
+                        # Update A matrix of the steady sys of eqs (no BCs)
+                        for e in e_alg:
+                            # Update conductance first
+                            physics = e.project.find_physics(phase=phase)
+                            for ph in physics:
+                                ph.regenerate_models()
+                            # Update A matrix
+                            e._build_A()
+                            e._A_steady = (e._A).copy()
+
+                        # Update A and b and apply BCs
+                        for e in e_alg:
+                            e._t_update_A()
+                            e._t_update_b()
+                            e._apply_BCs()
+                            e._A_t = (e._A).copy()
+                            e._b_t = (e._b).copy()
 
                 else:  # Stop time iterations if residual < t_tolerance
                     # Output steady state solution
-                    t_str = nbr_to_str(nbr=time,
-                                       t_precision=self.settings['t_precision'])
                     print('\nExporting time step: '+str(time)+' s')
                     for alg in algs:
-                        alg[alg.settings['quantity']+'@'+t_str] = (
-                            t_new[alg.name])
+                        alg._t_store(time, t_new[alg.name])
                     break
             if (round(time, t_pre) == tf):
                 print('\nMaximum time step reached: '+str(time)+' s')
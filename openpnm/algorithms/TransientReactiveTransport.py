@@ -2,7 +2,7 @@ import numpy as np
 import scipy.sparse as sprs
 from decimal import Decimal as dc
 from openpnm.algorithms import ReactiveTransport
-from openpnm.utils import logging, GenericSettings, Docorator
+from openpnm.utils import logging, GenericSettings, Docorator, TimeSeries
 docstr = Docorator()
 logger = logging.getLogger(__name__)
 
@@ -51,6 +51,8 @@ class TransientReactiveTransportSettings(GenericSettings):
         't_final') when the residual falls below 't_tolerance'. The
         default value is 1e-06. The 'residual' measures the variation from
         one time-step to another in the value of the 'quantity' solved for.
+        In adaptive mode it is instead the residual of the steady system of
+        equations, relative to the norm of its right-hand side.
     rxn_tolerance : scalar
         Tolerance to achieve within each time step. The solver passes to
         next time step when 'residual' falls below 'rxn_tolerance'. The
@@ -62,6 +64,46 @@ class TransientReactiveTransportSettings(GenericSettings):
         to perform a steady-state simulation, and 'implicit' (fast, 1st
         order accurate) and 'cranknicolson' (slow, 2nd order accurate) both
         for transient simulations. The default value is 'implicit'.
+    t_adaptive : boolean
+        If ``True`` the time step is adjusted to keep the estimated error of
+        each step within 't_rtol' and 't_atol', starting from 't_step'.  The
+        error is estimated by comparing the 'implicit' and 'cranknicolson'
+        solutions of each step.  Steps are shortened as needed to land on the
+        output times.  The default value is ``False``.
+    t_rtol : scalar
+        Relative error allowed per time step in adaptive mode. The default
+        value is 1e-03.
+    t_atol : scalar
+        Absolute error allowed per time step in adaptive mode. The default
+        value is 1e-06.
+    t_step_min : scalar
+        The smallest time step allowed in adaptive mode.  Steps are accepted
+        at this size even if the error is too large.  The default value is
+        ``None``, meaning 1e-12 times the simulated duration.
+    t_step_max : scalar
+        The largest time step allowed in adaptive mode.  The default value is
+        ``None``, meaning no limit.
+    t_storage : string
+        How the transient solutions at the output times are stored. Options
+        are:
+
+        'keys' : (default) Each output is stored on the object as a separate
+        array under ``quantity@time``
+
+        'array' : All outputs are stored in a single preallocated array,
+        which is faster and more compact for many output times
+
+        'memmap' : As 'array' but in a memory-mapped file, for results that
+        do not fit in memory
+
+        'hdf5' : As 'array' but in an HDF5 file, for results that do not fit
+        in memory
+
+        With all options the outputs can be retrieved using
+        ``alg['quantity@time']`` or the ``results`` method.
+    t_storage_file : string
+        The file used by the 'memmap' and 'hdf5' storage options.  The
+        default is ``None``, which creates a temporary file.
 
     ----
 
@@ -86,6 +128,13 @@ class TransientReactiveTransportSettings(GenericSettings):
     rxn_tolerance = 1e-05
     t_precision = 12
     t_scheme = 'implicit'
+    t_adaptive = False
+    t_rtol = 1e-03
+    t_atol = 1e-06
+    t_step_min = None
+    t_step_max = None
+    t_storage = 'keys'
+    t_storage_file = None
 
 
 class TransientReactiveTransport(ReactiveTransport):
@@ -115,9 +164,24 @@ class TransientReactiveTransport(ReactiveTransport):
         self.settings._update_settings_and_docs(TransientReactiveTransportSettings)
         self.settings.update(settings)
         self._A_steady = None  # Initialize the steady sys of eqs A matrix
+        self._t_results = None  # Initialize the compact storage of outputs
         if phase is not None:
             self.setup(phase=phase)
 
+    def __getitem__(self, key):
+        # Outputs kept in compact storage are retrieved from there
+        store = getattr(self, '_t_results', None)
+        if (store is not None) and ('@' in key):
+            prop, t = key.split('@', 1)
+            try:
+                t = float(t)
+            except ValueError:
+                t = None
+            if (prop == self.settings['quantity']) and (t is not None) \
+                    and (t in store):
+                return store[t]
+        return super().__getitem__(key)
+
     def setup(self, phase=None, quantity='', conductance='',
               t_initial=None, t_final=None, t_step=None, t_output=None,
               t_tolerance=None, t_precision=None, t_scheme='', **kwargs):
@@ -186,15 +250,80 @@ class TransientReactiveTransport(ReactiveTransport):
             f1, f2 = 0.5, 1
         elif (s == 'steady'):
             f1, f2 = 1, 0
-        # Compute A (operations involve conversion to 'csr')
-        A = ((f2/dt) * sprs.coo_matrix.multiply(
-            sprs.coo_matrix(np.reshape(Vi, (self.Np, 1)), shape=(self.Np, 1)),
-            sprs.identity(self.Np, format='coo')) + f1 * self._A_steady)
-        # Convert A to 'coo' format to apply BCs
-        A = sprs.coo_matrix(A)
+        # Compute A, which is kept in 'csr' format to apply BCs
+        A = (f1 * self._A_steady).tocsr()
+        A = A + sprs.diags((f2/dt) * Vi, format='csr')
         self._A = A
         return A
 
+    def _t_is_step_invariant(self):
+        r"""
+        Checks if the transient 'A' matrix is the same at every time step,
+        which is the case when there are no source terms nor iterative
+        properties.  The matrix and its factorization are then reused for
+        the whole simulation, and only 'b' is updated at each time step.
+        """
+        if self.settings['sources'] or self._find_iterative_props():
+            return False
+        return True
+
+    def _t_update_b_BCs(self):
+        r"""
+        Finds the contribution of the BCs to 'b', so that they can be applied
+        to 'b' at each time step without applying them to 'A' again.  Must be
+        called after ``_t_update_A`` and before ``_apply_BCs``.
+        """
+        A, b = self._A, self._b
+        # Apply the BCs to a zero 'b' and a copy of 'A' to isolate their effect
+        self._A = A.copy()
+        self._b = np.zeros(self.Np, dtype=float)
+        self._apply_BCs()
+        mask = np.zeros(self.Np, dtype=bool)
+        for item in ['pore.bc_value', 'pore.bc_rate']:
+            if item in self.keys():
+                mask |= np.isfinite(self[item])
+        self._b_BC = (self._b, mask)
+        self._A, self._b = A, b
+
+    def _t_apply_b_BCs(self, b):
+        r"""
+        Applies the BCs found by ``_t_update_b_BCs`` to the given 'b' array.
+        """
+        b_BC, mask = self._b_BC
+        b = np.copy(b)
+        b[mask] = 0.0
+        return b + b_BC
+
+    def _t_init_storage(self, n_times):
+        r"""
+        Prepares the storage of the outputs according to 't_storage', with
+        room for ``n_times`` output times.
+        """
+        if self._t_results is not None:
+            self._t_results.close()
+            self._t_results = None
+        storage = self.settings['t_storage']
+        if storage == 'keys':
+            return
+        # Outputs of earlier runs stored as keys would shadow the new ones
+        prefix = self.settings['quantity'] + '@'
+        for key in [k for k in self.keys() if k.startswith(prefix)]:
+            del self[key]
+        self._t_results = TimeSeries(Np=self.Np, n_times=n_times,
+                                     storage=storage,
+                                     filename=self.settings['t_storage_file'],
+                                     t_precision=self.settings['t_precision'])
+
+    def _t_store(self, t, x):
+        r"""
+        Stores the solution ``x`` as the output at time ``t``.
+        """
+        if self._t_results is None:
+            t_str = self._nbr_to_str(t)
+            self[self.settings['quantity'] + '@' + t_str] = x
+        else:
+            self._t_results.append(round(t, self.settings['t_precision']), x)
+
     def _t_update_b(self):
         r"""
         A method to update 'b' array at each time step according to
@@ -246,11 +375,16 @@ class TransientReactiveTransport(ReactiveTransport):
             self[self.settings['quantity']]
         except KeyError:
             self.set_IC(0)
-        # Save A matrix of the steady sys of eqs (WITHOUT BCs applied)
+        # Save A matrix of the steady sys of eqs (WITHOUT BCs applied), which
+        # is rebuilt since A holds the transient matrix after an earlier run
+        self._build_A()
         self._A_steady = (self.A).copy()
         # Initialize A and b with BCs applied
         self._t_update_A()
         self._t_update_b()
+        if self._t_is_step_invariant():
+            # A is kept for all time steps, so only 'b' needs the BCs later
+            self._t_update_b_BCs()
         self._apply_BCs()
         self._A_t = self._A.copy()
         self._b_t = self._b.copy()
@@ -292,6 +426,11 @@ class TransientReactiveTransport(ReactiveTransport):
         quantity = self.settings['quantity']
         s = self.settings['t_scheme']
         res_t = 1e+06  # Initialize the residual
+        invariant = self._t_is_step_invariant()
+
+        if self.settings['t_adaptive'] and (s != 'steady'):
+            self._run_adaptive(t=t)
+            return
 
         if type(to) in [float, int]:
             # Make sure 'tf' and 'to' are multiples of 'dt'
@@ -305,6 +444,7 @@ class TransientReactiveTransport(ReactiveTransport):
         out = np.append(out, tf)
         out = np.unique(out)
         out = np.around(out, decimals=t_pre)
+        self._t_init_storage(n_times=out.size + 1)
 
         if s == 'steady':  # If solver in steady mode, do one iteration
             logger.info('    Running in steady mode')
@@ -314,9 +454,7 @@ class TransientReactiveTransport(ReactiveTransport):
 
         else:  # Do time iterations
             # Export the initial field (t=t_initial)
-            t_str = self._nbr_to_str(t)
-            quant_init = self[quantity]
-            self[quantity + '@' + t_str] = quant_init
+            self._t_store(t, self[quantity])
             for time in np.arange(t+dt, tf+dt, dt):
                 if (res_t >= tol):  # Check if the steady state is reached
                     logger.info('    Current time step: ' + str(time) + ' s')
@@ -329,21 +467,22 @@ class TransientReactiveTransport(ReactiveTransport):
                     # Output transient solutions. Round time to ensure every
                     # value in outputs is exported.
                     if round(time, t_pre) in out:
-                        t_str = self._nbr_to_str(time)
-                        self[quantity + '@' + t_str] = x_new
+                        self._t_store(time, x_new)
                         logger.info('        Exporting time step: '
                                     + str(time) + ' s')
-                    # Update A and b and apply BCs
-                    self._t_update_A()
-                    self._t_update_b()
-                    self._apply_BCs()
-                    self._A_t = (self._A).copy()
-                    self._b_t = (self._b).copy()
+                    # Update A and b and apply BCs, A is reused if possible
+                    if invariant:
+                        self._b_t = self._t_apply_b_BCs(self._t_update_b())
+                    else:
+                        self._t_update_A()
+                        self._t_update_b()
+                        self._apply_BCs()
+                        self._A_t = (self._A).copy()
+                        self._b_t = (self._b).copy()
 
                 else:  # Stop time iterations if residual < t_tolerance
                     # Output steady state solution
-                    t_str = self._nbr_to_str(time)
-                    self[quantity + '@' + t_str] = x_new
+                    self._t_store(time, x_new)
                     logger.info('        Exporting time step: '
                                 + str(time) + ' s')
                     break
@@ -354,6 +493,140 @@ class TransientReactiveTransport(ReactiveTransport):
                 logger.info('    Transient solver converged after: '
                             + str(time) + ' s')
 
+    def _run_adaptive(self, t):
+        r"""
+        Performs a transient simulation with an adaptive time step.
+
+        Each step is solved with both the 'implicit' and 'cranknicolson'
+        schemes, and the difference between them is used as an estimate of
+        the error.  Steps with too large an error are rejected and retried
+        with a smaller step, while the step is increased after accurate
+        steps.  The solution of the scheme given by 't_scheme' is kept.
+
+        Parameters
+        ----------
+        t : scalar
+            The time to start the simulation from.
+
+        Notes
+        -----
+        The outputs are stored as in ``_run_transient``.  The number of steps
+        taken and rejected are stored in the ``stats`` attribute.  The first
+        step, of size 't_step', is taken with the 'implicit' scheme only and
+        without error control, since the initial field is usually not
+        consistent with the value BCs and the jump would otherwise cut the
+        step down to 't_step_min'.  The simulation stops when the residual of
+        the steady system of equations, relative to the norm of its
+        right-hand side, falls below 't_tolerance'.
+        """
+        tf = self.settings['t_final']
+        to = self.settings['t_output']
+        tol = self.settings['t_tolerance']
+        t_pre = self.settings['t_precision']
+        quantity = self.settings['quantity']
+        scheme = self.settings['t_scheme']
+        rtol = self.settings['t_rtol']
+        atol = self.settings['t_atol']
+        dt0 = dt = self.settings['t_step']
+        dt_min = self.settings['t_step_min']
+        if dt_min is None:
+            dt_min = 1e-12 * (tf - t)
+        dt_max = self.settings['t_step_max']
+        if dt_max is None:
+            dt_max = np.inf
+        # Find the output times, which the steps are clipped to land on
+        if type(to) in [float, int]:
+            out = np.arange(t+to, tf, to)
+        elif type(to) in [np.ndarray, list]:
+            out = np.array(to)
+        out = np.unique(np.around(np.append(out, tf), decimals=t_pre))
+        out = out[out > t]
+        self._t_init_storage(n_times=out.size + 1)
+
+        self.stats.update({'steps': 0, 'rejected': 0})
+        # Export the initial field (t=t_initial)
+        self._t_store(t, self[quantity])
+        x_old = np.copy(self[quantity])
+        time = t
+        steady = False
+        try:
+            for t_next in out:
+                while time < t_next:
+                    h = min(dt, t_next - time)
+                    x_ie = self._t_take_step(x_old, h, 'implicit')
+                    if self.stats['steps'] == 0:
+                        # Damp the jump at the value BCs before controlling
+                        # the error, see Notes
+                        err, factor = 0, 1.0
+                        x_new = x_ie
+                    else:
+                        x_cn = self._t_take_step(x_old, h, 'cranknicolson')
+                        scale = atol + rtol*np.maximum(np.abs(x_old),
+                                                       np.abs(x_cn))
+                        err = np.amax(np.abs(x_cn - x_ie) / scale)
+                        # The error of the 1st order scheme scales with h**2
+                        factor = 0.9/np.sqrt(err) if err > 0 else 5.0
+                        x_new = x_cn if scheme == 'cranknicolson' else x_ie
+                    if (err > 1) and (h > dt_min):
+                        self.stats['rejected'] += 1
+                        dt = max(dt_min, h*max(0.2, factor))
+                        continue
+                    self[quantity] = x_new
+                    self.stats['steps'] += 1
+                    logger.info(f'    Time step of {h:.4e} s accepted')
+                    # Land exactly on the output time to avoid round-off
+                    time = t_next if h == (t_next - time) else time + h
+                    # Keep the step unless it was shortened to land on t_next
+                    if h == dt:
+                        dt = min(dt_max, max(dt_min, h*min(5.0, factor)))
+                    x_old = x_new
+                    res_t = self._t_steady_residual(x_new)
+                    logger.info('        Residual: ' + str(res_t))
+                    steady = res_t < tol
+                    if steady:
+                        break
+                self._t_store(time, self[quantity])
+                logger.info('        Exporting time step: ' + str(time) + ' s')
+                if steady:
+                    logger.info('    Transient solver converged after: '
+                                + str(time) + ' s')
+                    break
+        finally:
+            self.settings.update({'t_step': dt0, 't_scheme': scheme})
+
+    def _t_steady_residual(self, x):
+        r"""
+        Returns the residual of the steady system of equations at ``x``,
+        relative to the norm of its right-hand side.
+        """
+        phase = self.project.phases()[self.settings['phase']]
+        self.settings['t_scheme'] = 'steady'
+        self[self.settings['quantity']] = x
+        self._t_update_A()
+        self._t_update_b()
+        self._apply_BCs()
+        r = self._A * x - self._b
+        for item in self.settings['sources']:
+            Ps = self.pores(item)
+            # Unlike in _apply_sources the source terms are not relaxed
+            r[Ps] -= phase[item + '.S1'][Ps] * x[Ps] + phase[item + '.S2'][Ps]
+        return np.linalg.norm(r) / np.linalg.norm(self._b)
+
+    def _t_take_step(self, x_old, dt, scheme):
+        r"""
+        Solves one time step of size ``dt`` from ``x_old`` using the given
+        scheme, and returns the solution.
+        """
+        self.settings.update({'t_step': dt, 't_scheme': scheme})
+        self[self.settings['quantity']] = x_old
+        self._t_update_A()
+        self._t_update_b()
+        self._apply_BCs()
+        self._A_t = (self._A).copy()
+        self._b_t = (self._b).copy()
+        self._t_run_reactive(x0=x_old)
+        return np.copy(self[self.settings['quantity']])
+
     def _t_run_reactive(self, x0):
         """r
         Repeatedly updates transient 'A', 'b', and the solution guess within
@@ -385,6 +658,8 @@ class TransientReactiveTransport(ReactiveTransport):
         w = self.settings['relaxation_quantity']
         quantity = self.settings['quantity']
         max_it = int(self.settings['max_iter'])
+        # Without sources A is not modified, so no copy is needed
+        copy_A = bool(self.settings['sources'])
         # Write initial guess to algorithm for _update_iterative_props to work
         self[quantity] = x = x0
 
@@ -392,7 +667,7 @@ class TransientReactiveTransport(ReactiveTransport):
             # Update iterative properties on phase and physics
             self._update_iterative_props()
             # Build A and b, apply source terms and correct according to scheme
-            self._A = (self._A_t).copy()
+            self._A = (self._A_t).copy() if copy_A else self._A_t
             self._b = (self._b_t).copy()
             self._apply_sources()
             self._correct_apply_sources()
@@ -435,6 +710,8 @@ class TransientReactiveTransport(ReactiveTransport):
             times = kwargs['steps']
         t_pre = self.settings['t_precision']
         quantity = self.settings['quantity']
+        if self._t_results is not None:
+            return self._t_results_compact(times)
         q = [k for k in list(self.keys()) if quantity in k]
         if times is None:
             t = q
@@ -460,6 +737,28 @@ class TransientReactiveTransport(ReactiveTransport):
         d = {k: self[k] for k in t}
         return d
 
+    def _t_results_compact(self, times):
+        r"""
+        Fetches the requested times from the compact storage, see ``results``
+        """
+        quantity = self.settings['quantity']
+        store = self._t_results
+        if times is None:
+            out = store.times
+            d = {quantity: self[quantity]}
+        elif times in ['final', 'actual']:
+            return {quantity: self[quantity]}
+        else:
+            out = np.unique(np.around(np.array(times),
+                                      decimals=self.settings['t_precision']))
+            missing_t = np.array([i for i in out if i not in store])
+            if missing_t.size != 0:
+                logger.warning('Time(s) '+str(missing_t)+' not stored.')
+            out = [i for i in out if i in store]
+            d = {}
+        d.update({quantity + '@' + self._nbr_to_str(i): store[i] for i in out})
+        return d
+
     def _nbr_to_str(self, nbr, t_pre=None):
         r"""
         Converts a scalar into a string in scientific (exponential) notation
@@ -101,24 +101,31 @@ class FormationFactor(GenericMetric):
             phys = GenericPhysics(network=self.network,
                                   phase=phase, geometry=geom)
             phys.add_model(propname='throat.diffusive_conductance', model=mod)
-        for bcs in self.settings['inlets'].keys():
-            Diff = FickianDiffusion(network=self.project.network, phase=phase)
+        # All directions are solved as one batch using the same algorithm
+        Diff = FickianDiffusion(network=self.project.network, phase=phase)
+        directions = list(self.settings['inlets'].keys())
+        values = []
+        for bcs in directions:
+            bc_value = np.ones(self.network.Np)*np.nan
+            Pin = self.network.pores(self.settings['inlets'][bcs])
+            bc_value[Pin] = 1.0
+            Pout = self.network.pores(self.settings['outlets'][bcs])
+            bc_value[Pout] = 0.0
+            values.append(bc_value)
+        R = Diff.run_batch(values=values)[1]
+        for i, bcs in enumerate(directions):
             Pin = self.network.pores(self.settings['inlets'][bcs])
-            Diff.set_value_BC(pores=Pin, values=1.0)
             Pout = self.network.pores(self.settings['outlets'][bcs])
-            Diff.set_value_BC(pores=Pout, values=0.0)
-            Diff.run()
             A = self.settings['areas'][bcs]
             if A is None:
-                A = Diff._get_domain_area()
+                A = Diff._get_domain_area(inlets=Pin, outlets=Pout)
                 self.settings['areas'][bcs] = A
             L = self.settings['lengths'][bcs]
             if L is None:
-                L = Diff._get_domain_length()
+                L = Diff._get_domain_length(inlets=Pin, outlets=Pout)
                 self.settings['lengths'][bcs] = L
-            R = Diff.rate(pores=Pin)
-            Deff = R*L/A  # Conc gradient and diffusivity were both unity
-            self.results[bcs] = 1/Deff[0]
+            Deff = R[i]*L/A  # Conc gradient and diffusivity were both unity
+            self.results[bcs] = 1/Deff
 
     def set_inlets(self, direction, label):
         r"""
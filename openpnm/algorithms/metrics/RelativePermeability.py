@@ -1,6 +1,7 @@
+import pickle
 import numpy as np
 from openpnm import models
-from openpnm.utils import logging
+from openpnm.utils import logging, Workspace
 from openpnm.algorithms import GenericAlgorithm, StokesFlow
 logger = logging.getLogger(__name__)
 
@@ -139,59 +140,72 @@ class RelativePermeability(GenericAlgorithm):
         self.project.purge_object(obj=St_p)
         return K_abs
 
-    def _eff_perm_calc(self, flow_pores):
+    def _sweep(self, points, flow_pores):
         r"""
-        Calculates effective permeability of each phase using StokesFlow
-        algorithm with updated multiphase physics models to account for the
-        multiphase flow.
-        The direction of the flow is defined by flow_pores.
-        All variables except for the rate in darcy's law will be the same in
-        relative permeability ratio. The effective rate represents the
-        effective permeability in the nominator of relative permeability
-        ratio.
+        Calculates the saturation and the effective permeability of each phase
+        in each direction at the given points of the invasion sequence.
 
         Parameters
         ----------
-        flow_pores: numpy array
-        Boundary pores that will have constant value boundary condition in
-        StokesFlow algorithm. First element is the inlet face (pores) for flow
-        of invading phase through porous media. Second element is the outlet
-        face (pores).
+        points: list of scalars
+        The invasion_sequence limits at which the saturation and the effective
+        permeabilities are calculated (see ``_sat_occ_update``).
 
-        Output: array [Kewp, Kenwp]
-        The value of effective permeability of defending (if there is any) and
-        invading phase in the direction that is defined by flow_pores.
+        flow_pores: dict
+        The inlet and outlet pores of each direction, as used by
+        ``_abs_perm_calc``.
 
-        Note: To account for multiphase flow, multiphase physics model is added
-        and updated in each saturation (saturation is related to
-        the presence of another phase). Here, the conduit_hydraulic conductance
-        is used as the conductance required by stokes flow algorithm.
+        Output: tuple (sat, Kewp, Kenwp)
+        The list of saturations, and dicts holding the list of effective
+        permeabilities of the defending (``None`` if there is none) and
+        invading phases in each direction.
 
+        Notes
+        -----
+        One StokesFlow algorithm is set up per phase and direction and reused
+        for all points, since only the conductances differ between them. The
+        Laplacian pattern and the positions of the BC entries are thus found
+        once, and each point only scatters the new conductance values into
+        **A**.  Each solve starts from the pressure field of the previous
+        point, which speeds up iterative solvers.
         """
         network = self.project.network
-        self._regenerate_models()
+        prop = self.settings['conduit_hydraulic_conductance']
+        phases = {'nwp': self.project[self.settings['nwp']]}
         if self.settings['wp'] is not None:
-            wp = self.project[self.settings['wp']]
-            St_mp_wp = StokesFlow(network=network, phase=wp)
-            St_mp_wp.setup(conductance='throat.conduit_hydraulic_conductance')
-            St_mp_wp.set_value_BC(pores=flow_pores[0], values=1)
-            St_mp_wp.set_value_BC(pores=flow_pores[1], values=0)
-            St_mp_wp.run()
-            Kewp = np.sum(abs(St_mp_wp.rate(pores=flow_pores[1])))
-            self.project.purge_object(obj=St_mp_wp)
-        else:
-            Kewp = None
-            pass
-        nwp = self.project[self.settings['nwp']]
-        St_mp_nwp = StokesFlow(network=network, phase=nwp)
-        St_mp_nwp.set_value_BC(pores=flow_pores[0], values=1)
-        St_mp_nwp.set_value_BC(pores=flow_pores[1], values=0)
-        St_mp_nwp.setup(conductance='throat.conduit_hydraulic_conductance')
-        St_mp_nwp.run()
-        Kenwp = np.sum(abs(St_mp_nwp.rate(pores=flow_pores[1])))
-        Kenwp = Kenwp
-        self.project.purge_object(obj=St_mp_nwp)
-        return [Kewp, Kenwp]
+            phases['wp'] = self.project[self.settings['wp']]
+        algs = {}
+        for key, phase in phases.items():
+            for dim in flow_pores.keys():
+                St = StokesFlow(network=network, phase=phase)
+                St.setup(conductance=prop)
+                St.settings['cache_A'] = False
+                St.set_value_BC(pores=flow_pores[dim][0], values=1)
+                St.set_value_BC(pores=flow_pores[dim][1], values=0)
+                algs[(key, dim)] = St
+        sat = []
+        K = {item: [] for item in algs.keys()}
+        try:
+            for i, j in enumerate(points):
+                sat.append(self._sat_occ_update(j))
+                if i == 0:
+                    self._regenerate_models()
+                else:
+                    for phase in phases.values():
+                        phase.regenerate_models(propnames=[prop])
+                for (key, dim), St in algs.items():
+                    x0 = St.get(St.settings['quantity'], None)
+                    St.run(x0=x0)
+                    rate = St.rate(pores=flow_pores[dim][1])
+                    K[(key, dim)].append(np.sum(abs(rate)))
+        finally:
+            for St in algs.values():
+                self.project.purge_object(obj=St)
+        Kewp = None
+        if 'wp' in phases.keys():
+            Kewp = {dim: K[('wp', dim)] for dim in flow_pores.keys()}
+        Kenwp = {dim: K[('nwp', dim)] for dim in flow_pores.keys()}
+        return sat, Kewp, Kenwp
 
     def _sat_occ_update(self, i):
         r"""
@@ -223,7 +237,7 @@ class RelativePermeability(GenericAlgorithm):
             wp['pore.occupancy'] = 1-pore_mask
         return sat
 
-    def run(self, Snw_num=100):
+    def run(self, Snw_num=100, processes=1):
         r"""
         Calculates the saturation of each phase using the invasion sequence
         from either invasion percolation or ordinary percolation.
@@ -235,57 +249,81 @@ class RelativePermeability(GenericAlgorithm):
         values. If not given, the default value is 10. Saturation points will
         be Snw_num (or 10 by default) equidistant points in range [0,1].
 
+        processes: int
+        The number of worker processes to split the saturation points between.
+        The default is 1, which calculates all points in this process.  Each
+        worker receives a copy of the project, so this only pays off for large
+        networks.
+
         Note: For three directions of flow the absolute permeability values
         will be calculated using _abs_perm_calc.
         For each saturation point:
             the saturation values are calculated by _sat_occ_update.
             This function also updates occupancies of each phase in
             pores/throats. Effective permeabilities of each phase is then
-            calculated. Relative permeability is defined by devision of
-            K_eff and K_abs.
+            calculated by _sweep. Relative permeability is defined by devision
+            of K_eff and K_abs.
         """
         net = self.project.network
-        K_dir = set(self.settings['flow_inlets'].keys())
-        for dim in K_dir:
-            flow_pores = [net.pores(self.settings['flow_inlets'][dim]),
-                          net.pores(self.settings['flow_outlets'][dim])]
+        flow_pores = {}
+        for dim in self.settings['flow_inlets'].keys():
+            flow_pores[dim] = [net.pores(self.settings['flow_inlets'][dim]),
+                               net.pores(self.settings['flow_outlets'][dim])]
+        for dim in flow_pores.keys():
             if self.settings['wp'] is not None:
                 phase = self.project[self.settings['wp']]
-                K_abs = self._abs_perm_calc(phase, flow_pores)
+                K_abs = self._abs_perm_calc(phase, flow_pores[dim])
                 self.Kr_values['perm_abs_wp'].update({dim: K_abs})
-                relperm_wp = []
-            else:
-                relperm_wp = None
             phase = self.project[self.settings['nwp']]
-            K_abs = self._abs_perm_calc(phase, flow_pores)
+            K_abs = self._abs_perm_calc(phase, flow_pores[dim])
             self.Kr_values['perm_abs_nwp'].update({dim: K_abs})
-        for dirs in self.settings['flow_inlets']:
-            if self.settings['wp'] is not None:
-                relperm_wp = []
-            else:
-                relperm_wp = None
-                pass
-            relperm_nwp = []
-            max_seq = np.max([np.max(self.settings['pore.invasion_sequence']),
-                              np.max(
-                              self.settings['throat.invasion_sequence'])])
-            start = max_seq//Snw_num
-            stop = max_seq
-            step = max_seq//Snw_num
-            Snwparr = []
-            flow_pores = [net.pores(self.settings['flow_inlets'][dirs]),
-                          net.pores(self.settings['flow_outlets'][dirs])]
-            for j in range(start, stop, step):
-                sat = self._sat_occ_update(j)
-                Snwparr.append(sat)
-                [Kewp, Kenwp] = self._eff_perm_calc(flow_pores)
-                if self.settings['wp'] is not None:
-                    relperm_wp.append(Kewp/self.Kr_values['perm_abs_wp'][dirs])
-                relperm_nwp.append(Kenwp/self.Kr_values['perm_abs_nwp'][dirs])
+        max_seq = np.max([np.max(self.settings['pore.invasion_sequence']),
+                          np.max(self.settings['throat.invasion_sequence'])])
+        start = max_seq//Snw_num
+        stop = max_seq
+        step = max_seq//Snw_num
+        points = list(range(start, stop, step))
+        if processes > 1 and len(points) > 1:
+            sat, Kewp, Kenwp = self._sweep_parallel(points, flow_pores,
+                                                    processes)
+        else:
+            sat, Kewp, Kenwp = self._sweep(points, flow_pores)
+        for dirs in flow_pores.keys():
             if self.settings['wp'] is not None:
+                K_abs = self.Kr_values['perm_abs_wp'][dirs]
+                relperm_wp = [K/K_abs for K in Kewp[dirs]]
                 self.Kr_values['relperm_wp'].update({dirs: relperm_wp})
+            K_abs = self.Kr_values['perm_abs_nwp'][dirs]
+            relperm_nwp = [K/K_abs for K in Kenwp[dirs]]
             self.Kr_values['relperm_nwp'].update({dirs: relperm_nwp})
-            self.Kr_values['sat'].update({dirs: Snwparr})
+            self.Kr_values['sat'].update({dirs: list(sat)})
+
+    def _sweep_parallel(self, points, flow_pores, processes):
+        r"""
+        Splits the points into contiguous chunks, and calls ``_sweep`` on each
+        chunk in a pool of worker processes.  The output is the same as that
+        of ``_sweep``.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        processes = min(processes, len(points))
+        chunks = [list(c) for c in np.array_split(points, processes)]
+        data = pickle.dumps(self.project)
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=_init_sweep_worker,
+                                 initargs=(self.project.name, data)) as pool:
+            out = list(pool.map(_sweep_worker, [self.name]*len(chunks),
+                                chunks, [flow_pores]*len(chunks)))
+        sat = [s for chunk in out for s in chunk[0]]
+        Kewp = None
+        if self.settings['wp'] is not None:
+            Kewp = {dim: [K for chunk in out for K in chunk[1][dim]]
+                    for dim in flow_pores.keys()}
+        Kenwp = {dim: [K for chunk in out for K in chunk[2][dim]]
+                 for dim in flow_pores.keys()}
+        # Leave the phases as a serial sweep would have
+        self._sat_occ_update(points[-1])
+        self._regenerate_models()
+        return sat, Kewp, Kenwp
 
     def plot_Kr_curves(self):
         r"""
@@ -318,3 +356,26 @@ class RelativePermeability(GenericAlgorithm):
             self.Kr_values['results']['krw'] = None
         self.Kr_values['results']['krnw'] = self.Kr_values['relperm_nwp']
         return self.Kr_values
+
+
+_sweep_project = {}
+
+
+def _init_sweep_worker(name, data):
+    r"""
+    Registers the copy of the project sent to a worker process.  A forked
+    worker inherits the parent's Workspace, so its version is replaced.
+    """
+    ws = Workspace()
+    ws.pop(name, None)
+    proj = pickle.loads(data)
+    ws[name] = proj
+    _sweep_project['project'] = proj
+
+
+def _sweep_worker(alg_name, points, flow_pores):
+    r"""
+    Runs ``RelativePermeability._sweep`` in a worker process
+    """
+    alg = _sweep_project['project'][alg_name]
+    return alg._sweep(points, flow_pores)
@@ -143,6 +143,10 @@ class Base(dict):
         # It is necessary to set the SettingsDict here since some classes
         # use it before calling super.__init__()
         instance.settings = SettingsDict()
+        # Subdomain locations used by ``interleave_data``, stored by element
+        instance._interleave_cache = {}
+        # When each array was last written, see ``Workspace._gen_version``
+        instance._versions = {}
         return instance
 
     def __init__(self, Np=0, Nt=0, name=None, project=None):
@@ -205,6 +209,9 @@ class Base(dict):
                 if (key in keys) and (key not in self.keys()):
                     raise Exception('Cannot create ' + key + ' when it is'
                                     + ' already defined on a subdomain')
+            # Writing a subdomain label means its locations may have changed
+            if key.split('.')[-1] in proj.names:
+                boss._interleave_cache.pop(key.split('.')[0], None)
 
         # This check allows subclassed numpy arrays through, eg. with units
         if not isinstance(value, sp.ndarray):
@@ -214,6 +221,12 @@ class Base(dict):
         element = key.split('.')[0]
         element = self._parse_element(element, single=True)
 
+        # Record when the array was written, including on its parent dict
+        version = ws._gen_version()
+        self._versions[key] = version
+        if key.count('.') > 1:
+            self._versions['.'.join(key.split('.')[:2])] = version
+
         # Skip checks for 'coords', 'conns'
         if key in ['pore.coords', 'throat.conns']:
             super(Base, self).__setitem__(key, value)
@@ -298,9 +311,27 @@ class Base(dict):
 
     name = property(_get_name, _set_name)
 
+    def __getstate__(self):
+        # The weak reference to the Project cannot be pickled or deep-copied,
+        # so it is dropped here and restored when the copy is registered
+        state = self.__dict__.copy()
+        state.pop('_project_ref', None)
+        state.pop('_interleave_cache', None)
+        state.pop('_versions', None)
+        return state
+
     def _get_project(self):
+        # Project.extend stores a weak reference back to the Project, so the
+        # Workspace only needs to be scanned for objects that were never
+        # registered that way (i.e. unpickled objects)
+        ref = getattr(self, '_project_ref', None)
+        if ref is not None:
+            proj = ref()
+            if proj is not None:
+                return proj
         for proj in ws.values():
             if self in proj:
+                proj._register(self)
                 return proj
 
     project = property(fget=_get_project)
@@ -964,6 +995,34 @@ class Base(dict):
             t = namedtuple('index_map', ('indices', 'mask'))
             return t(ind, mask)
 
+    def _map_subdomain(self, indices, element, origin, filtered):
+        r"""
+        Maps indices between a Subdomain and its boss object using the index
+        maps stored on the Subdomain, which avoids searching the ``_id``
+        arrays.  Returns ``None`` if the two objects are not related this way,
+        in which case ``_map`` must be used instead.
+        """
+        proj = self.project
+        if 'Subdomain' in origin._mro():
+            if proj.find_full_domain(origin) is not self:
+                return None
+            locs = origin._get_locations(element=element, boss=self)
+            ind = locs[origin._parse_indices(indices)]
+            mask = np.ones(shape=ind.shape, dtype=bool)
+        elif 'Subdomain' in self._mro():
+            if proj.find_full_domain(self) is not origin:
+                return None
+            local_map = self._get_local_map(element=element, boss=origin)
+            ind = local_map[origin._parse_indices(indices)]
+            mask = ind >= 0
+        else:
+            return None
+        if filtered:
+            return ind[mask]
+        else:
+            t = namedtuple('index_map', ('indices', 'mask'))
+            return t(ind, mask)
+
     def map_pores(self, pores, origin, filtered=True):
         r"""
         Given a list of pore on a target object, finds indices of those pores
@@ -995,6 +1054,10 @@ class Base(dict):
         map_throats
 
         """
+        inds = self._map_subdomain(element='pore', indices=pores,
+                                   origin=origin, filtered=filtered)
+        if inds is not None:
+            return inds
         ids = origin['pore._id'][pores]
         return self._map(element='pore', ids=ids, filtered=filtered)
 
@@ -1029,6 +1092,10 @@ class Base(dict):
         map_pores
 
         """
+        inds = self._map_subdomain(element='throat', indices=throats,
+                                   origin=origin, filtered=filtered)
+        if inds is not None:
+            return inds
         ids = origin['throat._id'][throats]
         return self._map(element='throat', ids=ids, filtered=filtered)
 
@@ -1170,20 +1237,11 @@ class Base(dict):
         element = self._parse_element(prop.split('.')[0], single=True)
         N = self.project.network._count(element)
 
-        # Fetch sources list depending on object type?
-        proj = self.project
-        if self._isa() in ['network', 'geometry']:
-            sources = list(proj.geometries().values())
-        elif self._isa() in ['phase', 'physics']:
-            sources = list(proj.find_physics(phase=self))
-        elif self._isa() in ['algorithm', 'base']:
-            sources = [self]
-        else:
-            raise Exception('Unrecognized object type, cannot find dependents')
+        # Fetch sources list and their locations, reusing them if possible
+        sources, locs = self._get_subdomain_locations(element)
 
         # Attempt to fetch the requested array from each object
         arrs = [item.get(prop, None) for item in sources]
-        locs = [self._get_indices(element, item.name) for item in sources]
         sizes = [np.size(a) for a in arrs]
         if np.all([item is None for item in arrs]):  # prop not found anywhere
             raise KeyError(prop)
@@ -1243,6 +1301,42 @@ class Base(dict):
 
         return temp_arr
 
+    def _get_subdomain_locations(self, element):
+        r"""
+        Finds the objects that ``interleave_data`` draws from along with the
+        indices of their locations on this object.
+
+        The result is stored and reused for as long as the label array of
+        each source is unchanged, which avoids searching the project and
+        scanning the label masks on every read.  Writing a subdomain label
+        (as done by ``_set_locations``) discards the stored result, as do
+        ``topotools.trim`` and ``topotools.extend``.
+        """
+        if element in self._interleave_cache.keys():
+            sources, labels, locs = self._interleave_cache[element]
+            if all([self.get(element+'.'+item.name) is label
+                    for item, label in zip(sources, labels)]):
+                return sources, locs
+        # Fetch sources list depending on object type?
+        proj = self.project
+        if self._isa() in ['network', 'geometry']:
+            sources = list(proj.geometries().values())
+        elif self._isa() in ['phase', 'physics']:
+            sources = list(proj.find_physics(phase=self))
+        elif self._isa() in ['algorithm', 'base']:
+            sources = [self]
+        else:
+            raise Exception('Unrecognized object type, cannot find dependents')
+        if self._isa() in ['network', 'phase']:
+            locs = [item._get_locations(element, boss=self) for item in sources]
+        else:
+            locs = [self._get_indices(element, item.name) for item in sources]
+        # Only full domain objects own the labels that validate the result
+        if self._isa() in ['network', 'phase']:
+            labels = [self.get(element+'.'+item.name) for item in sources]
+            self._interleave_cache[element] = (sources, labels, locs)
+        return sources, locs
+
     def interpolate_data(self, propname):
         r"""
         Determines a pore (or throat) property as the average of it's
@@ -16,7 +16,43 @@ class ModelsDict(PrintableDict):
     order in which models should be called: ``dependency_list``,
     ``dependency_graph``, and ``dependency_map``.
 
+    The result of ``dependency_list`` is stored and reused until a model is
+    added, removed or has one of its parameters changed.  The same events
+    mark the model as needing to be rerun when ``regenerate_models`` is
+    called with ``only_dirty=True``.  The ``stats`` attribute counts how many
+    model calls were run, and how many were skipped as a result.
+
     """
+
+    def __init__(self, *args, **kwargs):
+        self._dependency_list = None
+        self._dirty = set()
+        self._version = ws._gen_version()
+        self.stats = {'run': 0, 'skipped': 0}
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        if isinstance(value, ModelWrapper):
+            value._parent = self
+        super().__setitem__(key, value)
+        self._touch(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._touch(key)
+
+    def _touch(self, key):
+        r"""
+        Discards the stored dependency list and marks the given model as
+        needing to be rerun
+        """
+        self._dependency_list = None
+        self._version = ws._gen_version()
+        if key in self.keys():
+            self._dirty.add(key)
+        else:
+            self._dirty.discard(key)
+
     def dependency_list(self):
         r'''
         Returns a list of dependencies in the order with which they should be
@@ -38,13 +74,16 @@ class ModelsDict(PrintableDict):
         '''
         import networkx as nx
 
-        dtree = self.dependency_graph()
-        cycles = list(nx.simple_cycles(dtree))
-        if cycles:
-            raise Exception('Cyclic dependency found: ' + ' -> '.join(
-                            cycles[0] + [cycles[0][0]]))
-        d = nx.algorithms.dag.lexicographical_topological_sort(dtree, sorted)
-        return list(d)
+        if self._dependency_list is None:
+            dtree = self.dependency_graph()
+            cycles = list(nx.simple_cycles(dtree))
+            if cycles:
+                raise Exception('Cyclic dependency found: ' + ' -> '.join(
+                                cycles[0] + [cycles[0][0]]))
+            d = nx.algorithms.dag.lexicographical_topological_sort(dtree,
+                                                                   sorted)
+            self._dependency_list = list(d)
+        return list(self._dependency_list)
 
     def dependency_graph(self, deep=False):
         r"""
@@ -171,6 +210,16 @@ class ModelWrapper(dict):
     This class is used to hold individual models and provide some extra
     functionality, such as pretty-printing.
     """
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        # Let the ModelsDict know that this model's parameters have changed
+        parent = getattr(self, '_parent', None)
+        if parent is not None:
+            for propname, mod in parent.items():
+                if mod is self:
+                    parent._touch(propname)
+
     @property
     def propname(self):
         for proj in ws.values():
@@ -310,7 +359,8 @@ class ModelsMixin():
         if regen_mode not in ['deferred', 'explicit']:
             self._regen(propname)
 
-    def regenerate_models(self, propnames=None, exclude=[], deep=False):
+    def regenerate_models(self, propnames=None, exclude=[], deep=False,
+                          only_dirty=False):
         r"""
         Re-runs the specified model or models.
 
@@ -332,6 +382,28 @@ class ModelsMixin():
             be regenerated when method is called on the corresponding Phase.
             The default is ``False``.  The method does not work in reverse,
             so regenerating models on a Physics will not update a Phase.
+            The models on all objects are run once each, in the order given
+            by the Project's combined dependency graph (see
+            ``Project.regenerate_models``).
+
+        only_dirty : boolean
+            If ``True`` then only models whose data is missing, whose
+            parameters were changed, or whose input properties were written
+            since the model was last run are called.  Since models are run in
+            dependency order, rerunning a model also marks the models that
+            use its output.  The default is ``False``, which runs all models.
+
+        Notes
+        -----
+        With ``only_dirty=True`` the inputs of a model are taken to be the
+        parameters that are property names (e.g. ``pore_diameter=
+        'pore.diameter'``), and they are deemed changed when written using
+        ``obj[propname] = values``.  Data that is modified in place (e.g.
+        ``obj[propname][0] = 1``), or read by a model without being listed
+        as a parameter, is not detected.
+
+        The number of models run and skipped are counted in
+        ``obj.models.stats``.
 
         """
         # If empty list of propnames was given, do nothing and return
@@ -354,24 +426,52 @@ class ModelsMixin():
         else:
             # Make list of given propnames that are not in self
             other_models = list(set(propnames).difference(set(self_models)))
-        # The following has some redundant lines, but is easier to understand
+        # Find associated objects whose models should also be regenerated
         if self._isa('phase'):
-            # Start be regenerating models on self
-            for item in propnames:
-                self._regen(item)
-            # Then regen models on associated objects, if any in other_models
-            for phys in self.project.find_physics(phase=self):
-                phys.regenerate_models(propnames=other_models, deep=False)
-        elif self._isa('network'):  # Repeat for other object types
-            for item in propnames:
-                self._regen(item)
-            for geom in self.project.geometries().values():
-                geom.regenerate_models(propnames=other_models, deep=False)
+            others = self.project.find_physics(phase=self)
+        elif self._isa('network'):
+            others = list(self.project.geometries().values())
         else:
+            others = []
+        nodes = []
+        for obj in others:
+            if other_models is None:
+                nodes.extend([(obj.name, k) for k, v in obj.models.items()
+                              if v['regen_mode'] != 'explicit'])
+            else:
+                nodes.extend([(obj.name, k) for k in obj.models.keys()
+                              if k in other_models])
+        if len(nodes) == 0:
             for item in propnames:
-                self._regen(item)
+                self._regen(item, only_dirty=only_dirty)
+        else:
+            # Run all models in a single pass ordered using the dependencies
+            # between objects (i.e. phase models that use physics data)
+            nodes.extend([(self.name, i) for i in propnames])
+            for obj, item in self.project._get_model_plan(nodes):
+                obj._regen(item, only_dirty=only_dirty)
 
-    def _regen(self, prop):
+    def _is_dirty(self, prop):
+        r"""
+        Determines whether the model for the given property needs to be rerun
+        because its data is missing, its parameters were changed, or one of
+        its input properties was written more recently than its data.
+        """
+        if prop in self.models._dirty:
+            return True
+        # Models may also return a dict of arrays stored under prop
+        if (prop not in self.keys()) and \
+                (not any([k.startswith(prop+'.') for k in self.keys()])):
+            return True
+        version = self._versions.get(prop, 0)
+        for param in self.models[prop].values():
+            if is_valid_propname(param):
+                for obj in self.project:
+                    if obj._versions.get(param, 0) > version:
+                        return True
+        return False
+
+    def _regen(self, prop, only_dirty=False):
         # Create a temporary dict of all model arguments
         try:
             kwargs = self.models[prop].copy()
@@ -388,8 +488,13 @@ class ModelsMixin():
         elif regen_mode == 'constant':
             # Only regenerate if data not already in dictionary
             if prop not in self.keys():
+                self.models._dirty.discard(prop)
                 self[prop] = model(target=self, **kwargs)
+        elif only_dirty and not self._is_dirty(prop):
+            self.models.stats['skipped'] += 1
         else:
+            self.models.stats['run'] += 1
+            self.models._dirty.discard(prop)
             try:
                 self[prop] = model(target=self, **kwargs)
             except KeyError as e:
@@ -30,6 +30,17 @@ class Subdomain(Base):
 
     """
 
+    def __new__(cls, *args, **kwargs):
+        instance = super(Subdomain, cls).__new__(cls, *args, **kwargs)
+        # Index maps between this object and its boss, see ``_get_locations``
+        instance._locations = {}
+        return instance
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop('_locations', None)
+        return state
+
     def __getitem__(self, key):
         element = key.split('.')[0]
         # Find boss object (either phase or network)
@@ -37,7 +48,7 @@ class Subdomain(Base):
         # Try to get vals directly first
         vals = self.get(key)
         if vals is None:  # Otherwise invoke search
-            inds = boss._get_indices(element=element, labels=self.name)
+            inds = self._get_locations(element=element)
             try:  # Will invoke interleave data if necessary
                 vals = boss[key]  # Will return nested dict if present
                 if type(vals) is dict:  # Index into each array in nested dict
@@ -63,6 +74,46 @@ class Subdomain(Base):
                                 + hit + ' is already defined')
         super().__setitem__(key, value)
 
+    def _get_locations(self, element, boss=None):
+        r"""
+        Returns the indices on the boss object of the pores or throats
+        assigned to this object, so that ``locs[i]`` is the boss index of
+        local location ``i``.
+
+        The array is computed from the boss's label the first time it is
+        needed and is reused until that label is replaced, which happens
+        whenever locations are added or dropped, or the network is trimmed.
+        """
+        if boss is None:
+            boss = self.project.find_full_domain(self)
+        element = self._parse_element(element=element, single=True)
+        label = boss.get(element+'.'+self.name)
+        if (element not in self._locations.keys()) or \
+                (self._locations[element][0] is not label):
+            if label is None:
+                locs = np.array([], dtype=int)
+            else:
+                locs = np.where(label)[0].astype(dtype=int)
+            self._locations[element] = (label, locs, None)
+        return self._locations[element][1]
+
+    def _get_local_map(self, element, boss=None):
+        r"""
+        Returns an array the length of the boss's pores or throats containing
+        the local index of each location on this object, or -1 for locations
+        not assigned to it.  This is the inverse of ``_get_locations``.
+        """
+        if boss is None:
+            boss = self.project.find_full_domain(self)
+        element = self._parse_element(element=element, single=True)
+        locs = self._get_locations(element=element, boss=boss)
+        label, locs, local_map = self._locations[element]
+        if local_map is None:
+            local_map = np.ones((boss._count(element), ), dtype=int)*-1
+            local_map[locs] = np.arange(locs.size)
+            self._locations[element] = (label, locs, local_map)
+        return local_map
+
     def _add_locations(self, pores=[], throats=[]):
         r"""
         Adds associations between an object and its boss object at the
@@ -149,6 +200,7 @@ class Subdomain(Base):
             self.update({item: boss[item][mask]})
         # Update label array in network
         boss[element+'.'+self.name] = mask
+        self._locations.pop(element, None)
         # Remove label from boss if ALL locations are removed
         if mode == 'drop':
             if ~np.any(boss[element+'.'+self.name]):
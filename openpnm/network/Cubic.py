@@ -5,14 +5,23 @@ Cubic: Generate lattice-like networks
 ===============================================================================
 
 """
+import os
+import weakref
 import numpy as np
 import scipy as sp
+import scipy.sparse as sprs
 from openpnm.network import GenericNetwork
 from openpnm import topotools
 from openpnm.utils import logging
 
 logger = logging.getLogger(__name__)
 
+# Offsets from each pore to the neighbors it connects to, see _generate_conns
+_face_joints = [(0, 0, 1), (0, 1, 0), (1, 0, 0)]
+_corner_joints = [(1, 1, 1), (1, 1, -1), (1, -1, 1), (-1, 1, 1)]
+_edge_joints = [(0, 1, 1), (0, 1, -1), (1, 0, 1), (-1, 0, 1), (-1, -1, 0),
+                (-1, 1, 0)]
+
 
 class Cubic(GenericNetwork):
     r"""
@@ -49,6 +58,33 @@ class Cubic(GenericNetwork):
         ``connectivity`` (i.e. 26) and then delete a fraction of the throats
         using ``openpnm.topotools.reduce_coordination``.
 
+    index_dtype : data-type, optional
+        The integer type used to store ``throat.conns``.  The default is
+        ``int``, but ``np.int32`` halves the memory used by the connections
+        and can be used as long as there are fewer than 2**31 pores.
+
+    chunk_size : int, optional
+        The coordinates, connections and labels are computed from the
+        lattice indices in chunks of this many pores or throats, which
+        limits the size of the temporary arrays.  The default is 1e6.
+
+    memmap_dir : string, optional
+        If given, ``pore.coords`` and ``throat.conns`` are written into
+        memory-mapped ``.npy`` files in this directory instead of being held
+        in memory, which is useful for very large lattices.  The files are
+        named after the project and the network, and an exception is raised
+        if they already exist.
+
+    lazy : boolean, optional
+        If ``True``, ``pore.coords`` and ``throat.conns`` are not stored on
+        the network.  They are generated from the shape of the lattice when
+        requested and returned as read-only arrays, which are kept only as
+        long as they are in use elsewhere.  Adjacency and incidence matrices
+        in 'csr' format and the coefficient matrices of transport algorithms
+        are built directly from the lattice stencil.  Writing either array
+        (e.g. by trimming or adding boundary pores) stores it on the network
+        as usual.  The default is ``False``.
+
     name : string
         An optional name for the object to help identify it.  If not given,
         one will be generated.
@@ -89,105 +125,334 @@ class Cubic(GenericNetwork):
     <http://www.paraview.org>`_.
     """
 
+    _lazy = False
+
     def __init__(
-        self, shape, spacing=[1, 1, 1], connectivity=6, name=None, project=None
+        self, shape, spacing=[1, 1, 1], connectivity=6, name=None, project=None,
+        index_dtype=int, chunk_size=1000000, memmap_dir=None, lazy=False
     ):
 
         # Take care of 1D/2D networks
         shape = np.array(shape, ndmin=1)
         shape = np.concatenate((shape, [1] * (3 - shape.size))).astype(int)
 
-        arr = np.atleast_3d(np.empty(shape))
-
         # Store original network shape
-        self._shape = np.shape(arr)
+        self._shape = tuple(int(n) for n in shape)
         # Store network spacing
         spacing = sp.float64(spacing)
         if spacing.size == 2:
             spacing = np.concatenate((spacing, [1]))
         self._spacing = np.ones(3, dtype=float) * np.array(spacing, ndmin=1)
 
-        z = np.tile(np.arange(shape[2]), shape[0] * shape[1])
-        y = np.tile(np.repeat(np.arange(shape[1]), shape[2]), shape[0])
-        x = np.repeat(np.arange(shape[0]), shape[1] * shape[2])
-        points = (np.vstack([x, y, z]).T).astype(float) + 0.5
-
-        idx = np.arange(arr.size).reshape(arr.shape)
-
-        face_joints = [
-            (idx[:, :, :-1], idx[:, :, 1:]),
-            (idx[:, :-1], idx[:, 1:]),
-            (idx[:-1], idx[1:]),
-        ]
-
-        corner_joints = [
-            (idx[:-1, :-1, :-1], idx[1:, 1:, 1:]),
-            (idx[:-1, :-1, 1:], idx[1:, 1:, :-1]),
-            (idx[:-1, 1:, :-1], idx[1:, :-1, 1:]),
-            (idx[1:, :-1, :-1], idx[:-1, 1:, 1:]),
-        ]
-
-        edge_joints = [
-            (idx[:, :-1, :-1], idx[:, 1:, 1:]),
-            (idx[:, :-1, 1:], idx[:, 1:, :-1]),
-            (idx[:-1, :, :-1], idx[1:, :, 1:]),
-            (idx[1:, :, :-1], idx[:-1, :, 1:]),
-            (idx[1:, 1:, :], idx[:-1, :-1, :]),
-            (idx[1:, :-1, :], idx[:-1, 1:, :]),
-        ]
-
         if connectivity == 6:
-            joints = face_joints
+            joints = _face_joints
         elif connectivity == 8:
-            joints = corner_joints
+            joints = _corner_joints
         elif connectivity == 12:
-            joints = edge_joints
+            joints = _edge_joints
         elif connectivity == 14:
-            joints = face_joints + corner_joints
+            joints = _face_joints + _corner_joints
         elif connectivity == 18:
-            joints = face_joints + edge_joints
+            joints = _face_joints + _edge_joints
         elif connectivity == 20:
-            joints = edge_joints + corner_joints
+            joints = _edge_joints + _corner_joints
         elif connectivity == 26:
-            joints = face_joints + corner_joints + edge_joints
+            joints = _face_joints + _corner_joints + _edge_joints
         else:
             raise Exception(
                 "Invalid connectivity receieved. Must be 6, 8, " "12, 14, 18, 20 or 26"
             )
 
-        tails, heads = np.array([], dtype=int), np.array([], dtype=int)
-        for T, H in joints:
-            tails = np.concatenate((tails, T.flatten()))
-            heads = np.concatenate((heads, H.flatten()))
-        pairs = np.vstack([tails, heads]).T
-
-        super().__init__(
-            Np=points.shape[0], Nt=pairs.shape[0], name=name, project=project
-        )
-
-        self["pore.coords"] = points
-        self["throat.conns"] = pairs
+        Np = int(np.prod(shape))
+        Nt = sum([int(np.prod(shape - np.abs(d))) for d in joints])
+        if Np > np.iinfo(index_dtype).max:
+            raise Exception("The number of pores exceeds the range of "
+                            + np.dtype(index_dtype).name)
+
+        super().__init__(Np=Np, Nt=Nt, name=name, project=project)
+
+        self._stencil = {"shape": self._shape, "joints": joints, "Nt": Nt}
+        self._index_dtype = index_dtype
+        self._chunk_size = chunk_size
+        self._lazy = lazy
+        if not lazy:
+            coords = self._empty(memmap_dir, "coords", (Np, 3), float)
+            self._generate_coords(coords, chunk_size)
+            self["pore.coords"] = coords
+            conns = self._empty(memmap_dir, "conns", (Nt, 2), index_dtype)
+            self._generate_conns(conns, joints, chunk_size)
+            self["throat.conns"] = conns
         self["pore.internal"] = True
         self["throat.internal"] = True
-        self._label_surface_pores()
-        topotools.label_faces(network=self)
-        Ps = self["pore.surface"]
-        self["throat.surface"] = np.all(Ps[self["throat.conns"]], axis=1)
-        # Scale network to requested spacing
-        self["pore.coords"] *= spacing
-
-    def _label_surface_pores(self):
+        self._label_faces(chunk_size)
+
+    def _empty(self, memmap_dir, prop, shape, dtype):
         r"""
+        Preallocates an array, which is memory-mapped to a file in
+        ``memmap_dir`` if given.  The file is named after the project and the
+        network, and an existing file is never overwritten.
         """
-        hits = np.zeros_like(self.Ps, dtype=bool)
-        dims = topotools.dimensionality(self)
-        mn = np.amin(self["pore.coords"], axis=0)
-        mx = np.amax(self["pore.coords"], axis=0)
+        if memmap_dir is None:
+            return np.empty(shape, dtype=dtype)
+        fname = os.path.join(memmap_dir, self.project.name + "_" + self.name
+                             + "_" + prop + ".npy")
+        if os.path.exists(fname):
+            raise Exception("The file " + fname + " already exists, it may "
+                            + "hold the arrays of another network")
+        return np.lib.format.open_memmap(fname, mode="w+", dtype=dtype,
+                                         shape=shape)
+
+    def _generate_coords(self, coords, chunk_size):
+        r"""
+        Writes the pore coordinates into ``coords`` in chunks of
+        ``chunk_size`` pores
+        """
+        for start in range(0, coords.shape[0], chunk_size):
+            stop = min(start + chunk_size, coords.shape[0])
+            ijk = np.unravel_index(np.arange(start, stop), self._shape)
+            for ax in [0, 1, 2]:
+                coords[start:stop, ax] = (ijk[ax] + 0.5) * self._spacing[ax]
+
+    def _generate_conns(self, conns, joints, chunk_size):
+        r"""
+        Writes the throat connections into ``conns`` in chunks of
+        ``chunk_size`` throats
+
+        Each joint is the offset from a pore to the neighbor it connects to,
+        so the tail pores of a joint form a sub-box of the lattice and the
+        head pores are found by adding the offset to their indices.
+        """
+        shape = np.array(self._shape)
+        strides = np.array([shape[1] * shape[2], shape[2], 1])
+        start = 0
+        for d in joints:
+            d = np.array(d)
+            box = tuple(shape - np.abs(d))
+            # Tails start at 1 along the axes where the offset is negative
+            first = (d < 0).astype(int)
+            shift = int(np.sum(d * strides))
+            n = int(np.prod(box))
+            # Store the lower index first so conns is upper triangular
+            col = [0, 1] if shift > 0 else [1, 0]
+            for lo in range(0, n, chunk_size):
+                hi = min(lo + chunk_size, n)
+                ijk = np.unravel_index(np.arange(lo, hi), box)
+                tails = sum([(ijk[ax] + first[ax]) * strides[ax]
+                             for ax in [0, 1, 2]])
+                conns[start + lo:start + hi, col[0]] = tails
+                conns[start + lo:start + hi, col[1]] = tails + shift
+            start += n
+
+    def _label_faces(self, chunk_size):
+        r"""
+        Labels the surface pores and throats and the six faces from the
+        lattice indices of each pore
+        """
+        shape = self._shape
+        dims = np.array(shape) > 1
+        faces = {0: ["front", "back"], 1: ["left", "right"],
+                 2: ["bottom", "top"]}
+        surface = np.zeros(self.Np, dtype=bool)
+        labels = {}
+        for ax in np.where(dims)[0]:
+            for label in faces[ax]:
+                labels[label] = np.zeros(self.Np, dtype=bool)
+        for start in range(0, self.Np, chunk_size):
+            stop = min(start + chunk_size, self.Np)
+            ijk = np.unravel_index(np.arange(start, stop), shape)
+            for ax in np.where(dims)[0]:
+                lo, hi = faces[ax]
+                labels[lo][start:stop] = ijk[ax] == 0
+                labels[hi][start:stop] = ijk[ax] == shape[ax] - 1
+                surface[start:stop] += labels[lo][start:stop]
+                surface[start:stop] += labels[hi][start:stop]
+        self["pore.surface"] = surface
         for ax in [0, 1, 2]:
-            if dims[ax]:
-                hits += self["pore.coords"][:, ax] <= mn[ax]
-                hits += self["pore.coords"][:, ax] >= mx[ax]
-        self["pore.surface"] = hits
+            for label in faces[ax]:
+                if label in labels.keys():
+                    self["pore." + label] = labels[label]
+        conns = self["throat.conns"]
+        Ts = np.zeros(self.Nt, dtype=bool)
+        for start in range(0, self.Nt, chunk_size):
+            stop = min(start + chunk_size, self.Nt)
+            Ts[start:stop] = surface[conns[start:stop, 0]]
+            Ts[start:stop] *= surface[conns[start:stop, 1]]
+        self["throat.surface"] = Ts
+
+    def __getitem__(self, key):
+        if self._lazy and (key in ["pore.coords", "throat.conns"]) \
+                and (key not in self.keys()):
+            return self._get_lazy_array(key)
+        return super().__getitem__(key)
+
+    def keys(self, element=None, mode=None, deep=False):
+        r"""
+        On ``lazy`` networks, ``pore.coords`` and ``throat.conns`` are listed
+        among the 'props' when a ``mode`` is given, so they are included by
+        ``props`` and by the exporters in ``io``, which generate them when
+        they are read.  See ``Base`` for details.
+        """
+        keys = super().keys(element=element, mode=mode, deep=deep)
+        if (not self._lazy) or (mode is None):
+            return keys
+        element = self._parse_element(element=element)
+        mode = self._parse_mode(mode=mode,
+                                allowed=['props', 'labels', 'all'])
+        lazy = []
+        if ('props' in mode) or ('all' in mode):
+            for key in ["pore.coords", "throat.conns"]:
+                if (key.split(".")[0] in element) and (key not in keys):
+                    lazy.append(key)
+        return lazy + keys
+
+    def __getstate__(self):
+        # Generated arrays are only referenced weakly, so cannot be stored
+        state = super().__getstate__()
+        state.pop("_lazy_arrays", None)
+        return state
+
+    def _get_lazy_array(self, key):
+        r"""
+        Generates ``pore.coords`` or ``throat.conns`` from the shape of the
+        lattice.  The array is referenced weakly, so it is reused as long as
+        it is held elsewhere (e.g. by the KD-tree of the coordinates) and
+        freed once it is not.
+        """
+        cache = self.__dict__.setdefault("_lazy_arrays", {})
+        ref = cache.get(key)
+        arr = None if ref is None else ref()
+        if arr is None:
+            if key == "pore.coords":
+                arr = np.empty((int(np.prod(self._shape)), 3), dtype=float)
+                self._generate_coords(arr, self._chunk_size)
+            else:
+                arr = np.empty((self._stencil["Nt"], 2),
+                               dtype=self._index_dtype)
+                self._generate_conns(arr, self._stencil["joints"],
+                                     self._chunk_size)
+            arr.flags.writeable = False
+            cache[key] = weakref.ref(arr)
+        return arr
+
+    def _get_stencil(self):
+        r"""
+        Returns the shape and joints of the lattice if the network is
+        ``lazy`` and its topology has not been changed since it was created,
+        otherwise ``None``.
+        """
+        if (not self._lazy) or ("throat.conns" in self.keys()):
+            return None
+        if (self.Np != np.prod(self._shape)) or (self.Nt != self._stencil["Nt"]):
+            return None
+        return self._stencil
+
+    def _stencil_adjacency(self):
+        r"""
+        Finds the adjacency matrix of the lattice in CSR form from the offsets
+        between neighboring pores, without using ``throat.conns``.
+
+        Returns
+        -------
+        A tuple containing the ``indptr`` and ``indices`` of the matrix, with
+        the indices on each row sorted, and the throat connecting each pair.
+        """
+        shape = np.array(self._shape)
+        strides = np.array([shape[1] * shape[2], shape[2], 1])
+        Np = int(np.prod(shape))
+        # Each joint connects a pore to neighbors on both sides, and numbering
+        # the throats as in _generate_conns requires the start of each joint
+        offsets = []
+        start = 0
+        for d in self._stencil["joints"]:
+            d = np.array(d)
+            box = shape - np.abs(d)
+            if np.all(box > 0):
+                offsets.append((d, d, start, tuple(box)))
+                offsets.append((-d, d, start, tuple(box)))
+            start += int(np.prod(box))
+        # Visiting the offsets by the change in index they cause sorts the
+        # neighbors on every row, since no pore has two offsets to one pore
+        offsets.sort(key=lambda item: int(np.sum(item[0] * strides)))
+        ijk = np.unravel_index(np.arange(Np), self._shape)
+        masks = []
+        counts = np.zeros(Np, dtype=np.int64)
+        for e, d, start, box in offsets:
+            mask = np.ones(Np, dtype=bool)
+            for ax in np.where(e != 0)[0]:
+                mask *= (ijk[ax] + e[ax] >= 0) * (ijk[ax] + e[ax] < shape[ax])
+            masks.append(mask)
+            counts += mask
+        indptr = np.zeros(Np + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int64)
+        throats = np.empty(indptr[-1], dtype=np.int64)
+        fill = indptr[:-1].copy()
+        for (e, d, start, box), mask in zip(offsets, masks):
+            Ps = np.where(mask)[0]
+            loc = fill[Ps]
+            indices[loc] = Ps + np.sum(e * strides)
+            # The tail of the throat is the neighbor when e points against d
+            tail = [ijk[ax][Ps] + (0 if e[ax] == d[ax] else e[ax])
+                    for ax in [0, 1, 2]]
+            first = (d < 0).astype(int)
+            local = np.ravel_multi_index([tail[ax] - first[ax]
+                                          for ax in [0, 1, 2]], box)
+            throats[loc] = start + local
+            fill[Ps] += 1
+        return indptr, indices, throats
+
+    def create_adjacency_matrix(self, weights=None, fmt='coo', triu=False,
+                                drop_zeros=False):
+        r"""
+        Generates a weighted adjacency matrix in the desired sparse format.
+        On ``lazy`` networks, 'csr' matrices with both triangles are built
+        from the lattice stencil.  See ``GenericNetwork`` for details.
+        """
+        if (self._get_stencil() is None) or (fmt != 'csr') or triu:
+            return super().create_adjacency_matrix(weights=weights, fmt=fmt,
+                                                   triu=triu,
+                                                   drop_zeros=drop_zeros)
+        if weights is None:
+            weights = np.ones((self.Nt,), dtype=int)
+        elif np.shape(weights)[0] not in [self.Nt, 2*self.Nt, (self.Nt, 2)]:
+            raise Exception('Received weights are of incorrect length')
+        weights = np.array(weights)
+        if weights.shape == (self.Nt, 2):
+            weights = weights.flatten(order='F')
+        indptr, indices, throats = self._stencil_adjacency()
+        if weights.shape == (2*self.Nt,):
+            # The second half of the weights is for the lower triangle
+            rows = np.repeat(np.arange(self.Np), np.diff(indptr))
+            weights = weights[throats + self.Nt*(indices < rows)]
+        else:
+            weights = weights[throats]
+        am = sprs.csr_matrix((weights, indices, indptr),
+                             shape=(self.Np, self.Np))
+        if drop_zeros:
+            am.eliminate_zeros()
+        return am
+
+    def create_incidence_matrix(self, weights=None, fmt='coo',
+                                drop_zeros=False):
+        r"""
+        Creates a weighted incidence matrix in the desired sparse format.
+        On ``lazy`` networks, 'csr' matrices are built from the lattice
+        stencil.  See ``GenericNetwork`` for details.
+        """
+        if (self._get_stencil() is None) or (fmt != 'csr'):
+            return super().create_incidence_matrix(weights=weights, fmt=fmt,
+                                                   drop_zeros=drop_zeros)
+        if weights is None:
+            weights = np.ones((self.Nt,), dtype=int)
+        elif np.shape(weights)[0] != self.Nt:
+            raise Exception('Received dataset of incorrect length')
+        indptr, indices, throats = self._stencil_adjacency()
+        im = sprs.csr_matrix((np.array(weights)[throats], throats, indptr),
+                             shape=(self.Np, self.Nt))
+        im.sort_indices()
+        if drop_zeros:
+            im.eliminate_zeros()
+        return im
 
     def add_boundary_pores(
         self, labels=["top", "bottom", "front", "back", "left", "right"], spacing=None
@@ -308,6 +573,9 @@ class Cubic(GenericNetwork):
         """
         if np.shape(values)[0] > self.num_pores("internal"):
             raise Exception("The array shape does not match the network")
+        if self._get_stencil() is not None:
+            # Pores of an intact lattice are numbered in the order of the array
+            return np.reshape(np.array(values, dtype=float), self._shape)
         Ps = np.array(self["pore.index"][self.pores("internal")], dtype=int)
         arr = np.ones(self._shape) * sp.nan
         ind = np.unravel_index(Ps, self._shape)
@@ -333,7 +601,10 @@ class Cubic(GenericNetwork):
         if np.shape(array) != self._shape:
             raise Exception("The array shape does not match the network")
         temp = array.flatten()
-        Ps = np.array(self["pore.index"][self.pores("internal")], dtype=int)
         propname = "pore." + propname.split(".")[-1]
+        if self._get_stencil() is not None:
+            self[propname] = temp.astype(float)
+            return
+        Ps = np.array(self["pore.index"][self.pores("internal")], dtype=int)
         self[propname] = sp.nan
         self[propname][self.pores("internal")] = temp[Ps]
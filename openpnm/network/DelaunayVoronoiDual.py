@@ -1,6 +1,6 @@
+import itertools
 import scipy as sp
 import numpy as np
-import scipy.sparse as sprs
 import scipy.spatial as sptl
 from openpnm import topotools
 from openpnm.utils import logging
@@ -85,29 +85,9 @@ class DelaunayVoronoiDual(GenericNetwork):
 
         # Combine points
         pts_all = np.vstack((vor.points, vor.vertices))
-        Nall = np.shape(pts_all)[0]
-
-        # Create adjacency matrix in lil format for quick construction
-        am = sprs.lil_matrix((Nall, Nall))
-        for ridge in vor.ridge_dict.keys():
-            # Make Delaunay-to-Delauny connections
-            [am.rows[i].extend([ridge[0], ridge[1]]) for i in ridge]
-            # Get voronoi vertices for current ridge
-            row = vor.ridge_dict[ridge].copy()
-            # Index Voronoi vertex numbers by number of delaunay points
-            row = [i + vor.npoints for i in row if i > -1]
-            # Make Voronoi-to-Delaunay connections
-            [am.rows[i].extend(row) for i in ridge]
-            # Make Voronoi-to-Voronoi connections
-            row.append(row[0])
-            [am.rows[row[i]].append(row[i+1]) for i in range(len(row)-1)]
-
-        # Finalize adjacency matrix by assigning data values
-        am.data = am.rows  # Values don't matter, only shape, so use 'rows'
-        # Convert to COO format for direct acces to row and col
-        am = am.tocoo()
-        # Extract rows and cols
-        conns = np.vstack((am.row, am.col)).T
+
+        # Find connections between all points directly from the ridges
+        conns = self._find_ridge_conns(vor)
 
         # Convert to sanitized adjacency matrix
         am = topotools.conns_to_am(conns)
@@ -142,6 +122,44 @@ class DelaunayVoronoiDual(GenericNetwork):
         self._trim_external_pores(shape=shape)
         self._label_faces()
 
+    @staticmethod
+    def _find_ridge_conns(vor):
+        r"""
+        Finds the Delaunay-Delaunay, Voronoi-Delaunay and Voronoi-Voronoi
+        connections defined by the ridges of the given Voronoi tessellation,
+        with Voronoi vertices numbered after the base points.
+
+        Notes
+        -----
+        The vertices of all ridges are flattened into a single array, with
+        the ridge of each one recorded alongside, so all connections are
+        found in bulk.  Each ridge connects its two base points to each other
+        and to each of its finite vertices, and the finite vertices form a
+        closed loop.  The returned connections may contain duplicates and
+        are meant to be sanitized with ``topotools.conns_to_am``.
+        """
+        ridge_points = np.array(vor.ridge_points, dtype=np.int64)
+        lengths = np.array([len(r) for r in vor.ridge_vertices], dtype=int)
+        verts = np.fromiter(itertools.chain.from_iterable(vor.ridge_vertices),
+                            dtype=np.int64, count=lengths.sum())
+        ridges = np.repeat(np.arange(lengths.size), lengths)
+        # Vertices at infinity are dropped before closing each loop
+        keep = verts > -1
+        verts = verts[keep] + vor.npoints
+        ridges = ridges[keep]
+        # Connect each vertex to the next one on its ridge, and the last to
+        # the first
+        counts = np.bincount(ridges, minlength=lengths.size)
+        starts = np.cumsum(counts) - counts
+        nxt = np.arange(1, verts.size + 1)
+        last = nxt == (starts + counts)[ridges]
+        nxt[last] = starts[ridges[last]]
+        conns = np.vstack((ridge_points,
+                           np.vstack((ridge_points[ridges, 0], verts)).T,
+                           np.vstack((ridge_points[ridges, 1], verts)).T,
+                           np.vstack((verts, verts[nxt])).T))
+        return conns
+
     @property
     def tri(self):
         if not hasattr(self, '_tri'):
@@ -196,11 +214,20 @@ class DelaunayVoronoiDual(GenericNetwork):
 
         # Move Delaunay boundary pores to centroid of Voronoi facet
         Ps = self.pores(labels=['boundary', 'delaunay'], mode='xnor')
-        for P in Ps:
-            Ns = self.find_neighbor_pores(pores=P)
-            Ns = Ps = self['pore.voronoi']*self.tomask(pores=Ns)
-            coords = np.mean(self['pore.coords'][Ns], axis=0)
-            self['pore.coords'][P] = coords
+        if Ps.size > 0:
+            am = self.get_adjacency_matrix(fmt='csr')
+            indptr, Ns = topotools.find_neighbor_sites(sites=Ps, am=am,
+                                                       flatten=False,
+                                                       include_input=True,
+                                                       ragged=True)
+            rows = np.repeat(np.arange(Ps.size), np.diff(indptr))
+            keep = self['pore.voronoi'][Ns]
+            rows, Ns = rows[keep], Ns[keep]
+            counts = np.bincount(rows, minlength=Ps.size)
+            for ax in range(3):
+                total = np.bincount(rows, weights=self['pore.coords'][Ns, ax],
+                                    minlength=Ps.size)
+                self['pore.coords'][Ps, ax] = total/counts
 
         self['pore.internal'] = ~self['pore.boundary']
         Ps = self.pores('internal')
@@ -232,23 +259,34 @@ class DelaunayVoronoiDual(GenericNetwork):
             from the 'delaunay' network. If no throats are specified, all
             'delaunay' throats are assumed.
 
-        Notes
-        -----
-        The method is not well optimized as it scans through each given throat
-        inside a for-loop, so it could be slow for large networks.
+        Returns
+        -------
+        An object array holding an array of Voronoi node indices for each
+        throat, sorted in ascending order.
 
         """
         if throats is None:
             throats = self.throats('delaunay')
-        temp = []
-        tvals = self['throat.interconnect'].astype(int)
-        am = self.create_adjacency_matrix(weights=tvals, fmt='lil',
-                                          drop_zeros=True)
-        for t in throats:
-            P12 = self['throat.conns'][t]
-            Ps = list(set(am.rows[P12][0]).intersection(am.rows[P12][1]))
-            temp.append(Ps)
-        return np.array(temp, dtype=object)
+        throats = self._parse_indices(throats)
+        if throats.size == 0:
+            return self._to_object_array([])
+        am = self._get_interconnect_am()
+        P12 = self['throat.conns'][throats]
+        # Label each neighbor of each end with the throat it belongs to, so
+        # the Voronoi nodes shared by both ends appear twice
+        keys = []
+        for Ps in P12.T:
+            indptr, Ns = topotools.find_neighbor_sites(sites=Ps, am=am,
+                                                       flatten=False,
+                                                       include_input=True,
+                                                       ragged=True)
+            rows = np.repeat(np.arange(throats.size), np.diff(indptr))
+            keys.append(rows*self.Np + Ns)
+        keys = np.sort(np.hstack(keys))
+        keys = keys[1:][keys[1:] == keys[:-1]]
+        counts = np.bincount(keys // self.Np, minlength=throats.size)
+        facets = np.split(keys % self.Np, np.cumsum(counts)[:-1])
+        return self._to_object_array(facets)
 
     def find_pore_hulls(self, pores=None):
         r"""
@@ -262,21 +300,40 @@ class DelaunayVoronoiDual(GenericNetwork):
             from the 'delaunay' network.  If no pores are given, then the hull
             is found for all 'delaunay' pores.
 
-        Notes
-        -----
-        This metod is not fully optimized as it scans through each pore in a
-        for-loop, so could be slow for large networks.
+        Returns
+        -------
+        An object array holding an array of Voronoi node indices for each
+        pore, sorted in ascending order.
+
         """
         if pores is None:
             pores = self.pores('delaunay')
-        temp = []
+        pores = self._parse_indices(pores)
+        if pores.size == 0:
+            return self._to_object_array([])
+        am = self._get_interconnect_am()
+        hulls = topotools.find_neighbor_sites(sites=pores, am=am,
+                                              flatten=False,
+                                              include_input=True)
+        return self._to_object_array(hulls)
+
+    def _get_interconnect_am(self):
+        r"""
+        Returns the adjacency matrix in CSR format containing only the
+        'interconnect' throats
+        """
         tvals = self['throat.interconnect'].astype(int)
-        am = self.create_adjacency_matrix(weights=tvals, fmt='lil',
+        am = self.create_adjacency_matrix(weights=tvals, fmt='csr',
                                           drop_zeros=True)
-        for p in pores:
-            Ps = am.rows[p]
-            temp.append(Ps)
-        return np.array(temp, dtype=object)
+        return am
+
+    @staticmethod
+    def _to_object_array(arrays):
+        # Filling element-wise keeps a 1D result when all lengths are equal
+        temp = np.empty(len(arrays), dtype=object)
+        for i, item in enumerate(arrays):
+            temp[i] = item
+        return temp
 
     def _parse_points(self, shape, points, num_points):
         # Deal with input arguments
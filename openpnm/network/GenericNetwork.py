@@ -1,3 +1,4 @@
+import itertools
 import scipy as sp
 import numpy as np
 import scipy.sparse as sprs
@@ -66,6 +67,15 @@ class GenericNetwork(Base, ModelsMixin):
     | ``find_nearby_pores``       | For a given set of pores, find pores that |
     |                             | are within a certain distance             |
     +-----------------------------+-------------------------------------------+
+    | ``find_pores_within_radius``| For a set of points, find the pores that  |
+    |                             | are within a certain distance of each     |
+    +-----------------------------+-------------------------------------------+
+    | ``find_nearest_pores``      | For a set of points, find the k pores     |
+    |                             | nearest to each                           |
+    +-----------------------------+-------------------------------------------+
+    | ``find_pores_within_box``   | For a set of boxes, find the pores that   |
+    |                             | lie inside each                           |
+    +-----------------------------+-------------------------------------------+
     | ``check_network_health``    | Check the topology for any problems such  |
     |                             | as isolated pores                         |
     +-----------------------------+-------------------------------------------+
@@ -128,6 +138,8 @@ class GenericNetwork(Base, ModelsMixin):
         # Initialize adjacency and incidence matrix dictionaries
         self._im = {}
         self._am = {}
+        # The KD-tree of the pore coordinates, see ``_get_kdtree``
+        self._kdtree = None
         self.add_model(propname='pore.coordination_number',
                        model=tm.coordination_number,
                        regen_mode='explicit')
@@ -143,6 +155,12 @@ class GenericNetwork(Base, ModelsMixin):
                     value = np.sort(value, axis=1)
         super().__setitem__(key, value)
 
+    def __getstate__(self):
+        # The KD-tree is rebuilt when needed rather than stored
+        state = super().__getstate__()
+        state.pop('_kdtree', None)
+        return state
+
     def __getitem__(self, key):
         element, prop = key.split('.', 1)
         # Deal with special keys first
@@ -622,10 +640,9 @@ class GenericNetwork(Base, ModelsMixin):
         pores = self._parse_indices(pores)
         if np.size(pores) == 0:
             return np.array([], ndmin=1, dtype=int)
-        if 'lil' not in self._am.keys():
-            self.get_adjacency_matrix(fmt='lil')
+        am = self.get_adjacency_matrix(fmt='csr')
         neighbors = topotools.find_neighbor_sites(sites=pores, logic=mode,
-                                                  am=self._am['lil'],
+                                                  am=am,
                                                   flatten=flatten,
                                                   include_input=include_input)
         return neighbors
@@ -698,10 +715,9 @@ class GenericNetwork(Base, ModelsMixin):
         if np.size(pores) == 0:
             return np.array([], ndmin=1, dtype=int)
         if flatten is False:
-            if 'lil' not in self._im.keys():
-                self.get_incidence_matrix(fmt='lil')
+            im = self.get_incidence_matrix(fmt='csr')
             neighbors = topotools.find_neighbor_bonds(sites=pores, logic=mode,
-                                                      im=self._im['lil'],
+                                                      im=im,
                                                       flatten=flatten)
         else:
             am = self.create_adjacency_matrix(fmt='coo', triu=True)
@@ -851,33 +867,171 @@ class GenericNetwork(Base, ModelsMixin):
             return np.array([], dtype=sp.int64)
         if r <= 0:
             raise Exception('Provided distances should be greater than 0')
-        # Create kdTree objects
-        kd = sptl.cKDTree(self['pore.coords'])
-        kd_pores = sptl.cKDTree(self['pore.coords'][pores])
-        # Perform search
-        Ps_within_r = kd_pores.query_ball_tree(kd, r=r)
-        # Remove self from each list
-        for i in range(len(Ps_within_r)):
-            Ps_within_r[i].remove(pores[i])
-        # Convert to flattened list by default
-        temp = np.concatenate((Ps_within_r))
-        Pn = np.unique(temp).astype(sp.int64)
-        # Remove inputs if necessary
+        # Perform search using the stored KD-tree
+        indptr, indices = self.find_pores_within_radius(
+            points=self['pore.coords'][pores], r=r)
+        rows = np.repeat(np.arange(len(pores)), np.diff(indptr))
+        # Remove self from each list, and inputs if necessary
+        keep = indices != pores[rows]
         if include_input is False:
-            Pn = Pn[~np.in1d(Pn, pores)]
-        # Convert list of lists to a list of nd-arrays
-        if flatten is False:
-            if len(Pn) == 0:  # Deal with no nearby neighbors
-                Pn = [np.array([], dtype=sp.int64) for i in pores]
-            else:
-                mask = np.zeros(shape=np.amax((Pn.max(), pores.max()))+1,
-                                dtype=bool)
-                mask[Pn] = True
-                temp = []
-                for item in Ps_within_r:
-                    temp.append(np.array(item, dtype=sp.int64)[mask[item]])
-                Pn = temp
-        return Pn
+            keep *= ~np.in1d(indices, pores)
+        indices, rows = indices[keep], rows[keep]
+        if flatten:
+            return np.unique(indices).astype(sp.int64)
+        # Convert to a list of nd-arrays, one per input pore
+        counts = np.bincount(rows, minlength=len(pores))
+        return np.split(indices, np.cumsum(counts)[:-1])
+
+    def _get_stencil(self):
+        r"""
+        Returns a description of the lattice from which the topology can be
+        computed without ``throat.conns``, or ``None`` if the topology is only
+        known from ``throat.conns``, as is the case for generic networks.  See
+        ``Cubic`` for a network that can return one.
+        """
+        return None
+
+    def _get_kdtree(self):
+        r"""
+        Returns a KD-tree of the pore coordinates.  The tree is stored and
+        reused until ``pore.coords`` is written, or the network is trimmed or
+        extended.
+
+        Notes
+        -----
+        Changes made to the coordinates in place, such as
+        ``pn['pore.coords'][:, 0] += 1``, are not detected.  Writing the array
+        back, as in ``pn['pore.coords'] = coords``, updates the tree.
+        """
+        coords = self['pore.coords']
+        version = self._versions.get('pore.coords', 0)
+        cache = getattr(self, '_kdtree', None)
+        if (cache is None) or (cache[0] is not coords) or \
+                (cache[1] != version):
+            cache = (coords, version, sptl.cKDTree(coords))
+            self._kdtree = cache
+        return cache[2]
+
+    def find_pores_within_radius(self, points, r):
+        r"""
+        For each of the given points, finds all pores within a given distance
+
+        Parameters
+        ----------
+        points : array_like
+            An N-by-3 array of coordinates (or a single point) around which
+            to search
+        r : scalar
+            The maximum distance between the points and the pores
+
+        Returns
+        -------
+        A tuple of ``(indptr, indices)`` arrays in CSR-style, such that the
+        pores near point ``i`` are ``indices[indptr[i]:indptr[i+1]]``, sorted
+        in ascending order.
+
+        See Also
+        --------
+        find_nearby_pores
+
+        Examples
+        --------
+        >>> import openpnm as op
+        >>> pn = op.network.Cubic(shape=[3, 3, 3])
+        >>> indptr, indices = pn.find_pores_within_radius([[0.5, 0.5, 0.5],
+        ...                                                [2.5, 0.5, 0.5]],
+        ...                                               r=1)
+        >>> print(indices[indptr[0]:indptr[1]])
+        [0 1 3 9]
+        >>> print(indices[indptr[1]:indptr[2]])
+        [ 9 18 19 21]
+        """
+        points = np.array(points, dtype=float, ndmin=2)
+        tree = self._get_kdtree()
+        hits = tree.query_ball_point(points, r=r)
+        return _lists_to_csr(hits)
+
+    def find_nearest_pores(self, points, k=1):
+        r"""
+        For each of the given points, finds the ``k`` nearest pores
+
+        Parameters
+        ----------
+        points : array_like
+            An N-by-3 array of coordinates (or a single point) around which
+            to search
+        k : int
+            The number of pores to find for each point.  If the network has
+            fewer than ``k`` pores then all of them are returned.
+
+        Returns
+        -------
+        A tuple of ``(indptr, indices)`` arrays in CSR-style, such that the
+        pores nearest to point ``i`` are ``indices[indptr[i]:indptr[i+1]]``,
+        sorted from nearest to furthest.
+
+        Examples
+        --------
+        >>> import openpnm as op
+        >>> pn = op.network.Cubic(shape=[3, 3, 3])
+        >>> indptr, indices = pn.find_nearest_pores([[0.4, 0.6, 0.9],
+        ...                                          [2.6, 0.4, 0.9]], k=2)
+        >>> print(indices)
+        [ 0  1 18 19]
+        """
+        points = np.array(points, dtype=float, ndmin=2)
+        k = min(int(k), self.Np)
+        tree = self._get_kdtree()
+        d, indices = tree.query(points, k=k)
+        indices = np.reshape(indices, (points.shape[0], k)).astype(sp.int64)
+        indptr = np.arange(0, indices.size + 1, k, dtype=sp.int64)
+        return indptr, indices.flatten()
+
+    def find_pores_within_box(self, lower, upper):
+        r"""
+        For each of the given boxes, finds all the pores that lie inside it
+
+        Parameters
+        ----------
+        lower, upper : array_like
+            N-by-3 arrays of the lower and upper corners of each box (or a
+            single box).  Pores lying on the faces of a box are included.
+
+        Returns
+        -------
+        A tuple of ``(indptr, indices)`` arrays in CSR-style, such that the
+        pores inside box ``i`` are ``indices[indptr[i]:indptr[i+1]]``, sorted
+        in ascending order.
+
+        Examples
+        --------
+        >>> import openpnm as op
+        >>> pn = op.network.Cubic(shape=[3, 3, 3])
+        >>> indptr, indices = pn.find_pores_within_box(lower=[0, 0, 0],
+        ...                                            upper=[2, 2, 3])
+        >>> print(indices)
+        [ 0  1  2  3  4  5  9 10 11 12 13 14]
+        """
+        lower = np.array(lower, dtype=float, ndmin=2)
+        upper = np.array(upper, dtype=float, ndmin=2)
+        lower, upper = np.broadcast_arrays(lower, upper)
+        center = (lower + upper)/2
+        half = (upper - lower)/2
+        if np.any(half < 0):
+            raise Exception('The upper corners must be above the lower ones')
+        # Find the pores inside the cube around each box, then those inside
+        # the box itself
+        tree = self._get_kdtree()
+        hits = tree.query_ball_point(center, r=half.max(), p=np.inf)
+        indptr, indices = _lists_to_csr(hits)
+        rows = np.repeat(np.arange(center.shape[0]), np.diff(indptr))
+        coords = self['pore.coords'][indices]
+        keep = np.all((coords >= lower[rows]) * (coords <= upper[rows]),
+                      axis=1)
+        counts = np.bincount(rows[keep], minlength=center.shape[0])
+        indptr = np.zeros(center.shape[0] + 1, dtype=sp.int64)
+        indptr[1:] = np.cumsum(counts)
+        return indptr, indices[keep]
 
     def check_network_health(self):
         r"""
@@ -908,3 +1062,20 @@ class GenericNetwork(Base, ModelsMixin):
         health = self.project.check_network_health()
 
         return health
+
+
+def _lists_to_csr(lists):
+    r"""
+    Converts the lists of indices returned by the queries of a KD-tree into
+    CSR-style ``(indptr, indices)`` arrays, with the indices of each list
+    sorted in ascending order
+    """
+    counts = np.fromiter((len(i) for i in lists), dtype=sp.int64,
+                         count=len(lists))
+    indptr = np.zeros(len(lists) + 1, dtype=sp.int64)
+    indptr[1:] = np.cumsum(counts)
+    indices = np.fromiter(itertools.chain.from_iterable(lists),
+                          dtype=sp.int64, count=indptr[-1])
+    rows = np.repeat(np.arange(len(lists)), counts)
+    indices = indices[np.lexsort((indices, rows))]
+    return indptr, indices
@@ -10,8 +10,75 @@ logger = logging.getLogger(__name__)
 ws = Workspace()
 
 
+def _gather_rows(indptr, indices, rows):
+    r"""
+    Gathers the given rows of a CSR structure into a new ragged structure
+
+    Parameters
+    ----------
+    indptr, indices : ndarray
+        The ``indptr`` and ``indices`` arrays of a CSR matrix.
+
+    rows : array_like
+        The rows to extract, in the order they should be returned.
+
+    Returns
+    -------
+    A tuple containing the ``indptr`` and ``indices`` of the extracted rows.
+
+    """
+    rows = np.array(rows, ndmin=1, dtype=np.int64)
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    new_indptr = np.zeros(rows.size + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_indptr[1:])
+    # Shift a running index by the offset of each row's segment
+    offsets = np.repeat(starts - new_indptr[:-1], lengths)
+    locs = np.arange(new_indptr[-1], dtype=np.int64) + offsets
+    return new_indptr, indices[locs].astype(np.int64)
+
+
+def _find_csr_neighbors(rows, mat, logic, flatten, ragged, exclude=None):
+    r"""
+    Finds the neighbors of the given rows of a sparse matrix and filters them
+    according to ``logic``, which is the engine behind
+    ``find_neighbor_sites`` and ``find_neighbor_bonds``.
+    """
+    if mat.format != 'csr':
+        mat = mat.tocsr()
+    if not mat.has_canonical_format:
+        mat = mat.copy()
+        mat.sum_duplicates()
+    rows = np.array(rows, ndmin=1, dtype=np.int64)
+    indptr, indices = _gather_rows(mat.indptr, mat.indices, rows)
+    counts = np.bincount(indices, minlength=mat.shape[1])
+    if logic in ['or', 'union', 'any']:
+        mask = counts > 0
+    elif logic in ['xor', 'exclusive_or']:
+        mask = counts == 1
+    elif logic in ['xnor', 'nxor', 'shared']:
+        mask = counts > 1
+    elif logic in ['and', 'all', 'intersection']:
+        mask = counts == rows.size
+    else:
+        raise Exception('Specified logic is not implemented')
+    if exclude is not None:
+        mask[exclude] = False
+    if flatten:
+        return np.where(mask)[0]
+    keep = mask[indices]
+    row_ids = np.repeat(np.arange(rows.size), np.diff(indptr))
+    lengths = np.bincount(row_ids[keep], minlength=rows.size)
+    indptr = np.zeros(rows.size + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = indices[keep]
+    if ragged:
+        return indptr, indices
+    return np.split(indices, indptr[1:-1])
+
+
 def find_neighbor_sites(sites, am, flatten=True, include_input=False,
-                        logic='or'):
+                        logic='or', ragged=False):
     r"""
     Given a symmetric adjacency matrix, finds all sites that are connected
     to the input sites.
@@ -21,14 +88,13 @@ def find_neighbor_sites(sites, am, flatten=True, include_input=False,
     am : scipy.sparse matrix
         The adjacency matrix of the network.  Must be symmetrical such that if
         sites *i* and *j* are connected, the matrix contains non-zero values
-        at locations (i, j) and (j, i).
+        at locations (i, j) and (j, i).  Matrices in 'csr' format are used
+        directly while other formats are converted first.
 
     flatten : boolean
         If ``True`` (default) the returned result is a compressed array of all
-        neighbors, or a list of lists with each sub-list containing the
-        neighbors for each input site.  Note that an *unflattened* list might
-        be slow to generate since it is a Python ``list`` rather than a Numpy
-        array.
+        neighbors, or a list of arrays with each sub-array containing the
+        neighbors for each input site.
 
     include_input : boolean
         If ``False`` (default) the input sites will be removed from the result.
@@ -53,11 +119,19 @@ def find_neighbor_sites(sites, am, flatten=True, include_input=False,
         known as 'intersection' in set theory and (somtimes) as 'all' in
         boolean logic.  Both keywords are accepted and treated as 'and'.
 
+    ragged : boolean
+        If ``True`` and ``flatten`` is ``False``, the neighbors of each input
+        site are returned as an ``(indptr, indices)`` tuple in the style of a
+        CSR matrix, so the neighbors of ``sites[i]`` are found in
+        ``indices[indptr[i]:indptr[i+1]]``.  This avoids splitting the result
+        into a separate array for each site.  The default is ``False``.
+
     Returns
     -------
     An array containing the neighboring sites filtered by the given logic.  If
-    ``flatten`` is ``False`` then the result is a list of lists containing the
-    neighbors of each input site.
+    ``flatten`` is ``False`` then the result is a list of arrays containing the
+    neighbors of each input site, or an ``(indptr, indices)`` tuple if
+    ``ragged`` is ``True``.
 
     See Also
     --------
@@ -72,45 +146,18 @@ def find_neighbor_sites(sites, am, flatten=True, include_input=False,
     sites are considered.
 
     """
-    if am.format != 'lil':
-        am = am.tolil(copy=False)
-    n_sites = am.shape[0]
-    rows = [am.rows[i] for i in np.array(sites, ndmin=1)]
-    if len(rows) == 0:
+    sites = np.array(sites, ndmin=1, dtype=np.int64)
+    if sites.size == 0:
         return []
-    neighbors = np.hstack(rows).astype(sp.int64)  # Flatten list to apply logic
-    if logic in ['or', 'union', 'any']:
-        neighbors = np.unique(neighbors)
-    elif logic in ['xor', 'exclusive_or']:
-        neighbors = np.unique(np.where(np.bincount(neighbors) == 1)[0])
-    elif logic in ['xnor', 'nxor']:
-        neighbors = np.unique(np.where(np.bincount(neighbors) > 1)[0])
-    elif logic in ['and', 'all', 'intersection']:
-        neighbors = set(neighbors)
-        [neighbors.intersection_update(i) for i in rows]
-        neighbors = np.array(list(neighbors), dtype=sp.int64, ndmin=1)
-    else:
-        raise Exception('Specified logic is not implemented')
-    # Deal with removing inputs or not
-    mask = np.zeros(shape=n_sites, dtype=bool)
-    mask[neighbors] = True
-    if not include_input:
-        mask[sites] = False
-    # Finally flatten or not
-    if flatten:
-        neighbors = np.where(mask)[0]
-    else:
-        if (neighbors.size > 0):
-            for i in range(len(rows)):
-                vals = np.array(rows[i], dtype=sp.int64)
-                rows[i] = vals[mask[vals]]
-            neighbors = rows
-        else:
-            neighbors = [np.array([], dtype=int) for i in range(len(sites))]
+    exclude = None if include_input else sites
+    neighbors = _find_csr_neighbors(rows=sites, mat=am, logic=logic,
+                                    flatten=flatten, ragged=ragged,
+                                    exclude=exclude)
     return neighbors
 
 
-def find_neighbor_bonds(sites, im=None, am=None, flatten=True, logic='or'):
+def find_neighbor_bonds(sites, im=None, am=None, flatten=True, logic='or',
+                        ragged=False):
     r"""
     Given an incidence matrix, finds all sites that are connected to the
     input sites.
@@ -122,8 +169,9 @@ def find_neighbor_bonds(sites, im=None, am=None, flatten=True, logic='or'):
     im : scipy.sparse matrix
         The incidence matrix of the network.  Must be shaped as (N-sites,
         N-bonds), with non-zeros indicating which sites are connected. Either
-        ``am`` or ``im`` must be given.  Passing in ``im`` is slower, but more
-        powerful as it allows for an unflattened list of neighbors.
+        ``am`` or ``im`` must be given.  Passing in ``im`` allows for an
+        unflattened list of neighbors, and is used directly if in 'csr'
+        format.
 
     am : scipy.sparse matrix (optional)
         The adjacency matrix of the network. Either ``am`` or ``im`` must be
@@ -132,10 +180,8 @@ def find_neighbor_bonds(sites, im=None, am=None, flatten=True, logic='or'):
 
     flatten : boolean (default is ``True``)
         Indicates whether the returned result is a compressed array of all
-        neighbors, or a list of lists with each sub-list containing the
-        neighbors for each input site.  Note that an *unflattened* list might
-        be slow to generate since it is a Python ``list`` rather than a Numpy
-        array.
+        neighbors, or a list of arrays with each sub-array containing the
+        neighbors for each input site.
 
     logic : string
         Specifies logic to filter the resulting list.  Options are:
@@ -157,11 +203,18 @@ def find_neighbor_bonds(sites, im=None, am=None, flatten=True, logic='or'):
         known as 'intersection' in set theory and (somtimes) as 'all' in
         boolean logic.  Both keywords are accepted and treated as 'and'.
 
+    ragged : boolean
+        If ``True`` and ``flatten`` is ``False``, the neighbors of each input
+        site are returned as an ``(indptr, indices)`` tuple in the style of a
+        CSR matrix rather than as a list of arrays.  This requires ``im``.
+        The default is ``False``.
+
     Returns
     -------
     An array containing the neighboring bonds filtered by the given logic.  If
-    ``flatten`` is ``False`` then the result is a list of lists containing the
-    neighbors of each given input site.
+    ``flatten`` is ``False`` then the result is a list of arrays containing the
+    neighbors of each given input site, or an ``(indptr, indices)`` tuple if
+    ``ragged`` is ``True``.
 
     See Also
     --------
@@ -177,35 +230,11 @@ def find_neighbor_bonds(sites, im=None, am=None, flatten=True, logic='or'):
 
     """
     if im is not None:
-        if im.format != 'lil':
-            im = im.tolil(copy=False)
-        rows = [im.rows[i] for i in np.array(sites, ndmin=1, dtype=sp.int64)]
-        if len(rows) == 0:
+        sites = np.array(sites, ndmin=1, dtype=np.int64)
+        if sites.size == 0:
             return []
-        neighbors = np.hstack(rows).astype(sp.int64)
-        n_bonds = int(im.nnz/2)
-        if logic in ['or', 'union', 'any']:
-            neighbors = np.unique(neighbors)
-        elif logic in ['xor', 'exclusive_or']:
-            neighbors = np.unique(np.where(np.bincount(neighbors) == 1)[0])
-        elif logic in ['xnor', 'shared']:
-            neighbors = np.unique(np.where(np.bincount(neighbors) > 1)[0])
-        elif logic in ['and', 'all', 'intersection']:
-            neighbors = set(neighbors)
-            [neighbors.intersection_update(i) for i in rows]
-            neighbors = np.array(list(neighbors), dtype=int, ndmin=1)
-        else:
-            raise Exception('Specified logic is not implemented')
-        if (flatten is False):
-            if (neighbors.size > 0):
-                mask = np.zeros(shape=n_bonds, dtype=bool)
-                mask[neighbors] = True
-                for i in range(len(rows)):
-                    vals = np.array(rows[i], dtype=sp.int64)
-                    rows[i] = vals[mask[vals]]
-                neighbors = rows
-            else:
-                neighbors = [np.array([], dtype=sp.int64) for i in range(len(sites))]
+        neighbors = _find_csr_neighbors(rows=sites, mat=im, logic=logic,
+                                        flatten=flatten, ragged=ragged)
         return neighbors
     elif am is not None:
         if am.format != 'coo':
@@ -1021,6 +1050,12 @@ def trim(network, pores=[], throats=[]):
             network['throat.all'] = np.array([], ndmin=1)
             return
 
+    # Arrays generated by lazy lattices must be stored to be trimmed too
+    if getattr(network, '_lazy', False):
+        for key in ['pore.coords', 'throat.conns']:
+            if key not in network.keys():
+                network.update({key: np.array(network[key])})
+
     # Temporarily store throat conns and pore map for processing later
     Np_old = network.Np
     Nt_old = network.Nt
@@ -1054,6 +1089,12 @@ def trim(network, pores=[], throats=[]):
     # Clear adjacency and incidence matrices which will be out of date now
     network._am.clear()
     network._im.clear()
+    network._kdtree = None
+    # As well as any stored subdomain locations
+    for obj in network.project:
+        obj._interleave_cache.clear()
+        if hasattr(obj, '_locations'):
+            obj._locations.clear()
 
 
 def extend(network, pore_coords=[], throat_conns=[], labels=[]):
@@ -1140,6 +1181,8 @@ def extend(network, pore_coords=[], throat_conns=[], labels=[]):
     # Clear adjacency and incidence matrices which will be out of date now
     network._am.clear()
     network._im.clear()
+    network._kdtree = None
+    network._interleave_cache.clear()
 
 
 def reduce_coordination(network, z):
@@ -1298,14 +1341,13 @@ def find_surface_pores(network, markers=None, label='surface'):
                 raise Exception('Markers must be 3D for this network')
     pts = np.vstack((coords, markers))
     tri = sptl.Delaunay(pts, incremental=False)
-    (indices, indptr) = tri.vertex_neighbor_vertices
-    for k in range(network.Np, tri.npoints):
-        neighbors = indptr[indices[k]:indices[k+1]]
-        inds = np.where(neighbors < network.Np)
-        neighbors = neighbors[inds]
-        if 'pore.'+label not in network.keys():
-            network['pore.'+label] = False
-        network['pore.'+label][neighbors] = True
+    (indptr, indices) = tri.vertex_neighbor_vertices
+    # The neighbors of all markers are found at once from the CSR arrays
+    neighbors = indices[indptr[network.Np]:indptr[tri.npoints]]
+    neighbors = neighbors[neighbors < network.Np]
+    if 'pore.'+label not in network.keys():
+        network['pore.'+label] = False
+    network['pore.'+label][neighbors] = True
 
 
 def dimensionality(network):
@@ -1543,12 +1585,26 @@ def stitch(network, donor, P_network, P_donor, method='nearest',
     N_init['pore'] = network.Np
     N_init['throat'] = network.Nt
     if method == 'nearest':
-        P1 = P_network
-        P2 = P_donor + N_init['pore']  # Increment pores on donor
-        C1 = network['pore.coords'][P_network]
-        C2 = donor['pore.coords'][P_donor]
-        D = sp.spatial.distance.cdist(C1, C2)
-        [P1_ind, P2_ind] = np.where(D <= len_max)
+        P1 = np.array(P_network, ndmin=1)
+        P2 = np.array(P_donor, ndmin=1) + N_init['pore']  # Increment pores
+        C1 = network['pore.coords'][P1]
+        if np.isinf(len_max):
+            P1_ind = np.repeat(np.arange(P1.size), P2.size)
+            P2_ind = np.tile(np.arange(P2.size), P1.size)
+        else:
+            # Search the donor's KD-tree rather than computing all distances.
+            # Its coords are often translated in place before stitching, which
+            # the stored tree would not notice, so it is rebuilt here.
+            donor._kdtree = None
+            indptr, indices = donor.find_pores_within_radius(C1, r=len_max)
+            loc = -np.ones(donor.Np, dtype=int)
+            loc[P_donor] = np.arange(P2.size)
+            P1_ind = np.repeat(np.arange(P1.size), np.diff(indptr))
+            P2_ind = loc[indices]
+            keep = P2_ind >= 0
+            P1_ind, P2_ind = P1_ind[keep], P2_ind[keep]
+            order = np.lexsort((P2_ind, P1_ind))
+            P1_ind, P2_ind = P1_ind[order], P2_ind[order]
         conns = np.vstack((P1[P1_ind], P2[P2_ind])).T
     else:
         raise Exception('<{}> method not supported'.format(method))
@@ -1,9 +1,11 @@
 import time
+import weakref
 import h5py
 import numpy as np
 import openpnm
 from copy import deepcopy
 from openpnm.utils import SettingsDict, HealthDict, Workspace, logging
+from openpnm.utils.misc import is_valid_propname
 logger = logging.getLogger(__name__)
 ws = Workspace()
 
@@ -88,9 +90,30 @@ class Project(list):
                 # Must use append since extend breaks the dicts up into
                 # separate objects, while append keeps it as a single object.
                 super().append(item)
+                self._register(item)
             else:
                 raise Exception('Only OpenPNM objects can be added')
 
+    def _register(self, obj):
+        r"""
+        Stores a weak reference to this Project on the given object so that
+        ``obj.project`` can be found without scanning the Workspace
+        """
+        obj._project_ref = weakref.ref(self)
+        if obj._isa('network'):
+            self._network = obj
+
+    def _unregister(self, obj):
+        r"""
+        Removes the reference to this Project from the given object, if
+        present
+        """
+        ref = getattr(obj, '_project_ref', None)
+        if (ref is not None) and (ref() is self):
+            obj._project_ref = None
+        if getattr(self, '_network', None) is obj:
+            self._network = None
+
     def append(self, obj):
         r"""
         The Project (a list) must be kept as a flat list, so the append
@@ -166,6 +189,8 @@ class Project(list):
 
         """
         if len(objtype) == 0:
+            for obj in self:
+                self._unregister(obj)
             super().clear()
         else:
             names = [obj.name for obj in self]
@@ -464,6 +489,7 @@ class Project(list):
                 if key.split('.')[-1] == obj.name:
                     del item[key]
         super().remove(obj)
+        self._unregister(obj)
 
     def save_object(self, obj):
         r"""
@@ -679,9 +705,13 @@ class Project(list):
 
     @property
     def network(self):
+        net = getattr(self, '_network', None)
+        if (net is not None) and (net.project is self):
+            return net
         net = list(self._get_objects_by_type('network').values())
         if len(net) > 0:
             net = net[0]
+            self._network = net
         else:
             net = None
         return net
@@ -989,44 +1019,158 @@ class Project(list):
         df = df.rename(index={k: indices[k] for k in range(len(indices))})
         return df.T
 
-    def _regenerate_models(self, objs=[], propnames=[]):
+    def regenerate_models(self, objs=None, propnames=None, upstream=False,
+                          only_dirty=False):
         r"""
-        Can be used to regenerate models across all objects in the project.
+        Regenerates models across all objects in the project, with each model
+        being run once and in an order that respects dependencies between
+        objects.
 
         Parameters
         ----------
         objs : list of OpenPNM objects
             Can be used to specify which specific objects to regenerate.  The
-            default is to regenerate all objects.  If a subset of objects is
-            given, this function ensure they are generated in a sensible order
-            such as any phases are done before any physics objects.
+            default is to regenerate all objects, which is also the case if an
+            empty list is given.
 
         propnames : list of strings, or string
-            The specific model to regenerate.  If none are given then ALL
-            models on all objects are regenerated.  If a subset is given,
-            then only object that have a corresponding model are regenerated,
-            to avoid any problems.  This means that a single model can be
-            given, without specifying the objects.
+            The specific model to regenerate.  If none are given (or the list
+            is empty) then ALL models on all objects are regenerated (except
+            for those whose ``regen_mode`` is 'explicit').  If a subset is
+            given, then only objects that have a corresponding model are
+            regenerated.  This means that a single model can be given, without
+            specifying the objects.
+
+        upstream : boolean
+            If ``True`` then the models which the given ``propnames`` depend
+            upon, directly or indirectly, are also regenerated, including
+            those on other objects (e.g. the Geometry models needed by a
+            Physics model).  The default is ``False``.
+
+        only_dirty : boolean
+            If ``True`` then models whose data is already up to date are
+            skipped.  See ``regenerate_models`` on the individual objects for
+            details.
+
+        Notes
+        -----
+        The order is found by combining the models on all objects into a
+        single dependency graph, where a model on a Physics may depend on the
+        models of its Phase and of the Network and Geometries, while a model
+        on a Phase may also depend on the models of its Physics.  The graph is
+        stored and reused until a model is added, removed or changed on any
+        object.
 
         """
-        objs = list(objs)
-        if objs == []:
+        # An empty list means all objects or models, as in the earlier
+        # private version of this method
+        if not objs:
             objs = self
+        objs = [i for i in objs if hasattr(i, 'models')]
         if type(propnames) is str:
             propnames = [propnames]
-        # Sort objs in the correct order (geom, phase, phys)
-        net = [i for i in objs if i is self.network]
-        geoms = [i for i in objs if i in self.geometries().values()]
-        phases = [i for i in objs if i in self.phases().values()]
-        phys = [i for i in objs if i in self.physics().values()]
-        objs = net + geoms + phases + phys
+        if not propnames:
+            propnames = None
+        nodes = []
+        for obj in objs:
+            if propnames is None:
+                nodes.extend([(obj.name, k) for k, v in obj.models.items()
+                              if v['regen_mode'] != 'explicit'])
+            else:
+                nodes.extend([(obj.name, k) for k in obj.models.keys()
+                              if k in propnames])
+        if upstream:
+            import networkx as nx
+            dg = self._get_model_graph()[0]
+            for node in list(nodes):
+                for item in nx.ancestors(dg, node):
+                    obj, prop = self[item[0]], item[1]
+                    if obj.models[prop]['regen_mode'] != 'explicit':
+                        nodes.append(item)
+        for obj, prop in self._get_model_plan(nodes):
+            obj._regen(prop, only_dirty=only_dirty)
+
+    def _get_model_plan(self, nodes):
+        r"""
+        Returns the given ``(obj.name, propname)`` pairs as a list of
+        ``(obj, propname)`` tuples in the order the models should be run
+        """
+        nodes = set(nodes)
+        order = self._get_model_graph()[1]
+        return [(self[i[0]], i[1]) for i in order if i in nodes]
+
+    def _has_phase(self, physics):
+        r"""
+        Returns ``True`` if the given physics is assigned to a phase, in which
+        case ``find_phase`` will find it
+        """
+        if 'phase' in physics.settings.keys():
+            return physics.settings['phase'] in self.phases().keys()
+        for phase in self.phases().values():
+            if ('pore.'+physics.name in phase) \
+                    or ('throat.'+physics.name in phase):
+                return True
+        return False
+
+    def _get_model_graph(self):
+        r"""
+        Returns the dependency graph of all models in the project, with each
+        node being an ``(obj.name, propname)`` tuple, along with the list of
+        nodes in the order they should be run.  The result is stored until the
+        models or the objects in the project are changed.
+        """
+        import networkx as nx
+
+        objs = [i for i in self if hasattr(i, 'models')]
+        # Find the full domain object of each object (i.e. phase of physics)
+        domains = {}
         for obj in objs:
-            if len(propnames):
-                for model in propnames:
-                    if model in obj.models.keys():
-                        obj.regenerate_models(propnames=model)
+            if obj._isa('physics') and not self._has_phase(obj):
+                # A physics not yet assigned to a phase is its own domain
+                domains[obj.name] = obj.name
             else:
-                obj.regenerate_models()
+                domains[obj.name] = self.find_full_domain(obj).name
+        signature = [(i.name, id(i.models), i.models._version,
+                      domains[i.name]) for i in objs]
+        cache = getattr(self, '_model_graph', None)
+        if (cache is not None) and (cache[0] == signature):
+            return cache[1:]
+        # Find which models produce each propname on each full domain
+        producers = {}
+        for obj in objs:
+            for prop in obj.models.keys():
+                key = (domains[obj.name], prop)
+                producers.setdefault(key, []).append((obj.name, prop))
+        net = self.network
+        dg = nx.DiGraph()
+        for obj in objs:
+            for prop, mod in obj.models.items():
+                node = (obj.name, prop)
+                dg.add_node(node)
+                for param in mod.values():
+                    if not is_valid_propname(param):
+                        continue
+                    # Phases and physics may also use data from the network
+                    sources = producers.get((domains[obj.name], param), [])
+                    if (not sources) and (net is not None):
+                        sources = producers.get((net.name, param), [])
+                    for item in sources:
+                        if item != node:
+                            dg.add_edge(item, node)
+        if not nx.is_directed_acyclic_graph(dg):
+            cycle = [i[0] for i in nx.find_cycle(dg)]
+            raise Exception('Cyclic dependency found: ' + ' -> '.join(
+                            [i[0] + '.' + i[1] for i in cycle + cycle[:1]]))
+        # Break ties using object type, then project order, then model order
+        types = ['network', 'geometry', 'phase', 'physics']
+        rank = {}
+        for i, obj in enumerate(objs):
+            t = [j for j, k in enumerate(types) if obj._isa(k)] + [len(types)]
+            for j, prop in enumerate(obj.models.dependency_list()):
+                rank[(obj.name, prop)] = (t[0], i, j)
+        order = list(nx.lexicographical_topological_sort(dg, key=rank.get))
+        self._model_graph = (signature, dg, order)
+        return dg, order
 
     def get_grid(self, astype='table'):
         r"""
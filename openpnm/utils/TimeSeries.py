@@ -0,0 +1,177 @@
+import os
+import tempfile
+import h5py
+import numpy as np
+from openpnm.utils import logging
+logger = logging.getLogger(__name__)
+
+
+class TimeSeries():
+    r"""
+    A compact store for the results of transient simulations, holding one
+    row of ``Np`` values per output time in a single 2D array.
+
+    Parameters
+    ----------
+    Np : int
+        The number of values stored at each time, usually the number of pores
+    n_times : int
+        The number of times to preallocate space for.  The store is enlarged
+        automatically if more times are added.
+    storage : string
+        Where the values are kept. Options are:
+
+        'array' : (default) A numpy array held in memory
+
+        'memmap' : A numpy memory-mapped file, for results that do not fit in
+        memory
+
+        'hdf5' : A dataset in an HDF5 file, for results that do not fit in
+        memory
+
+    filename : string
+        The file used by the 'memmap' and 'hdf5' options. If not given a
+        temporary file is created, which is deleted when the store is closed
+        or garbage collected.
+    t_precision : int
+        The number of decimal places that times are rounded to when looking
+        them up.  The default is 12.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from openpnm.utils import TimeSeries
+    >>> ts = TimeSeries(Np=3, n_times=2)
+    >>> ts.append(0.5, np.ones(3))
+    >>> ts.append(1.0, np.zeros(3))
+    >>> ts.times
+    array([0.5, 1. ])
+    >>> ts[0.5]
+    array([1., 1., 1.])
+
+    """
+
+    def __init__(self, Np, n_times, storage='array', filename=None,
+                 t_precision=12, dtype=float):
+        self.Np = int(Np)
+        self.t_precision = t_precision
+        self.storage = storage
+        self._times = np.zeros(max(int(n_times), 1), dtype=float)
+        self._index = {}
+        self._n = 0
+        self._file = None
+        self._temporary = False
+        shape = (self._times.size, self.Np)
+        if storage == 'array':
+            self._data = np.zeros(shape, dtype=dtype)
+        elif storage in ['memmap', 'hdf5']:
+            if filename is None:
+                suffix = '.dat' if storage == 'memmap' else '.hdf5'
+                fd, filename = tempfile.mkstemp(suffix=suffix)
+                os.close(fd)
+                self._temporary = True
+            self.filename = filename
+            if storage == 'memmap':
+                self._data = np.memmap(filename, dtype=dtype, mode='w+',
+                                       shape=shape)
+            else:
+                self._file = h5py.File(filename, 'w')
+                self._data = self._file.create_dataset(
+                    'data', shape=shape, dtype=dtype,
+                    maxshape=(None, self.Np), chunks=(1, self.Np))
+        else:
+            raise Exception(f'Unrecognized storage: {storage}')
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, t):
+        return self._key(t) in self._index
+
+    def __getitem__(self, t):
+        r"""
+        Returns the values stored at time ``t``.  For the 'array' and 'memmap'
+        options this is a view into the store.
+        """
+        try:
+            i = self._index[self._key(t)]
+        except KeyError:
+            raise KeyError(t)
+        return self._data[i]
+
+    def __getstate__(self):
+        # File handles can't be pickled, so a copy of the data is kept instead
+        state = self.__dict__.copy()
+        state['_data'] = self.data
+        state['_times'] = self.times
+        state['_file'] = None
+        state['_temporary'] = False
+        state['storage'] = 'array'
+        return state
+
+    def _key(self, t):
+        return round(float(t), self.t_precision)
+
+    def _get_times(self):
+        return self._times[:self._n].copy()
+
+    times = property(fget=_get_times)
+
+    def _get_data(self):
+        return np.array(self._data[:self._n])
+
+    data = property(fget=_get_data)
+
+    def append(self, t, values):
+        r"""
+        Stores the values for time ``t``, overwriting them if ``t`` is already
+        in the store.
+        """
+        key = self._key(t)
+        if key in self._index:
+            self._data[self._index[key]] = values
+            return
+        if self._n == self._times.size:
+            self._grow(2*self._times.size)
+        self._data[self._n] = values
+        self._times[self._n] = t
+        self._index[key] = self._n
+        self._n += 1
+
+    def _grow(self, n):
+        logger.debug(f'Enlarging time series to {n} times')
+        self._times = np.hstack((self._times, np.zeros(n - self._times.size)))
+        if self.storage == 'array':
+            data = np.zeros((n, self.Np), dtype=self._data.dtype)
+            data[:self._n] = self._data[:self._n]
+            self._data = data
+        elif self.storage == 'memmap':
+            self._data.flush()
+            dtype = self._data.dtype
+            del self._data
+            self._data = np.memmap(self.filename, dtype=dtype, mode='r+',
+                                   shape=(n, self.Np))
+        else:
+            self._data.resize((n, self.Np))
+
+    def close(self):
+        r"""
+        Closes the file used by the 'memmap' and 'hdf5' options, and deletes
+        it if it was a temporary file.  The data is no longer accessible
+        afterwards.
+        """
+        if self.storage == 'memmap' and hasattr(self._data, 'flush'):
+            self._data.flush()
+            self._data = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._temporary:
+            os.remove(self.filename)
+            self._temporary = False
@@ -1,4 +1,5 @@
 import openpnm
+import itertools
 import numpy as np
 from openpnm.utils import SettingsDict, logging
 logger = logging.getLogger(__name__)
@@ -77,6 +78,28 @@ class Workspace(dict):
         if not isinstance(project, openpnm.utils.Project):
             project = openpnm.utils.Project(project, name=name)
         super().__setitem__(name, project)
+        for obj in project:
+            project._register(obj)
+
+    def __delitem__(self, name):
+        project = self[name]
+        super().__delitem__(name)
+        for obj in project:
+            project._unregister(obj)
+
+    def pop(self, name, *args):
+        if name not in self.keys():
+            return super().pop(name, *args)
+        project = super().pop(name)
+        for obj in project:
+            project._unregister(obj)
+        return project
+
+    def clear(self):
+        for project in list(self.values()):
+            for obj in project:
+                project._unregister(obj)
+        super().clear()
 
     def copy(self):
         r"""
@@ -313,6 +336,19 @@ class Workspace(dict):
         self._next_id += size
         return ids
 
+    def _gen_version(self):
+        r"""
+        Returns an integer larger than any previously returned value.
+
+        These are used to stamp each array when it is written to an object,
+        so that comparing stamps tells which of two arrays was written more
+        recently, even if they are on different objects.  This is used by
+        ``regenerate_models`` to find models whose inputs have changed.
+        """
+        if not hasattr(self, '_version_counter'):
+            self._version_counter = itertools.count(1)
+        return next(self._version_counter)
+
     def __str__(self):
         s = []
         hr = '―'*78
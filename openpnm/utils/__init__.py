@@ -24,6 +24,12 @@ from .misc import unique_list
 from .misc import tic, toc
 from .misc import is_symmetric
 from .misc import nbr_to_str
+from .misc import jit_kernel
+from .solvers import GenericSolver
+from .solvers import register_solver
+from .solvers import get_solver
+from .solvers import list_solvers
+from .TimeSeries import TimeSeries
 from .Workspace import Workspace
 from .Project import Project
 
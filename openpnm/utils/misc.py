@@ -554,7 +554,10 @@ def is_symmetric(a, rtol=1e-10):
     if a.shape[0] != a.shape[1]:
         raise Exception("'a' must be a square matrix.")
 
-    atol = _np.amin(_np.absolute(a.data)) * rtol
+    # Stored zeros (e.g. entries removed by boundary conditions) are ignored
+    vals = _np.absolute(a.data if _sp.sparse.issparse(a) else a)
+    vals = vals[vals != 0]
+    atol = _np.amin(vals) * rtol if vals.size else 0
     if _sp.sparse.issparse(a):
         issym = False if ((a - a.T) > atol).nnz else True
     elif type(a) == _sp.ndarray:
@@ -610,3 +613,36 @@ def nbr_to_str(nbr, t_precision):
             * (round(nbr, t_precision) != int(nbr)))
     nbr_str = (str(int(round(nbr, t_precision)*10**n)) + ('e-'+str(n))*(n != 0))
     return nbr_str
+
+
+# Numba kernels compiled so far in this process, see jit_kernel
+_jit_kernels = {}
+
+
+def jit_kernel(func):
+    r"""
+    Returns the numba-jitted version of ``func``, compiling it on the first
+    call.
+
+    Parameters
+    ----------
+    func : function
+        A plain python function written in the numba ``nopython`` subset.
+
+    Notes
+    -----
+    Compiled kernels are kept for the rest of the session, and are also
+    cached on disk by numba (``cache=True``) so that later sessions can skip
+    the compilation.  Numba is only imported here to keep it out of the
+    OpenPNM import time.
+
+    """
+    if func not in _jit_kernels:
+        from numba import njit
+        try:
+            from numba.core.errors import NumbaPendingDeprecationWarning
+        except ImportError:
+            from numba.errors import NumbaPendingDeprecationWarning
+        warnings.simplefilter('ignore', category=NumbaPendingDeprecationWarning)
+        _jit_kernels[func] = njit(cache=True)(func)
+    return _jit_kernels[func]
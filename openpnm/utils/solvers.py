@@ -0,0 +1,267 @@
+r"""
+===============================================================================
+solvers: Registry of the sparse linear solver backends used by algorithms
+===============================================================================
+
+Each backend is a class that is registered under the name used in the
+``solver_family`` setting of transport algorithms.  An instance of the backend
+is kept on the algorithm between calls, so backends can store expensive
+objects such as factorizations or multigrid hierarchies and reuse them as long
+as the coefficient matrix is unchanged.
+
+"""
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+from openpnm.utils import logging
+logger = logging.getLogger(__name__)
+
+_solvers = {}
+
+
+def register_solver(name, solver):
+    r"""
+    Registers a solver backend so it can be used by setting
+    ``solver_family`` to ``name`` on an algorithm.
+
+    Parameters
+    ----------
+    name : string
+        The name under which the backend is registered.  If a backend already
+        exists under this name it is replaced.
+
+    solver : class
+        A subclass of ``GenericSolver``.
+
+    """
+    if not issubclass(solver, GenericSolver):
+        raise Exception('Solver backends must be subclasses of GenericSolver')
+    solver.name = name
+    _solvers[name] = solver
+
+
+def get_solver(name):
+    r"""
+    Returns the solver backend class registered under the given ``name``
+    """
+    try:
+        return _solvers[name]
+    except KeyError:
+        raise Exception(f"{name} not available.")
+
+
+def list_solvers():
+    r"""
+    Returns the names of all registered solver backends
+    """
+    return list(_solvers.keys())
+
+
+class GenericSolver:
+    r"""
+    Base class for linear solver backends
+
+    Subclasses must implement ``_solve``, and should list the ``solver_type``
+    names they support in the ``direct`` and ``iterative`` attributes.  Any
+    types that only work on symmetric matrices are also listed in
+    ``symmetric``, and those that accept a 2D right-hand side holding several
+    vectors in its columns are listed in ``block``.  State that depends only
+    on the matrix (e.g. a factorization) can be stored using ``_set_state``
+    and retrieved using ``_get_state``, which returns ``None`` if the matrix
+    has changed since the state was stored.
+
+    """
+    name = None
+    direct = []
+    iterative = []
+    symmetric = []
+    block = []
+
+    def __init__(self):
+        self._clear()
+
+    def __getstate__(self):
+        # Factorizations cannot generally be pickled, so they are rebuilt
+        return {}
+
+    def __setstate__(self, state):
+        self._clear()
+
+    def _clear(self):
+        self._A = None
+        self._state = {}
+
+    def requires_symmetric(self, solver_type):
+        r"""
+        Returns ``True`` if the given ``solver_type`` only works on symmetric
+        matrices
+        """
+        return solver_type in self.symmetric
+
+    def is_direct(self, solver_type):
+        r"""
+        Returns ``True`` if the given ``solver_type`` is a direct method
+        """
+        return solver_type in self.direct
+
+    def is_block(self, solver_type):
+        r"""
+        Returns ``True`` if the given ``solver_type`` can solve for several
+        right-hand sides at once
+        """
+        return solver_type in self.block
+
+    def _is_same_matrix(self, A):
+        r"""
+        Checks if the matrix ``A`` has the same sparsity pattern and values as
+        the one for which the state was stored
+        """
+        B = self._A
+        if (B is None) or (A.shape != B.shape) or (A.nnz != B.nnz):
+            return False
+        return (np.array_equal(A.indptr, B.indptr)
+                and np.array_equal(A.indices, B.indices)
+                and np.array_equal(A.data, B.data))
+
+    def _get_state(self, key, A):
+        if not self._is_same_matrix(A):
+            self._clear()
+        return self._state.get(key, None)
+
+    def _set_state(self, key, A, value):
+        if self._A is None:
+            self._A = A.copy()
+        self._state[key] = value
+
+    def solve(self, A, b, x0=None, solver_type=None, reuse=True, **kwargs):
+        r"""
+        Solves ``Ax = b`` for *x*
+
+        Parameters
+        ----------
+        A : sparse matrix
+            The coefficient matrix, which is converted to CSR format
+
+        b : ND-array
+            The right-hand side vector, or an N-by-k array of k right-hand
+            sides for the ``solver_type`` listed in ``block``
+
+        x0 : ND-array
+            The initial guess, used by iterative solvers
+
+        solver_type : string
+            The specific solver to use within the backend
+
+        reuse : boolean
+            If ``False`` then any stored state is discarded before solving.
+            The default is ``True``.
+
+        **kwargs
+            The ``preconditioner``, ``tol``, ``atol``, ``rtol`` and ``maxiter``
+            values passed on to the solver.
+
+        """
+        if not reuse:
+            self._clear()
+        A = A.tocsr()
+        x0 = np.zeros_like(b) if x0 is None else x0
+        x = self._solve(A=A, b=b, x0=x0, solver_type=solver_type, **kwargs)
+        if not reuse:
+            self._clear()
+        return x
+
+    def _solve(self, A, b, x0, solver_type, **kwargs):
+        raise NotImplementedError
+
+
+class ScipySolver(GenericSolver):
+    r"""
+    Solves using the functions in ``scipy.sparse.linalg``.  The LU
+    factorization used by ``spsolve`` is stored and reused while the matrix is
+    unchanged.
+    """
+    direct = ['spsolve', 'factorized']
+    iterative = ['bicg', 'bicgstab', 'cg', 'cgs', 'gmres', 'lgmres',
+                 'minres', 'gcrotmk', 'qmr']
+    symmetric = ['cg', 'minres']
+    block = ['spsolve', 'factorized']
+
+    def _solve(self, A, b, x0, solver_type, tol=None, atol=None, maxiter=None,
+               **kwargs):
+        # Umfpack by default uses its 32-bit build -> memory overflow
+        umfpack = True
+        try:
+            import scikits.umfpack
+            A.indices = A.indices.astype(np.int64)
+            A.indptr = A.indptr.astype(np.int64)
+        except ModuleNotFoundError:
+            umfpack = False
+        if solver_type in self.direct:
+            lu = self._get_state('lu', A)
+            if lu is None:
+                lu = scipy.sparse.linalg.factorized(A.tocsc())
+                self._set_state('lu', A, lu)
+            # SuperLU solves all columns at once, but umfpack only takes 1D
+            if umfpack and (np.ndim(b) == 2):
+                return np.column_stack([lu(col) for col in b.T])
+            return lu(b)
+        solver = getattr(scipy.sparse.linalg, solver_type)
+        if solver_type in self.iterative:
+            x, exit_code = solver(A=A, b=b, atol=atol, tol=tol,
+                                  maxiter=maxiter, x0=x0)
+            if exit_code > 0:
+                raise Exception(f'Solver did not converge, exit code: {exit_code}')
+            return x
+        return solver(A=A, b=b)
+
+
+class PyAMGSolver(GenericSolver):
+    r"""
+    Solves using the Ruge-Stuben algebraic multigrid solver in ``pyamg``.  The
+    multigrid hierarchy is stored and reused while the matrix is unchanged.
+    """
+    iterative = ['ruge_stuben']
+
+    def _solve(self, A, b, x0, solver_type, rtol=None, maxiter=None,
+               **kwargs):
+        # Check if PyAMG is available
+        try:
+            import pyamg
+        except Exception:
+            raise ModuleNotFoundError('PyAMG is not installed.')
+        ml = self._get_state('ml', A)
+        if ml is None:
+            ml = pyamg.ruge_stuben_solver(A)
+            self._set_state('ml', A, ml)
+        return ml.solve(b=b, tol=rtol, maxiter=maxiter)
+
+
+class PETScSolver(GenericSolver):
+    r"""
+    Solves using the solvers and preconditioners in ``petsc4py``, if installed
+    """
+    direct = ['mumps', 'superlu_dist', 'umfpack', 'klu', 'cholmod']
+    iterative = ['cg', 'groppcg', 'pipecg', 'pipecgrr', 'nash', 'stcg',
+                 'gltr', 'fcg', 'pipefcg', 'gmres', 'pipefgmres', 'fgmres',
+                 'lgmres', 'dgmres', 'pgmres', 'tcqmr', 'bcgs', 'ibcgs',
+                 'fbcgs', 'fbcgsr', 'bcgsl', 'pipebcgs', 'cgs', 'tfqmr', 'cr',
+                 'pipecr', 'bicg', 'minres', 'symmlq', 'lcd', 'gcr',
+                 'pipegcr']
+    symmetric = ['cg', 'cholmod']
+
+    def _solve(self, A, b, x0, solver_type, preconditioner=None, atol=None,
+               rtol=None, maxiter=None, **kwargs):
+        # Check if petsc is available
+        try:
+            import petsc4py
+            from openpnm.utils.petsc import PETScSparseLinearSolver as SLS
+        except Exception:
+            raise ModuleNotFoundError('PETSc is not installed.')
+        temp = {"type": solver_type, "preconditioner": preconditioner}
+        ls = SLS(A=A, b=b, settings=temp)
+        return ls.solve(x0=x0, atol=atol, rtol=rtol, max_it=maxiter)
+
+
+register_solver('scipy', ScipySolver)
+register_solver('pyamg', PyAMGSolver)
+register_solver('petsc', PETScSolver)
@@ -0,0 +1,44 @@
+import sys
+import time
+import resource
+import tempfile
+import subprocess
+import numpy as np
+import openpnm as op
+
+# Peak memory can only grow during a process, so each network is generated in
+# a fresh interpreter and the peak resident set size (RSS) reported back.  The
+# lean mode stores throat.conns as int32 and memory-maps coords and conns.
+# Note that ru_maxrss is in kB on Linux but in bytes on macOS.
+
+
+def generate(N, mode):
+    ws = op.Workspace()
+    ws.settings["loglevel"] = 40
+    with tempfile.TemporaryDirectory() as path:
+        t0 = time.perf_counter()
+        if mode == "lean":
+            net = op.network.Cubic(shape=[N, N, N], index_dtype=np.int32,
+                                   memmap_dir=path)
+        else:
+            net = op.network.Cubic(shape=[N, N, N])
+        t = time.perf_counter() - t0
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(net.Np, t, rss)
+        # Release the memory-mapped files so the directory can be removed
+        ws.close_project(net.project)
+        del net
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        generate(int(sys.argv[1]), sys.argv[2])
+    else:
+        for N in [50, 100, 200, 300]:
+            for mode in ["default", "lean"]:
+                out = subprocess.run([sys.executable, __file__, str(N), mode],
+                                     stdout=subprocess.PIPE,
+                                     universal_newlines=True)
+                Np, t, rss = out.stdout.split()[-3:]
+                print('{0:>10} pores, {1:>7} : {2:.2f} s, peak RSS {3:.0f} MB'
+                      .format(int(Np), mode, float(t), int(rss)/1024))
@@ -0,0 +1,35 @@
+import time
+import numpy as np
+import openpnm as op
+
+# The numba kernel used by InvasionPercolation is compiled on the first run
+# only (and cached on disk), so later runs should only cost the invasion
+# itself.  Run this script twice to see the effect of the on-disk cache on
+# the first call.
+ws = op.Workspace()
+ws.settings["loglevel"] = 40
+np.random.seed(0)
+
+for N in [15, 32, 70]:
+    ws.clear()
+    net = op.network.Cubic(shape=[N, N, N])
+    phase = op.phases.GenericPhase(network=net)
+    phase['throat.entry_pressure'] = np.random.rand(net.Nt)
+    times = []
+    for i in range(3):
+        ip = op.algorithms.InvasionPercolation(network=net, phase=phase)
+        ip.set_inlets(pores=net.pores('left'))
+        t0 = time.perf_counter()
+        ip.run()
+        times.append(time.perf_counter() - t0)
+    # Step-wise invasion, as used when inspecting intermediate states
+    ip = op.algorithms.InvasionPercolation(network=net, phase=phase)
+    ip.set_inlets(pores=net.pores('left'))
+    n_calls = 10
+    t0 = time.perf_counter()
+    for i in range(n_calls):
+        ip.run(n_steps=net.Nt//(10*n_calls))
+    t_step = (time.perf_counter() - t0)/n_calls
+    print('{0:>8} throats : first run {1:.3f} s, later runs {2:.3f} s, '
+          'step-wise run {3:.4f} s per call'.format(
+              net.Nt, times[0], min(times[1:]), t_step))
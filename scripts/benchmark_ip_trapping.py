@@ -0,0 +1,29 @@
+import time
+import numpy as np
+import openpnm as op
+
+# Trapping is applied with a compiled union-find sweep over the reversed
+# invasion sequence, so its cost should grow roughly linearly with the
+# network size.  The first call includes the compilation of the kernel.
+ws = op.Workspace()
+ws.settings["loglevel"] = 40
+np.random.seed(0)
+
+for N in [10, 22, 46, 100]:
+    ws.clear()
+    net = op.network.Cubic(shape=[N, N, N])
+    phase = op.phases.GenericPhase(network=net)
+    phase['throat.entry_pressure'] = np.random.rand(net.Nt)
+    ip = op.algorithms.InvasionPercolation(network=net, phase=phase)
+    ip.set_inlets(pores=net.pores('left'))
+    ip.run()
+    seq = (ip['pore.invasion_sequence'].copy(),
+           ip['throat.invasion_sequence'].copy())
+    for mode in ['site', 'bond']:
+        ip['pore.invasion_sequence'] = seq[0].copy()
+        ip['throat.invasion_sequence'] = seq[1].copy()
+        t0 = time.perf_counter()
+        ip.apply_trapping(outlets=net.pores('right'), mode=mode)
+        t1 = time.perf_counter()
+        print('{0:>8} pores, {1} trapping : {2:.3f} s, {3} trapped'.format(
+              net.Np, mode, t1 - t0, np.sum(ip['pore.trapped'])))
@@ -0,0 +1,25 @@
+import time
+import openpnm as op
+
+# Objects keep a weak reference to their Project, so looking up
+# ``obj.project`` should cost the same no matter how many Projects are open
+ws = op.Workspace()
+ws.settings["loglevel"] = 40
+n_lookups = 10000
+
+for n_projects in [1, 10, 100, 1000]:
+    ws.clear()
+    for i in range(n_projects - 1):
+        net = op.network.Cubic(shape=[2, 2, 2])
+    net = op.network.Cubic(shape=[5, 5, 5])
+    geo = op.geometry.GenericGeometry(network=net, pores=net.Ps,
+                                      throats=net.Ts)
+    proj = net.project
+    t0 = time.perf_counter()
+    for i in range(n_lookups):
+        geo.project
+        geo.network
+        proj.find_full_domain(geo)
+    t1 = time.perf_counter()
+    print('{0:>6} projects : {1:.3f} us per lookup'.format(
+          n_projects, 1e6*(t1 - t0)/n_lookups))
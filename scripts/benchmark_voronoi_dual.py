@@ -0,0 +1,54 @@
+import sys
+import time
+import numpy as np
+import scipy.sparse as sprs
+import scipy.spatial as sptl
+import openpnm as op
+
+# Compares the bulk construction of the Delaunay-Voronoi dual connections
+# with the previous implementation, which extended the rows of a lil_matrix
+# one ridge at a time.  The tessellation itself is timed separately since it
+# is the same for both.  The previous implementation is only run up to 10**5
+# points, above which its lists take minutes and several GB to build.  At
+# 10**6 points the tessellation alone needs about 6 GB of memory.  Other sizes
+# can be given on the command line, e.g. ``benchmark_voronoi_dual.py 3e5``.
+
+
+def loop_conns(vor):
+    Nall = vor.npoints + vor.vertices.shape[0]
+    am = sprs.lil_matrix((Nall, Nall))
+    for ridge in vor.ridge_dict.keys():
+        [am.rows[i].extend([ridge[0], ridge[1]]) for i in ridge]
+        row = vor.ridge_dict[ridge].copy()
+        row = [i + vor.npoints for i in row if i > -1]
+        [am.rows[i].extend(row) for i in ridge]
+        row.append(row[0])
+        [am.rows[row[i]].append(row[i+1]) for i in range(len(row)-1)]
+    am.data = am.rows
+    am = am.tocoo()
+    return np.vstack((am.row, am.col)).T
+
+
+np.random.seed(0)
+sizes = [int(float(i)) for i in sys.argv[1:]] or [10**4, 10**5, 10**6]
+for N in sizes:
+    points = np.random.rand(N, 3)
+    t0 = time.perf_counter()
+    vor = sptl.Voronoi(points=points)
+    t_vor = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    conns = op.network.DelaunayVoronoiDual._find_ridge_conns(vor)
+    am2 = op.topotools.conns_to_am(conns)
+    t_bulk = time.perf_counter() - t0
+    del conns
+    if N <= 10**5:
+        t0 = time.perf_counter()
+        am1 = op.topotools.conns_to_am(loop_conns(vor))
+        t_loop = time.perf_counter() - t0
+        assert np.all(am1.row == am2.row) and np.all(am1.col == am2.col)
+        loop = '{0:.2f} s'.format(t_loop)
+    else:
+        loop = 'skipped'
+    del vor, am2
+    print('{0:>8} points : tessellation {1:.2f} s, loop {2}, '
+          'bulk {3:.2f} s'.format(N, t_vor, loop, t_bulk))
@@ -7,6 +7,8 @@ proj = ws.new_project()
 
 
 scheme = 'powerlaw'
+# Use 'newton' to solve for the potential and ions all at once
+solver = 'gummel'
 
 # network, geometry, phase
 np.random.seed(0)
@@ -109,8 +111,10 @@ pnp = op.algorithms.NernstPlanckMultiphysics(network=net, phase=sw)
 pnp.setup(potential_field=p.name, ions=[eA.name, eB.name])
 pnp.settings['i_max_iter'] = 10
 pnp.settings['i_tolerance'] = 1e-04
+pnp.settings['nonlinear_solver'] = solver
 
-pnp.run()
+pnp.run(callback=lambda itr, res: print(solver, itr, res))
+print(pnp.stats)
 
 sw.update(sf.results())
 sw.update(p.results())
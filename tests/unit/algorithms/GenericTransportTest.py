@@ -182,6 +182,132 @@ class GenericTransportTest:
         # Net rate must always be zero at steady state conditions
         assert np.isclose(alg.rate(pores=self.net.Ps), 0.0)
 
+    def test_assemble_laplacian(self):
+        from scipy.sparse.csgraph import laplacian
+        alg = op.algorithms.GenericTransport(network=self.net,
+                                             phase=self.phase)
+        g = np.random.rand(self.net.Nt)
+        am = self.net.create_adjacency_matrix(weights=g, fmt='coo')
+        A = alg._assemble_laplacian(g)
+        pattern = alg._A_pattern
+        assert np.allclose(A.toarray(), laplacian(am).toarray())
+        # Nt-by-2 conductances give a non-symmetric matrix
+        g = np.random.rand(self.net.Nt, 2)
+        am = self.net.create_adjacency_matrix(weights=g, fmt='coo')
+        A2 = alg._assemble_laplacian(g)
+        assert np.allclose(A2.toarray(), laplacian(am).toarray())
+        # The sparsity pattern is reused while the topology is unchanged
+        assert alg._A_pattern is pattern
+        assert np.all(A2.indices == A.indices)
+        assert np.all(A2.indptr == A.indptr)
+        # The index arrays of the pattern are shared rather than copied
+        for M in [A, A2]:
+            assert np.shares_memory(M.indices, pattern['indices'])
+            assert np.shares_memory(M.indptr, pattern['indptr'])
+
+    def test_assemble_laplacian_on_lazy_lattice(self):
+        net1 = op.network.Cubic(shape=[4, 3, 5], connectivity=26)
+        net2 = op.network.Cubic(shape=[4, 3, 5], connectivity=26, lazy=True)
+        g = np.random.rand(net1.Nt, 2)
+        A = []
+        for net in [net1, net2]:
+            phase = op.phases.GenericPhase(network=net)
+            alg = op.algorithms.GenericTransport(network=net, phase=phase)
+            A.append(alg._assemble_laplacian(g))
+        assert np.all(A[0].indptr == A[1].indptr)
+        assert np.all(A[0].indices == A[1].indices)
+        assert np.allclose(A[0].data, A[1].data)
+        # The stencil pattern is reused, and conns were never stored
+        pattern = alg._A_pattern
+        M = alg._assemble_laplacian(g)
+        assert alg._A_pattern is pattern
+        assert np.shares_memory(M.indices, pattern['indices'])
+        assert 'throat.conns' not in net2.keys()
+
+    def test_apply_BCs_keeps_sparsity_pattern(self):
+        alg = op.algorithms.GenericTransport(network=self.net,
+                                             phase=self.phase)
+        alg.settings['conductance'] = 'throat.diffusive_conductance'
+        alg.settings['quantity'] = 'pore.mole_fraction'
+        alg.set_value_BC(pores=self.net.pores('left'), values=1.0)
+        alg.set_value_BC(pores=self.net.pores('right'), values=0.5)
+        alg._build_A()
+        alg._build_b()
+        pure_A = alg.A.copy()
+        alg._apply_BCs()
+        assert alg.A.nnz == pure_A.nnz
+        # Compare with removing BC rows and columns from a dense matrix
+        ind = np.isfinite(alg['pore.bc_value'])
+        x_BC = np.nan_to_num(alg['pore.bc_value'])
+        A = pure_A.toarray()
+        f = A.diagonal().mean()
+        b = -A @ x_BC
+        b[ind] = x_BC[ind] * f
+        A[ind, :] = 0
+        A[:, ind] = 0
+        A[ind, ind] = f
+        assert np.allclose(alg.A.toarray(), A)
+        assert np.allclose(alg.b, b)
+        # The plan is reused while the BC pores are unchanged
+        plan = alg._bc_plan
+        alg.set_value_BC(pores=self.net.pores('left'), values=2.0)
+        alg._build_A()
+        alg._build_b()
+        alg._apply_BCs()
+        assert alg._bc_plan is plan
+        # It is found from the id of the pattern, without comparing arrays
+        assert plan['id'] == alg._A_pattern_id is not None
+        alg.set_value_BC(pores=self.net.pores('front'), values=2.0)
+        alg._build_A()
+        alg._build_b()
+        alg._apply_BCs()
+        assert alg._bc_plan is not plan
+
+    def test_run_batch(self):
+        alg = op.algorithms.GenericTransport(network=self.net,
+                                             phase=self.phase)
+        alg.settings['conductance'] = 'throat.diffusive_conductance'
+        alg.settings['quantity'] = 'pore.mole_fraction'
+        alg.set_value_BC(pores=self.net.pores('back'), values=5.0)
+        values = []
+        for inlet, outlet, val in [('left', 'right', 1.0),
+                                   ('front', 'back', 1.0),
+                                   ('left', 'right', 2.0)]:
+            bc = np.ones(self.net.Np)*np.nan
+            bc[self.net.pores(inlet)] = val
+            bc[self.net.pores(outlet)] = 0.0
+            values.append(bc)
+        alg._build_A()
+        alg._build_b()
+        alg._apply_BCs()
+        A0, b0 = alg.A.copy(), alg.b.copy()
+        x, R = alg.run_batch(values=values)
+        assert x.shape == (self.net.Np, 3)
+        assert np.allclose(x[:, 2], 2*x[:, 0])
+        assert np.allclose(R[2], 2*R[0])
+        # Compare with running each case separately
+        for i, bc in enumerate(values):
+            alg2 = op.algorithms.GenericTransport(network=self.net,
+                                                  phase=self.phase)
+            alg2.settings['conductance'] = 'throat.diffusive_conductance'
+            alg2.settings['quantity'] = 'pore.mole_fraction'
+            alg2['pore.bc_value'] = bc
+            alg2.run()
+            assert np.allclose(x[:, i], alg2['pore.mole_fraction'])
+            Pin = alg2._get_inlets()
+            assert np.isclose(R[i], alg2.rate(pores=Pin)[0])
+        # The BCs set beforehand are left unchanged
+        assert np.all(alg['pore.bc_value'][self.net.pores('back')] == 5.0)
+        assert 'pore.mole_fraction' not in alg.keys()
+        # So are A and b, with the BCs set beforehand applied
+        assert (alg.A != A0).nnz == 0
+        assert np.all(alg.b == b0)
+        # Solvers without block support take the cases one at a time
+        alg.settings.update(solver_type='cg', solver_rtol=1e-10)
+        x2, R2 = alg.run_batch(values=values)
+        assert np.allclose(x2, x)
+        assert np.allclose(R2, R)
+
     def test_rate_Nt_by_2_conductance(self):
         net = op.network.Cubic(shape=[1, 6, 1])
         geom = op.geometry.StickAndBall(network=net)
@@ -42,6 +42,24 @@ class IPTest:
         alg.run()
         assert alg["throat.invasion_sequence"].max() == (alg.Nt - 1)
 
+    def test_run_in_steps_reuses_kernel(self):
+        from openpnm.algorithms.InvasionPercolation import _ip_kernel
+        alg1 = op.algorithms.InvasionPercolation(network=self.net)
+        alg1.setup(phase=self.water)
+        alg1.set_inlets(pores=self.net.pores("top"))
+        alg1.run()
+        kernel = op.utils.jit_kernel(_ip_kernel)
+        alg2 = op.algorithms.InvasionPercolation(network=self.net)
+        alg2.setup(phase=self.water)
+        alg2.set_inlets(pores=self.net.pores("top"))
+        for i in range(4):
+            alg2.run(n_steps=alg2.Nt//4)
+        alg2.run()
+        # The kernel was compiled once and reused by the later runs
+        assert op.utils.jit_kernel(_ip_kernel) is kernel
+        assert np.all(alg1["pore.invasion_sequence"]
+                      == alg2["pore.invasion_sequence"])
+
     def test_results(self):
         alg = op.algorithms.InvasionPercolation(network=self.net)
         alg.setup(phase=self.water)
@@ -67,6 +85,57 @@ class IPTest:
         alg.apply_trapping(outlets=self.net.pores("bottom"))
         assert "pore.trapped" in alg.labels()
 
+    def test_trapping_matches_reverse_sweep(self):
+        alg = op.algorithms.InvasionPercolation(network=self.net)
+        alg.setup(phase=self.water)
+        alg.set_inlets(pores=self.net.pores("top"))
+        alg.run()
+        outlets = self.net.pores("bottom")
+        seq = alg["pore.invasion_sequence"].copy()
+        # Reference: the reverse sweep of Masson with explicit relabelling
+        clusters = np.ones(self.net.Np, dtype=int)*-1
+        clusters[outlets] = -2
+        stopped = np.zeros(self.net.Np, dtype=bool)
+        nbrs = self.net.find_neighbor_pores(self.net.Ps, flatten=False,
+                                            include_input=True)
+        next_num = 0
+        for pore in np.argsort(seq)[::-1]:
+            if pore in outlets or seq[pore] <= 0:
+                continue
+            nc = np.unique(clusters[nbrs[pore]])
+            nc = nc[nc != -1]
+            if (-2 in nc) or np.any(stopped[nc[nc >= 0]]):
+                clusters[pore] = -2
+                stopped[nc[nc >= 0]] = True
+            elif nc.size == 0:
+                clusters[pore] = next_num
+                next_num += 1
+            else:
+                clusters[pore] = nc[0]
+                clusters[np.isin(clusters, nc)] = nc[0]
+        alg.apply_trapping(outlets=outlets)
+        assert np.all(alg["pore.clusters"] == clusters)
+        assert np.all(alg["pore.trapped"] == (clusters > -1))
+        Ts = self.net.find_neighbor_throats(clusters > -1)
+        assert np.all(np.where(alg["throat.trapped"])[0] == Ts)
+
+    def test_bond_trapping(self):
+        alg = op.algorithms.InvasionPercolation(network=self.net)
+        alg.setup(phase=self.water)
+        alg.set_inlets(pores=self.net.pores("top"))
+        alg.run()
+        alg.apply_trapping(outlets=self.net.pores("bottom"), mode="bond")
+        Ts = alg["throat.trapped"]
+        assert np.all(alg["throat.clusters"][Ts] > -1)
+        assert np.all(alg["throat.invasion_sequence"][Ts] == -1)
+        # Throats touching the outlets are never trapped
+        outlet_Ts = self.net.find_neighbor_throats(self.net.pores("bottom"))
+        assert not np.any(Ts[outlet_Ts])
+        # Trapped pores only have trapped throats
+        Ps = np.where(alg["pore.trapped"])[0]
+        nbr_Ts = self.net.find_neighbor_throats(Ps, flatten=False)
+        assert np.all([np.all(Ts[t]) for t in nbr_Ts])
+
     def test_plot_intrusion_curve(self):
         alg = op.algorithms.InvasionPercolation(network=self.net)
         alg.setup(phase=self.water)
@@ -0,0 +1,118 @@
+import numpy as np
+import openpnm as op
+from openpnm.phases import mixtures
+
+
+class IonicTransportTest:
+    def _setup_project(self):
+        # Each run starts from a fresh project, so no fields are shared
+        np.random.seed(0)
+        self.net = op.network.Cubic(shape=[8, 8, 1], spacing=9e-4)
+        self.geo = op.geometry.StickAndBall(
+            network=self.net, pores=self.net.Ps, throats=self.net.Ts
+        )
+        pr_d = op.models.misc.constant
+        trt_d = op.models.misc.constant
+        self.geo.add_model(propname="pore.diameter", model=pr_d, value=1.5e-4)
+        self.geo.add_model(propname="throat.diameter", model=trt_d, value=1e-4)
+        self.geo.regenerate_models()
+
+        self.phase = mixtures.SalineWater(network=self.net)
+        self.Na = self.phase.components['Na_' + self.phase.name]
+        self.Cl = self.phase.components['Cl_' + self.phase.name]
+        self.phys = op.physics.GenericPhysics(
+            network=self.net, phase=self.phase, geometry=self.geo
+        )
+        flow = op.models.physics.hydraulic_conductance.hagen_poiseuille
+        self.phys.add_model(
+            propname="throat.hydraulic_conductance",
+            pore_viscosity="pore.viscosity",
+            throat_viscosity="throat.viscosity",
+            model=flow,
+        )
+        current = op.models.physics.ionic_conductance.electroneutrality
+        self.phys.add_model(
+            propname="throat.ionic_conductance",
+            ions=[self.Na.name, self.Cl.name],
+            model=current,
+        )
+        for ion in [self.Na.name, self.Cl.name]:
+            dif = op.models.physics.diffusive_conductance.ordinary_diffusion
+            self.phys.add_model(
+                propname="throat.diffusive_conductance." + ion,
+                pore_diffusivity="pore.diffusivity." + ion,
+                throat_diffusivity="throat.diffusivity." + ion,
+                model=dif,
+            )
+        self.sf = op.algorithms.StokesFlow(network=self.net, phase=self.phase)
+        self.sf.set_value_BC(pores=self.net.pores("back"), values=0.01)
+        self.sf.set_value_BC(pores=self.net.pores("front"), values=0.00)
+        self.sf.run()
+        self.phase.update(self.sf.results())
+        for ion in [self.Na.name, self.Cl.name]:
+            mod = op.models.physics.ad_dif_mig_conductance.ad_dif_mig
+            self.phys.add_model(
+                propname="throat.ad_dif_mig_conductance." + ion,
+                pore_pressure=self.sf.settings["quantity"],
+                model=mod,
+                ion=ion,
+                s_scheme="powerlaw",
+            )
+        self.settings = {"solver_tol": 1e-08, "max_iter": 10,
+                         "cache_A": False}
+
+    def _run(self, **kwargs):
+        self._setup_project()
+        p = op.algorithms.IonicConduction(
+            network=self.net, phase=self.phase, settings=self.settings
+        )
+        p.set_value_BC(pores=self.net.pores("left"), values=0.01)
+        p.set_value_BC(pores=self.net.pores("right"), values=0.00)
+        p.settings["charge_conservation"] = "electroneutrality"
+        algs = [p]
+        for ion in [self.Na.name, self.Cl.name]:
+            e = op.algorithms.NernstPlanck(
+                network=self.net, phase=self.phase, ion=ion,
+                settings=self.settings
+            )
+            e.set_value_BC(pores=self.net.pores("back"), values=100)
+            e.set_value_BC(pores=self.net.pores("front"), values=90)
+            algs.append(e)
+        it = op.algorithms.NernstPlanckMultiphysics(
+            network=self.net, phase=self.phase
+        )
+        it.setup(potential_field=p.name, ions=[algs[1].name, algs[2].name],
+                 g_tol=1e-6, g_max_iter=20, **kwargs)
+        residuals = []
+        it.run(callback=lambda itr, res: residuals.append(res))
+        y = np.concatenate([alg[alg.settings["quantity"]] for alg in algs])
+        op.Workspace().close_project(self.net.project)
+        return y, residuals
+
+    def test_parallel_matches_serial(self):
+        y1, res1 = self._run()
+        y2, res2 = self._run(parallel=True, n_threads=2)
+        # Both runs iterate from the same fresh start
+        assert len(res2) > 1
+        assert max(res2[0].values()) > 1e-6
+        # The callback receives the residuals of all three algorithms
+        assert len(res2[0]) == 3
+        np.testing.assert_allclose(y1, y2, rtol=1e-5)
+
+    def test_newton_matches_gummel(self):
+        y1, res1 = self._run()
+        y2, res2 = self._run(nonlinear_solver='newton')
+        # The Newton iterations start from the same fresh fields
+        assert len(res2) > 1
+        assert max(res2[0].values()) > 1e-6
+        np.testing.assert_allclose(y1, y2, rtol=1e-4)
+
+
+if __name__ == "__main__":
+
+    t = IonicTransportTest()
+    self = t
+    for item in t.__dir__():
+        if item.startswith("test"):
+            print("running test: " + item)
+            t.__getattribute__(item)()
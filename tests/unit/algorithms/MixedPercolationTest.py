@@ -210,6 +210,27 @@ class MixedPercolationTest:
         inv_Pc = inv_Pc[~np.isinf(inv_Pc)]
         assert inv_Pc.max() <= 20
 
+    def test_queue_kept_after_max_pressure(self):
+        net = self.net
+        phys = self.phys
+        np.random.seed(1)
+        phys['throat.entry_pressure'] = np.random.random(net.Nt)*10
+        phys['pore.entry_pressure'] = np.random.random(net.Np)*10
+        IP_1 = mp(network=self.net)
+        IP_1.setup(phase=self.phase)
+        IP_1.set_inlets(pores=net.pores('left'))
+        IP_1.run(max_pressure=7)
+        inv = IP_1['pore.invasion_sequence'] > 0
+        assert inv.any()
+        assert not np.all(inv[net.pores('left', mode='not')])
+        assert IP_1['pore.invasion_pressure'][inv].max() <= 7
+        assert np.all(IP_1['pore.cluster'][inv] == 0)
+        # The remaining entries are handed back as a heapq ordered queue
+        queue = IP_1.queue[0]
+        assert len(queue) > 0
+        assert queue[0] == min(queue)
+        assert set([e[2] for e in queue]).issubset({'pore', 'throat'})
+
     def test_drainage_curve(self):
         net = self.net
         phys = self.phys
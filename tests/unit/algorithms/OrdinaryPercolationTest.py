@@ -133,6 +133,48 @@ class OrdinaryPercolationTest:
         assert sum(data['pore.occupancy']) > 0
         assert sum(data['throat.occupancy']) > 0
 
+    def test_run_matches_applying_each_point(self):
+        conns = self.net['throat.conns']
+        Pin = self.net.pores('top')
+        Ts = self.net.find_neighbor_throats(Pin)
+        for mode in ['bond', 'site']:
+            if mode == 'bond':
+                phase = self.water
+                Pmax = self.phys['throat.entry_pressure'].max()
+            else:
+                # Use a throwaway phase to keep the shared one untouched
+                phase = op.phases.GenericPhase(network=self.net)
+                phase['pore.entry_pressure'] = np.random.rand(self.net.Np)*2e4
+                Pmax = 2e4
+            alg = op.algorithms.OrdinaryPercolation(network=self.net)
+            alg.setup(phase=phase, mode=mode)
+            alg.set_inlets(pores=Pin)
+            points = np.linspace(0, 2*Pmax, 50)
+            alg.run(points=points)
+            # Reference: percolate at each point and keep the inlet clusters
+            ref = np.ones(self.net.Np)*np.inf
+            for P in points:
+                if mode == 'bond':
+                    invaded = alg['throat.entry_pressure'] <= P
+                    labels = op.topotools.bond_percolation(conns, invaded)
+                else:
+                    invaded = alg['pore.entry_pressure'] <= P
+                    labels = op.topotools.site_percolation(conns, invaded)
+                labels = op.topotools.remove_isolated_clusters(labels, Pin)
+                ref[(ref == np.inf) * (labels.sites >= 0)] = P
+            assert np.all(alg['pore.invasion_pressure'] == ref)
+            # Exact pressures are never above the resampled ones
+            alg.run(points=None)
+            exact = alg['pore.invasion_pressure']
+            assert np.all(exact <= ref)
+            assert np.all(np.isfinite(exact) == np.isfinite(ref))
+            if mode == 'bond':
+                # Inlets are invaded by their most easily invaded throat
+                t_entry = alg['throat.entry_pressure']
+                assert np.amin(exact[Pin]) == np.amin(t_entry[Ts])
+            else:
+                self.net.project.purge_object(phase)
+
     def test_is_percolating(self):
         self.alg = op.algorithms.OrdinaryPercolation(network=self.net)
         self.alg.setup(phase=self.water,
@@ -197,6 +197,51 @@ class ReactiveTransportTest:
         with pytest.raises(Exception):
             rt.run()
 
+    def test_newton_consistency_w_picard(self):
+        rt = op.algorithms.ReactiveTransport(network=self.net,
+                                             phase=self.phase)
+        rt.setup(solver_tol=1e-10, max_iter=5000,
+                 relaxation_source=1.0, relaxation_quantity=1.0)
+        rt.settings.update({'conductance': 'throat.diffusive_conductance',
+                            'quantity': 'pore.concentration'})
+        rt.set_source(pores=self.net.pores('bottom'), propname='pore.reaction')
+        rt.set_value_BC(pores=self.net.pores('top'), values=1.0)
+        rt.run()
+        c_picard = rt['pore.concentration'].copy()
+        n_picard = rt.stats['iterations']
+        rt.settings['nonlinear_solver'] = 'newton'
+        rt.run()
+        assert_allclose(rt['pore.concentration'], c_picard, rtol=1e-6)
+        assert rt.stats['iterations'] <= n_picard
+        assert len(rt.stats['residuals']) == rt.stats['iterations'] + 1
+        rt.settings['nonlinear_solver'] = 'foo'
+        with pytest.raises(Exception):
+            rt.run()
+
+    def test_newton_w_variable_conductance(self):
+        net = op.network.Cubic(shape=[6, 6, 1])
+        phase = op.phases.GenericPhase(network=net)
+        phase['pore.concentration'] = 0.0
+
+        def conductance(target, X='pore.concentration'):
+            conns = target.project.network['throat.conns']
+            return 1.0 + target[X][conns].mean(axis=1)**2
+
+        phase.add_model(propname='throat.conductance', model=conductance)
+        rt = op.algorithms.ReactiveTransport(network=net, phase=phase)
+        rt.setup(solver_tol=1e-10, cache_A=False)
+        rt.settings.update({'conductance': 'throat.conductance',
+                            'quantity': 'pore.concentration'})
+        rt.set_value_BC(pores=net.pores('left'), values=1.0)
+        rt.set_value_BC(pores=net.pores('right'), values=0.0)
+        rt.run()
+        c_picard = rt['pore.concentration'].copy()
+        n_picard = rt.stats['iterations']
+        rt.settings.update(nonlinear_solver='newton', newton_fd_jacobian=True)
+        rt.run(x0=net.Ps*0.0)
+        assert_allclose(rt['pore.concentration'], c_picard, rtol=1e-6)
+        assert rt.stats['iterations'] < n_picard
+
     def test_reset(self):
         rt = op.algorithms.ReactiveTransport(network=self.net,
                                              phase=self.phase)
@@ -132,6 +132,55 @@ class SolversTest:
         with pytest.raises(Exception):
             ad.run()
 
+    def test_scipy_direct_reuses_factorization(self):
+        def new_alg(left):
+            alg = op.algorithms.GenericTransport(network=self.net)
+            alg.settings.update(quantity='pore.x',
+                                conductance='throat.conductance',
+                                solver_family='scipy', solver_type='spsolve')
+            alg.setup(phase=self.phase)
+            alg.set_value_BC(pores=self.net.pores('left'), values=1.0)
+            alg.set_value_BC(pores=self.net.pores('bottom'), values=0.0)
+            if left != 1.0:
+                alg.set_value_BC(pores=self.net.pores('left'), values=left)
+            return alg
+        alg = new_alg(left=1.0)
+        alg.run()
+        lu = alg._solver._state['lu']
+        # Changing only the boundary values leaves A unchanged
+        alg.set_value_BC(pores=self.net.pores('left'), values=2.0)
+        alg.run()
+        assert alg._solver._state['lu'] is lu
+        ref = new_alg(left=2.0)
+        ref.run()
+        nt.assert_allclose(actual=alg['pore.x'], desired=ref['pore.x'])
+        # Changing where the boundary conditions are applied changes A
+        alg.set_value_BC(pores=self.net.pores('front'), values=0.0)
+        alg.run()
+        assert alg._solver._state['lu'] is not lu
+
+    def test_register_solver(self):
+        class DenseSolver(op.utils.GenericSolver):
+            direct = ['solve']
+
+            def _solve(self, A, b, **kwargs):
+                return sp.linalg.solve(A.toarray(), b)
+
+        op.utils.register_solver('dense', DenseSolver)
+        try:
+            assert 'dense' in op.utils.list_solvers()
+            self.alg.settings.update(solver_family='dense',
+                                     solver_type='solve')
+            self.alg.run()
+            xmean = self.alg['pore.x'].mean()
+            nt.assert_allclose(actual=xmean, desired=0.5875950426)
+        finally:
+            # Keep the registration from leaking into later tests
+            op.utils.solvers._solvers.pop('dense', None)
+            self.alg.settings.update(solver_family='scipy',
+                                     solver_type='spsolve')
+        assert 'dense' not in op.utils.list_solvers()
+
 
 if __name__ == '__main__':
     t = SolversTest()
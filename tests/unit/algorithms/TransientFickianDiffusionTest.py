@@ -40,6 +40,32 @@ class TransientFickianDiffusionTest:
         y = np.around(alg[alg.settings['quantity']], decimals=5)
         assert np.all(x == y)
 
+    def test_transient_fickian_diffusion_reuses_A(self):
+        algs = []
+        for reuse in [True, False]:
+            alg = op.algorithms.TransientFickianDiffusion(network=self.net,
+                                                          phase=self.phase)
+            alg.setup(quantity='pore.concentration',
+                      conductance='throat.diffusive_conductance',
+                      t_initial=0, t_final=1000, t_step=1, t_output=100,
+                      t_tolerance=1e-12, t_scheme='cranknicolson')
+            alg.set_IC(0)
+            alg.set_value_BC(pores=self.net.pores('back'), values=1)
+            alg.set_rate_BC(pores=self.net.pores('front'), values=-1e-15)
+            assert alg._t_is_step_invariant()
+            if not reuse:
+                # Rebuild A and reapply the BCs at every step instead
+                alg._t_is_step_invariant = lambda: False
+            alg.run()
+            algs.append(alg)
+        # The same BC-applied matrix was used for every step
+        assert algs[0]._A is algs[0]._A_t
+        assert algs[1]._A is not algs[1]._A_t
+        r1, r2 = algs[0].results(), algs[1].results()
+        assert set(r1.keys()) == set(r2.keys())
+        for k in r1.keys():
+            assert np.allclose(r1[k], r2[k], rtol=1e-10, atol=0)
+
     def teardown_class(self):
         ws = op.Workspace()
         ws.clear()
@@ -81,6 +81,49 @@ class TransientImplicitReactiveTransportTest:
                  'pore.concentration@12']
         assert (set(times).issubset(set(alg.keys())))
 
+    def test_transient_adaptive_reactive_transport(self):
+        alg = op.algorithms.TransientReactiveTransport(network=self.net,
+                                                       phase=self.phase,
+                                                       settings=self.settings)
+        alg.setup(t_initial=1, t_final=1000, t_precision=14)
+        # A zero tolerance never detects the steady state, so all the
+        # outputs up to t_final are stored
+        alg.settings.update({'t_scheme': 'implicit', 't_step': 0.1,
+                             't_tolerance': 0, 'rxn_tolerance': 1e-06,
+                             't_output': [5, 50], 't_adaptive': True})
+        alg.set_value_BC(pores=self.net.pores('left'), values=2)
+        alg.set_source(propname='pore.reaction', pores=self.net.pores('right'))
+        alg.run()
+        x = ([2., 1.00158, 0.00316,
+              2., 1.00158, 0.00316,
+              2., 1.00158, 0.00316])
+        y = np.around(alg[alg.settings['quantity']], decimals=5)
+        assert np.all(x == y)
+        times = ['pore.concentration@1', 'pore.concentration@5',
+                 'pore.concentration@50', 'pore.concentration@1000']
+        assert (set(times).issubset(set(alg.keys())))
+        # Far fewer steps than the 9990 of a fixed step simulation
+        assert 0 < alg.stats['steps'] < 1000
+        # The original settings are restored after the run
+        assert alg.settings['t_step'] == 0.1
+        assert alg.settings['t_scheme'] == 'implicit'
+        # With the default t_output the run stops at the steady state, as
+        # the fixed step simulation does, well before t_final
+        alg = op.algorithms.TransientReactiveTransport(network=self.net,
+                                                       phase=self.phase,
+                                                       settings=self.settings)
+        alg.setup(t_initial=1, t_final=1000, t_precision=14)
+        alg.settings.update({'t_scheme': 'implicit', 't_step': 0.1,
+                             't_tolerance': 1e-07, 'rxn_tolerance': 1e-06,
+                             't_adaptive': True})
+        alg.set_value_BC(pores=self.net.pores('left'), values=2)
+        alg.set_source(propname='pore.reaction', pores=self.net.pores('right'))
+        alg.run()
+        y = np.around(alg[alg.settings['quantity']], decimals=5)
+        assert np.all(x == y)
+        t_steady = [float(k.split('@')[1]) for k in alg.keys() if '@' in k]
+        assert max(t_steady) < 5
+
     def test_transient_reactive_transport_results(self):
         alg = op.algorithms.TransientReactiveTransport(network=self.net,
                                                        phase=self.phase,
@@ -107,6 +150,36 @@ class TransientImplicitReactiveTransportTest:
                 and set(times_2).issubset(set(results_times_2))
                 and set(times_3).issubset(set(results_times_3)))
 
+    def test_transient_reactive_transport_compact_storage(self):
+        alg = op.algorithms.TransientReactiveTransport(network=self.net,
+                                                       phase=self.phase,
+                                                       settings=self.settings)
+        alg.setup(t_initial=2, t_final=12, t_precision=10)
+        alg.settings.update({'t_scheme': 'implicit', 't_step': 0.1,
+                             't_tolerance': 1e-07, 'rxn_tolerance': 1e-06,
+                             't_output': np.arange(2, 13, 1)})
+        alg.set_value_BC(pores=self.net.pores('left'), values=2)
+        alg.set_source(propname='pore.reaction', pores=self.net.pores('right'))
+        alg.run()
+        assert alg._t_results is None
+        r1 = alg.results()
+        r1 = {k: v.copy() for k, v in r1.items()}
+        # Repeat with all outputs stored in a single array
+        alg.settings['t_storage'] = 'array'
+        alg.set_IC(0)
+        alg.run()
+        assert 'pore.concentration@2' not in alg.keys()
+        assert alg._t_results.data.shape == (len(r1) - 1, self.net.Np)
+        r2 = alg.results()
+        assert set(r1.keys()) == set(r2.keys())
+        for k in r1.keys():
+            assert np.allclose(r1[k], r2[k])
+            assert np.all(alg[k] == r2[k])
+        r3 = alg.results(times=[2, 5])
+        assert set(r3.keys()).issubset({'pore.concentration@2',
+                                        'pore.concentration@5'})
+        assert 'pore.concentration@2' in r3.keys()
+
     def test_transient_steady_mode_reactive_transport(self):
         alg = op.algorithms.TransientReactiveTransport(network=self.net,
                                                        phase=self.phase,
@@ -1,3 +1,4 @@
+import numpy as np
 import openpnm as op
 mgr = op.Workspace()
 
@@ -64,6 +65,27 @@ class RelativePermeabilityTest:
         results = rp.get_Kr_data()
         assert results['relperm_wp']['x'] == results['relperm_wp']['z']
 
+    def test_sweep_in_processes(self):
+        rp = op.algorithms.metrics.RelativePermeability(network=self.net)
+        rp.setup(invading_phase=self.non_wet_phase,
+                 defending_phase=self.wet_phase,
+                 invasion_sequence='invasion_sequence')
+        rp.run(Snw_num=10)
+        r1 = rp.get_Kr_data()
+        n_objs = len(self.net.project)
+        rp2 = op.algorithms.metrics.RelativePermeability(network=self.net)
+        rp2.setup(invading_phase=self.non_wet_phase,
+                  defending_phase=self.wet_phase,
+                  invasion_sequence='invasion_sequence')
+        rp2.run(Snw_num=10, processes=2)
+        r2 = rp2.get_Kr_data()
+        # The StokesFlow algorithms used by the sweep are all removed
+        assert len(self.net.project) == n_objs + 1
+        for dim in ['x', 'y', 'z']:
+            assert r1['sat'][dim] == r2['sat'][dim]
+            assert np.allclose(r1['relperm_wp'][dim], r2['relperm_wp'][dim])
+            assert np.allclose(r1['relperm_nwp'][dim], r2['relperm_nwp'][dim])
+
     def test_user_defined_boundary_face(self):
         pores_in = self.net.pores('top')
         pores_out = self.net.pores('bottom')
@@ -712,6 +712,19 @@ class BaseTest:
         b = self.geo22.map_pores(pores=Ps, origin=self.net2)
         assert len(b) == 0
 
+    def test_map_pores_after_changing_locations(self):
+        net = op.network.Cubic(shape=[3, 3, 3])
+        geo = op.geometry.GenericGeometry(network=net, pores=net.Ps[5:10])
+        b = net.map_pores(pores=[3, 1], origin=geo)
+        assert np.all(b == [8, 6])
+        geo._drop_locations(pores=[5, 6])
+        geo._add_locations(pores=[20, 21])
+        b = net.map_pores(pores=geo.Ps, origin=geo)
+        assert np.all(b == [7, 8, 9, 20, 21])
+        b = geo.map_pores(pores=[21, 0, 7], origin=net, filtered=False)
+        assert np.all(b.indices == [4, -1, 0])
+        assert np.all(b.mask == [True, False, True])
+
     def test_interleave_data_bool(self):
         net = op.network.Cubic(shape=[2, 2, 2])
         Ps = net.pores('top')
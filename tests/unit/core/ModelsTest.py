@@ -193,6 +193,41 @@ class ModelsTest:
         geo.regenerate_models()
         assert len(geo.props()) == 16
 
+    def test_dependency_list_is_reused_until_models_change(self):
+        pn = op.network.Cubic(shape=[3, 3, 3])
+        geo = op.geometry.StickAndBall(network=pn, pores=pn.Ps, throats=pn.Ts)
+        a = geo.models.dependency_list()
+        assert geo.models._dependency_list is not None
+        assert geo.models.dependency_list() == a
+        geo.models['pore.seed']['num_range'] = [0.2, 0.7]
+        assert geo.models._dependency_list is None
+        geo.remove_model('throat.volume')
+        assert 'throat.volume' not in geo.models.dependency_list()
+
+    def test_regenerate_only_dirty_models(self):
+        pn = op.network.Cubic(shape=[3, 3, 3])
+        geo = op.geometry.StickAndBall(network=pn, pores=pn.Ps, throats=pn.Ts)
+        geo.models.stats = {'run': 0, 'skipped': 0}
+        geo.regenerate_models(only_dirty=True)
+        assert geo.models.stats == {'run': 0, 'skipped': 13}
+        # Writing an input reruns only the models downstream of it
+        geo['throat.diameter'] = geo['throat.diameter']*0.5
+        area = geo['throat.area'].copy()
+        geo.regenerate_models(only_dirty=True)
+        assert np.allclose(geo['throat.area'], area*0.25)
+        assert 'pore.diameter' in geo.models.dependency_list()
+        assert geo.models.stats['run'] < 13
+        # Changing a parameter marks the model and its dependents as dirty
+        geo.models.stats = {'run': 0, 'skipped': 0}
+        geo.models['pore.seed']['num_range'] = [0.2, 0.3]
+        geo.regenerate_models(only_dirty=True)
+        assert geo['pore.seed'].max() <= 0.3
+        assert geo.models.stats['run'] > 1
+        # Deleted data is regenerated
+        del geo['pore.volume']
+        geo.regenerate_models(only_dirty=True)
+        assert 'pore.volume' in geo.keys()
+
 
 if __name__ == '__main__':
 
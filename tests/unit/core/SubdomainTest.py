@@ -126,6 +126,26 @@ class SubdomainTest:
         with pytest.raises(Exception):
             pn['pore.bee.bop'] = 1
 
+    def test_interleave_data_after_moving_locations(self):
+        ws = op.Workspace()
+        proj = ws.new_project()
+        pn = op.network.Cubic(shape=[5, 5, 5], project=proj)
+        geo1 = op.geometry.GenericGeometry(network=pn, pores=pn.Ps[:25])
+        geo2 = op.geometry.GenericGeometry(network=pn, pores=pn.Ps[25:])
+        geo1['pore.value'] = 1.0
+        geo2['pore.value'] = 2.0
+        assert np.sum(pn['pore.value']) == 25 + 200
+        geo2._drop_locations(pores=pn.Ps[25:50])
+        geo1._add_locations(pores=pn.Ps[25:50])
+        geo1['pore.value'] = 1.0
+        assert np.sum(pn['pore.value']) == 50 + 150
+        # Values changed in place are picked up on the next read
+        geo2['pore.value'][:] = 3.0
+        assert np.sum(pn['pore.value']) == 50 + 225
+        op.topotools.trim(network=pn, pores=pn.Ps[:50])
+        assert np.sum(pn['pore.value']) == 225
+        ws.close_project(proj)
+
 
 if __name__ == '__main__':
 
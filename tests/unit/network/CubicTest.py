@@ -1,7 +1,10 @@
+import os
+import tempfile
 import pytest
 import numpy as np
 import scipy as sp
 import openpnm as op
+from scipy.spatial.distance import pdist
 
 
 class CubicTest:
@@ -123,6 +126,181 @@ class CubicTest:
         with pytest.raises(Exception):
             net.spacing
 
+    def test_connectivity_26(self):
+        net = op.network.Cubic(shape=[3, 4, 5], connectivity=26)
+        conns = net['throat.conns']
+        assert np.all(conns[:, 0] < conns[:, 1])
+        assert np.unique(conns, axis=0).shape[0] == net.Nt
+        L = np.linalg.norm(np.diff(net['pore.coords'][conns], axis=1), axis=2)
+        assert np.all(L <= 3**0.5 + 1e-12)
+        # Every pair of pores within sqrt(3) of each other is connected
+        d = pdist(net['pore.coords'])
+        assert np.sum(d <= 3**0.5 + 1e-12) == net.Nt
+        # 133 face, 96 corner and 196 edge throats
+        assert net.Nt == 425
+
+    def test_chunked_int32_matches_default(self):
+        for c in [6, 8, 12, 14, 18, 20, 26]:
+            net1 = op.network.Cubic(shape=[4, 3, 5], connectivity=c,
+                                    spacing=[1, 2, 3])
+            net2 = op.network.Cubic(shape=[4, 3, 5], connectivity=c,
+                                    spacing=[1, 2, 3], index_dtype=np.int32,
+                                    chunk_size=7)
+            assert net2['throat.conns'].dtype == np.int32
+            # Joints are ordered as the slices of the pore index array were
+            idx = np.arange(net1.Np).reshape(net1._shape)
+            s = {-1: slice(1, None), 0: slice(None), 1: slice(None, -1)}
+            offsets = {6: [(0, 0, 1), (0, 1, 0), (1, 0, 0)],
+                       8: [(1, 1, 1), (1, 1, -1), (1, -1, 1), (-1, 1, 1)],
+                       12: [(0, 1, 1), (0, 1, -1), (1, 0, 1), (-1, 0, 1),
+                            (-1, -1, 0), (-1, 1, 0)]}
+            offsets[14] = offsets[6] + offsets[8]
+            offsets[18] = offsets[6] + offsets[12]
+            offsets[20] = offsets[12] + offsets[8]
+            offsets[26] = offsets[6] + offsets[8] + offsets[12]
+            pairs = []
+            for d in offsets[c]:
+                T = idx[tuple(s[di] for di in d)]
+                H = idx[tuple(s[-di] for di in d)]
+                pairs.append(np.vstack((T.flatten(), H.flatten())).T)
+            pairs = np.sort(np.vstack(pairs), axis=1)
+            assert np.all(net1['throat.conns'] == pairs)
+            assert np.all(net1['throat.conns'] == net2['throat.conns'])
+            assert np.all(net1['pore.coords'] == net2['pore.coords'])
+            for label in net1.labels():
+                assert np.all(net1[label] == net2[label])
+
+    def test_face_labels(self):
+        net = op.network.Cubic(shape=[3, 4, 1])
+        x, y, z = net['pore.coords'].T
+        assert np.all(net['pore.front'] == (x == x.min()))
+        assert np.all(net['pore.back'] == (x == x.max()))
+        assert np.all(net['pore.left'] == (y == y.min()))
+        assert np.all(net['pore.right'] == (y == y.max()))
+        assert 'pore.top' not in net.keys()
+        assert net.num_pores('surface') == 10
+        Ts = net.find_neighbor_throats(pores=net.pores('surface'),
+                                       mode='xnor')
+        assert np.all(net.throats('surface') == Ts)
+
+    def test_memmap_dir(self):
+        with tempfile.TemporaryDirectory() as path:
+            net = op.network.Cubic(shape=[5, 5, 5], memmap_dir=path)
+            assert isinstance(net['pore.coords'], np.memmap)
+            assert isinstance(net['throat.conns'], np.memmap)
+            fname = net.project.name + '_' + net.name + '_conns.npy'
+            conns = np.load(os.path.join(path, fname))
+            assert np.all(conns == net['throat.conns'])
+            # A network of the same name in another project gets its own files
+            net2 = op.network.Cubic(shape=[5, 5, 5], spacing=10,
+                                    memmap_dir=path)
+            assert net2.name == net.name
+            assert np.all(net['pore.coords'][0] == 0.5)
+            assert np.all(net2['pore.coords'][0] == 5)
+            # Existing files are not overwritten
+            proj = op.Project(name='memmap_test')
+            open(os.path.join(path, 'memmap_test_net_coords.npy'), 'w').close()
+            with pytest.raises(Exception):
+                op.network.Cubic(shape=[5, 5, 5], memmap_dir=path,
+                                 project=proj, name='net')
+            op.Workspace().close_project(proj)
+            # Release the memory-mapped files so the directory can be removed
+            op.Workspace().close_project(net.project)
+            op.Workspace().close_project(net2.project)
+            del net, net2, conns
+
+    def test_index_dtype_too_small(self):
+        with pytest.raises(Exception):
+            op.network.Cubic(shape=[200, 200, 1], index_dtype=np.int8)
+
+    def test_lazy_arrays(self):
+        net1 = op.network.Cubic(shape=[4, 3, 5], spacing=[1, 2, 3],
+                                connectivity=14)
+        net2 = op.network.Cubic(shape=[4, 3, 5], spacing=[1, 2, 3],
+                                connectivity=14, lazy=True)
+        assert 'pore.coords' not in net2.keys()
+        assert 'throat.conns' not in net2.keys()
+        assert np.all(net1['pore.coords'] == net2['pore.coords'])
+        assert np.all(net1['throat.conns'] == net2['throat.conns'])
+        for label in net1.labels():
+            assert np.all(net1[label] == net2[label])
+        # Generated arrays are read-only and reused while held
+        coords = net2['pore.coords']
+        assert not coords.flags.writeable
+        assert net2['pore.coords'] is coords
+        # Spacing is found from the generated arrays as for stored ones
+        for c in [6, 14]:
+            net1 = op.network.Cubic(shape=[4, 3, 5], spacing=[1, 2, 3],
+                                    connectivity=c)
+            net2 = op.network.Cubic(shape=[4, 3, 5], spacing=[1, 2, 3],
+                                    connectivity=c, lazy=True)
+            if c == 6:
+                assert np.allclose(net2.spacing, [1, 2, 3])
+                assert np.all(net2.shape == [4, 3, 5])
+            else:
+                # Diagonal throats leave the spacing undefined in both modes
+                with pytest.raises(Exception):
+                    net1.spacing
+                with pytest.raises(Exception):
+                    net2.spacing
+
+    def test_lazy_arrays_exported(self):
+        net = op.network.Cubic(shape=[4, 3, 5], lazy=True)
+        assert 'pore.coords' in net.props()
+        assert 'throat.conns' in net.props(element='throat')
+        assert 'pore.coords' not in net.labels()
+        d = op.io.Dict.to_dict(network=net)
+        assert np.all(d[net.name]['pore.coords'] == net['pore.coords'])
+        assert np.all(d[net.name]['throat.conns'] == net['throat.conns'])
+        pdf, tdf = op.io.Pandas.to_dataframe(network=net)
+        assert 'network | ' + net.name + ' | pore.coords[0]' in pdf.keys()
+        assert 'network | ' + net.name + ' | throat.conns[1]' in tdf.keys()
+
+    def test_lazy_matrices(self):
+        for c, shape in [(26, [3, 4, 5]), (8, [4, 3, 1]), (6, [5, 1, 1])]:
+            net1 = op.network.Cubic(shape=shape, connectivity=c)
+            net2 = op.network.Cubic(shape=shape, connectivity=c, lazy=True)
+            for w in [net1.Ts, np.random.rand(2*net1.Nt),
+                      np.random.rand(net1.Nt, 2)]:
+                am1 = net1.create_adjacency_matrix(weights=w, fmt='csr')
+                am2 = net2.create_adjacency_matrix(weights=w, fmt='csr')
+                assert np.all(am1.indptr == am2.indptr)
+                assert np.all(am1.indices == am2.indices)
+                assert np.all(am1.data == am2.data)
+            im1 = net1.create_incidence_matrix(weights=net1.Ts, fmt='csr')
+            im2 = net2.create_incidence_matrix(weights=net1.Ts, fmt='csr')
+            assert np.all(im1.indptr == im2.indptr)
+            assert np.all(im1.indices == im2.indices)
+            assert np.all(im1.data == im2.data)
+            Ps = [0, 2, net1.Np - 1]
+            for mode in ['or', 'xor', 'xnor', 'and']:
+                assert np.all(net1.find_neighbor_pores(Ps, mode=mode)
+                              == net2.find_neighbor_pores(Ps, mode=mode))
+            Ts1 = net1.find_neighbor_throats(Ps, flatten=False)
+            Ts2 = net2.find_neighbor_throats(Ps, flatten=False)
+            for i in range(len(Ps)):
+                assert np.all(Ts1[i] == Ts2[i])
+
+    def test_lazy_array_conversion(self):
+        net = op.network.Cubic(shape=[4, 3, 5], lazy=True)
+        vals = np.random.rand(net.Np)
+        arr = net.to_array(vals)
+        assert arr.shape == (4, 3, 5)
+        x, y, z = net['pore.coords'][7] - 0.5
+        assert arr[int(x), int(y), int(z)] == vals[7]
+        net.from_array(arr, 'pore.test')
+        assert np.all(net['pore.test'] == vals)
+
+    def test_lazy_trim_stores_arrays(self):
+        net = op.network.Cubic(shape=[4, 3, 5], lazy=True)
+        op.topotools.trim(network=net, pores=[0])
+        assert 'throat.conns' in net.keys()
+        assert net._get_stencil() is None
+        assert net.Np == 59
+        assert net['pore.coords'].shape == (59, 3)
+        am = net.create_adjacency_matrix(fmt='csr')
+        assert am.shape == (59, 59)
+
 
 if __name__ == '__main__':
 
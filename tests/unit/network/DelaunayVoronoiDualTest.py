@@ -0,0 +1,73 @@
+import numpy as np
+import scipy.spatial as sptl
+import openpnm as op
+
+
+class DelaunayVoronoiDualTest:
+    def setup_class(self):
+        np.random.seed(0)
+        points = op.topotools.reflect_base_points(np.random.rand(50, 3),
+                                                  [1, 1, 1])
+        self.net = op.network.DelaunayVoronoiDual(shape=[1, 1, 1],
+                                                  points=points)
+
+    def teardown_class(self):
+        pass
+
+    def test_find_ridge_conns(self):
+        for points in [np.random.rand(40, 3), np.random.rand(40, 2)]:
+            vor = sptl.Voronoi(points=points)
+            conns = op.network.DelaunayVoronoiDual._find_ridge_conns(vor)
+            # Build the same set of connections one ridge at a time
+            ref = set()
+            for ridge, verts in vor.ridge_dict.items():
+                ref.add(tuple(ridge))
+                row = [v + vor.npoints for v in verts if v > -1]
+                ref.update([(p, v) for p in ridge for v in row])
+                ref.update(zip(row, row[1:] + row[:1]))
+            ref = {tuple(sorted(c)) for c in ref if c[0] != c[1]}
+            found = {tuple(sorted(c)) for c in conns if c[0] != c[1]}
+            assert found == ref
+
+    def test_find_throat_facets(self):
+        net = self.net
+        facets = net.find_throat_facets()
+        assert facets.shape == (net.num_throats('delaunay'), )
+        am = net.create_adjacency_matrix(weights=net['throat.interconnect'],
+                                         fmt='lil', drop_zeros=True)
+        for t, facet in zip(net.throats('delaunay'), facets):
+            P1, P2 = net['throat.conns'][t]
+            ref = sorted(set(am.rows[P1]).intersection(am.rows[P2]))
+            assert np.all(facet == ref)
+
+    def test_find_pore_hulls(self):
+        net = self.net
+        Ps = net.pores('delaunay')[:10]
+        hulls = net.find_pore_hulls(pores=Ps)
+        assert hulls.shape == (10, )
+        am = net.create_adjacency_matrix(weights=net['throat.interconnect'],
+                                         fmt='lil', drop_zeros=True)
+        for P, hull in zip(Ps, hulls):
+            assert np.all(hull == am.rows[P])
+            assert np.all(net['pore.voronoi'][hull])
+
+    def test_boundary_pores_at_facet_centroids(self):
+        net = self.net
+        Ps = net.pores(['boundary', 'delaunay'], mode='xnor')
+        assert Ps.size > 0
+        for P in Ps:
+            Ns = net.find_neighbor_pores(pores=P)
+            Ns = Ns[net['pore.voronoi'][Ns]]
+            c = np.mean(net['pore.coords'][Ns], axis=0)
+            assert np.allclose(net['pore.coords'][P], c)
+
+
+if __name__ == '__main__':
+
+    t = DelaunayVoronoiDualTest()
+    t.setup_class()
+    self = t
+    for item in t.__dir__():
+        if item.startswith('test'):
+            print('running test: '+item)
+            t.__getattribute__(item)()
@@ -171,6 +171,50 @@ class GenericNetworkTest:
         assert np.size(a) == 17
         assert np.all(np.in1d([0, 1], a))
 
+    def test_find_pores_within_radius(self):
+        pts = np.array([[0.5, 0.5, 0.5], [3.2, 4.7, 1.1], [20, 20, 20]])
+        indptr, indices = self.net.find_pores_within_radius(pts, r=1.5)
+        assert indptr.size == 4
+        D = sp.spatial.distance.cdist(pts, self.net['pore.coords'])
+        for i in range(3):
+            b = np.where(D[i] <= 1.5)[0]
+            assert np.all(indices[indptr[i]:indptr[i+1]] == b)
+
+    def test_find_nearest_pores(self):
+        pts = np.array([[0.4, 0.6, 0.9], [5.1, 5.2, 5.3]])
+        indptr, indices = self.net.find_nearest_pores(pts, k=3)
+        assert np.all(indptr == [0, 3, 6])
+        D = sp.spatial.distance.cdist(pts, self.net['pore.coords'])
+        for i in range(2):
+            b = np.argsort(D[i])[:3]
+            assert np.all(np.sort(indices[indptr[i]:indptr[i+1]])
+                          == np.sort(b))
+
+    def test_find_pores_within_box(self):
+        lower = np.array([[0, 0, 0], [2, 3, 4]])
+        upper = np.array([[1, 10, 2], [2.5, 3.5, 4.5]])
+        indptr, indices = self.net.find_pores_within_box(lower, upper)
+        coords = self.net['pore.coords']
+        for i in range(2):
+            b = np.where(np.all((coords >= lower[i])
+                                * (coords <= upper[i]), axis=1))[0]
+            assert np.all(indices[indptr[i]:indptr[i+1]] == b)
+
+    def test_kdtree_is_reused_until_coords_change(self):
+        net = op.network.Cubic(shape=[4, 4, 4])
+        tree = net._get_kdtree()
+        net.find_nearby_pores(pores=[0, 1], r=1)
+        assert net._get_kdtree() is tree
+        net['pore.coords'] = net['pore.coords'] + 10
+        assert net._get_kdtree() is not tree
+        _, indices = net.find_nearest_pores([10.5, 10.5, 10.5])
+        assert np.all(indices == [0])
+        tree = net._get_kdtree()
+        op.topotools.trim(network=net, pores=[0])
+        assert net._get_kdtree() is not tree
+        _, indices = net.find_nearest_pores([10.5, 10.5, 10.5], k=3)
+        assert np.all(np.sort(indices) == [0, 3, 15])
+
 
 if __name__ == '__main__':
 
@@ -364,6 +364,48 @@ class GraphToolsTest:
             topotools.find_neighbor_sites(sites=[0, 1], am=am, flatten=True,
                                           logic='foobar')
 
+    def test_find_neighbor_sites_ragged(self):
+        am = self.net.create_adjacency_matrix(fmt='csr')
+        for logic in ['or', 'xor', 'xnor', 'and']:
+            Ps = topotools.find_neighbor_sites(sites=[0, 1, 2], am=am,
+                                               logic=logic, flatten=False)
+            indptr, indices = topotools.find_neighbor_sites(sites=[0, 1, 2],
+                                                            am=am,
+                                                            logic=logic,
+                                                            flatten=False,
+                                                            ragged=True)
+            assert indptr.size == 4
+            for i in range(3):
+                assert np.all(indices[indptr[i]:indptr[i+1]] == Ps[i])
+        indptr, indices = topotools.find_neighbor_sites(sites=[0, 2], am=am,
+                                                        flatten=False,
+                                                        include_input=True,
+                                                        ragged=True)
+        assert np.all(indptr == [0, 2, 3])
+        assert np.all(indices == [1, 3, 1])
+
+    def test_find_neighbor_bonds_ragged(self):
+        im = self.net.create_incidence_matrix(fmt='csr')
+        indptr, indices = topotools.find_neighbor_bonds(sites=[0, 1], im=im,
+                                                        flatten=False,
+                                                        ragged=True)
+        assert np.all(indptr == [0, 2, 6])
+        assert np.all(indices == [0, 1, 0, 2, 3, 5])
+        indptr, indices = topotools.find_neighbor_bonds(sites=[0, 1], im=im,
+                                                        flatten=False,
+                                                        logic='xnor',
+                                                        ragged=True)
+        assert np.all(indptr == [0, 1, 2])
+        assert np.all(indices == [0, 0])
+
+    def test_find_neighbors_does_not_cache_lil(self):
+        self.net._am.clear()
+        self.net._im.clear()
+        self.net.find_neighbor_pores(pores=[0, 1])
+        self.net.find_neighbor_throats(pores=[0, 1], flatten=False)
+        assert 'lil' not in self.net._am.keys()
+        assert 'lil' not in self.net._im.keys()
+
     def test_istriu(self):
         net = op.network.Cubic(shape=[5, 5, 5])
         am = net.create_adjacency_matrix(triu=False)
@@ -419,6 +419,71 @@ class ProjectTest:
         assert df.shape[1] == 3
         assert self.net.name + '.throat.conns_head' in df.index
 
+    def test_project_reference_maintained(self):
+        proj = self.ws.new_project()
+        net = op.network.Cubic(shape=[3, 3, 3], project=proj)
+        geo = op.geometry.GenericGeometry(network=net, pores=net.Ps,
+                                          throats=net.Ts)
+        assert geo.project is proj
+        assert geo.network is net
+        assert proj.find_full_domain(geo) is net
+        proj.purge_object(geo)
+        assert geo.project is None
+        proj2 = self.ws.copy_project(proj)
+        assert proj2.network is not net
+        assert proj2.network.project is proj2
+        assert net.project is proj
+        self.ws.close_project(proj)
+        assert net.project is None
+        self.ws.close_project(proj2)
+
+    def test_project_reference_restored_after_pickling(self):
+        proj = self.ws.new_project()
+        net = op.network.Cubic(shape=[3, 3, 3], project=proj)
+        assert '_project_ref' not in net.__getstate__().keys()
+        self.ws.close_project(proj)
+        self.ws[proj.name] = proj
+        assert net.project is proj
+        self.ws.close_project(proj)
+
+    def test_regenerate_models_across_objects(self):
+        proj = self.ws.new_project()
+        net = op.network.Cubic(shape=[3, 3, 3], project=proj)
+        geo = op.geometry.GenericGeometry(network=net, pores=net.Ps,
+                                          throats=net.Ts)
+        phase = op.phases.GenericPhase(network=net)
+        phys = op.physics.GenericPhysics(network=net, phase=phase,
+                                         geometry=geo)
+        phys['throat.base'] = 1.0
+        phys.add_model(propname='throat.g', model=op.models.misc.scaled,
+                       prop='throat.base', factor=1.0)
+        # A phase model that uses data calculated on the physics
+        phase.add_model(propname='throat.total', model=op.models.misc.scaled,
+                        prop='throat.g', factor=2.0)
+        phys['throat.base'] = 2.0
+        phase.regenerate_models(deep=True)
+        assert np.all(phase['throat.total'] == 4.0)
+        assert phase.models.stats['run'] == 2
+        assert phys.models.stats['run'] == 2
+        # Only the requested model and the models it depends on are run
+        phase.add_model(propname='pore.other', model=op.models.misc.constant,
+                        value=1.0)
+        phys['throat.base'] = 3.0
+        proj.regenerate_models(propnames='throat.total', upstream=True)
+        assert np.all(phase['throat.total'] == 6.0)
+        assert phase.models.stats['run'] == 4
+        assert phys.models.stats['run'] == 3
+        # Empty lists of objects and propnames mean all of them
+        phys['throat.base'] = 4.0
+        proj.regenerate_models(objs=[], propnames=[])
+        assert np.all(phase['throat.total'] == 8.0)
+        # A physics not assigned to a phase does not break the ordering
+        op.physics.GenericPhysics(network=net)
+        phys['throat.base'] = 5.0
+        proj.regenerate_models()
+        assert np.all(phase['throat.total'] == 10.0)
+        self.ws.close_project(proj)
+
 
 if __name__ == '__main__':
 
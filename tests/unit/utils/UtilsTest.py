@@ -1,3 +1,4 @@
+import os
 import pytest
 import scipy as sp
 import numpy as np
@@ -85,6 +86,26 @@ class UtilsTest:
         # Non-uniform pressure field --> positive advection --> non-symmetric
         assert not op.utils.misc.is_symmetric(ad.A)
 
+    def test_time_series(self):
+        for storage in ['array', 'memmap', 'hdf5']:
+            ts = op.utils.TimeSeries(Np=4, n_times=2, storage=storage)
+            for t in [0.1, 0.2, 0.3]:  # More times than preallocated
+                ts.append(t, np.ones(4)*t)
+            ts.append(0.2, np.zeros(4))  # Overwrites the existing time
+            assert len(ts) == 3
+            assert np.allclose(ts.times, [0.1, 0.2, 0.3])
+            assert np.all(ts[0.3] == 0.3)
+            assert np.all(ts[0.1 + 0.2] == 0.3)
+            assert np.all(ts[0.2] == 0.0)
+            assert ts.data.shape == (3, 4)
+            with pytest.raises(KeyError):
+                ts[0.4]
+            filename = getattr(ts, 'filename', None)
+            ts.close()
+            # Temporary files are removed once the store is closed
+            if filename is not None:
+                assert not os.path.exists(filename)
+
     def test_is_valid_propname(self):
         assert op.utils.misc.is_valid_propname("pore.foo")
         assert op.utils.misc.is_valid_propname("pore.zed.foo")